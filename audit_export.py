@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Audit an export tree: image references, missing files, orphans and formats.
+
+This script:
+1. Walks export/ once with os.scandir, collecting section JSON files and
+   image files
+2. Parses the section JSON in a worker pool
+3. Reads only the first bytes of each image through one shared reader
+   to detect format mismatches and unconverted WMF files
+4. Prints a human summary and optionally writes a JSON report
+
+With --manifest, the export is checked against the _build_manifest.json
+files written by build_book.py instead (one stat per file, no JSON parsing).
+
+check_images.py and verify_images.py are thin wrappers around this module.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+HEADER_BYTES = 8
+PARSE_BATCH_SIZE = 64  # Section files per worker task
+INLINE_PARSE_LIMIT = 256  # Below this many files, skip the process pool
+BUILD_MANIFEST_FILE = "_build_manifest.json"
+
+
+def sniff_format(magic):
+    """Name the image format from its first bytes."""
+    # PNG: 89 50 4E 47 0D 0A 1A 0A
+    if magic[:4] == b"\x89PNG":
+        return "PNG"
+    # JPEG: FF D8 FF
+    if magic[:3] == b"\xff\xd8\xff":
+        return "JPEG"
+    # WMF: D7 CD C6 9A or 01 00 09 00
+    if magic[:4] == b"\xd7\xcd\xc6\x9a" or magic[:4] == b"\x01\x00\x09\x00":
+        return "WMF"
+    # PDF: 25 50 44 46
+    if magic[:4] == b"%PDF":
+        return "PDF"
+    return "UNKNOWN"
+
+
+def check_file_format(file_path):
+    """Check if a file is actually the format its extension claims."""
+    try:
+        with open(file_path, "rb") as f:
+            return sniff_format(f.read(HEADER_BYTES))
+    except Exception as e:
+        return f"ERROR: {e}"
+
+
+class HeaderReader:
+    """Read the first bytes of many files on a shared thread pool."""
+
+    def __init__(self, jobs=None):
+        self._executor = ThreadPoolExecutor(max_workers=jobs or 8)
+
+    def formats(self, paths):
+        """Return {path: format name} for every path."""
+        return dict(zip(paths, self._executor.map(check_file_format, paths)))
+
+    def close(self):
+        self._executor.shutdown()
+
+
+def scan_export(export_dir):
+    """Walk *export_dir* once.
+
+    Returns (section_files, image_files): section_files maps
+    (lang, book_id) to the JSON files in its chapter directories;
+    image_files lists image paths relative to *export_dir*.
+    """
+    section_files = {}
+    image_files = []
+    # Levels: 0 export root, 1 language, 2 book, 3 chapter
+    stack = [(export_dir, 0, None, None, False)]
+    while stack:
+        path, level, lang, book_id, in_pictures = stack.pop()
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if in_pictures or name == "pictures":
+                        stack.append((entry.path, level + 1, lang, book_id, True))
+                    elif level == 0:
+                        stack.append((entry.path, 1, name, None, False))
+                    elif level == 1:
+                        stack.append((entry.path, 2, lang, name, False))
+                    elif level == 2 and name[0].isdigit():
+                        # Chapter folders; _search/ etc. hold no sections
+                        stack.append((entry.path, 3, lang, book_id, False))
+                elif in_pictures:
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        image_files.append(os.path.relpath(entry.path, export_dir))
+                elif level == 3 and name.endswith(".json"):
+                    section_files.setdefault((lang, book_id), []).append(entry.path)
+    return section_files, sorted(image_files)
+
+
+def parse_section_batch(paths):
+    """Return [(path, [image paths or None], error)] for section files."""
+    results = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            refs = [
+                item.get("path")
+                for item in data.get("content", [])
+                if item.get("type") == "image"
+            ]
+            results.append((path, refs, None))
+        except Exception as e:
+            results.append((path, [], str(e)))
+    return results
+
+
+def parse_sections(paths, jobs=None):
+    """Parse section files, in a process pool when there are many."""
+    batches = [
+        paths[i : i + PARSE_BATCH_SIZE] for i in range(0, len(paths), PARSE_BATCH_SIZE)
+    ]
+    if len(paths) <= INLINE_PARSE_LIMIT or jobs == 1:
+        return [result for batch in batches for result in parse_section_batch(batch)]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return [
+            result
+            for batch_results in executor.map(parse_section_batch, batches)
+            for result in batch_results
+        ]
+
+
+def resolve_image_ref(export_dir, lang, book_id, json_path, ref):
+    """Map a JSON image path to a file path relative to *export_dir*."""
+    if ref.startswith("pictures/"):
+        # pictures/{section_path}/{filename} lives at
+        # export/pictures/{lang}/{book_id}/{section_path}/{filename}
+        candidate = os.path.join("pictures", lang, book_id, ref[9:])
+        book_candidate = os.path.join(lang, book_id, ref)
+        if not os.path.exists(os.path.join(export_dir, candidate)) and os.path.exists(
+            os.path.join(export_dir, book_candidate)
+        ):
+            return book_candidate  # pictures_location = "book"
+        return candidate
+    return os.path.relpath(os.path.join(os.path.dirname(json_path), ref), export_dir)
+
+
+def audit_export(export_dir="export", jobs=None):
+    """Audit *export_dir* and return a JSON-serialisable report dict."""
+    section_files, image_files = scan_export(export_dir)
+    all_sections = [path for paths in section_files.values() for path in paths]
+    book_of = {path: book for book, paths in section_files.items() for path in paths}
+
+    report = {
+        "export_dir": export_dir,
+        "books": len(section_files),
+        "json_files": len(all_sections),
+        "image_refs": 0,
+        "images_on_disk": len(image_files),
+        "missing_images": [],
+        "missing_path": [],
+        "json_errors": [],
+        "format_mismatches": [],
+        "wmf_files": [],
+        "orphaned_images": [],
+    }
+
+    referenced = set()
+    for path, refs, error in parse_sections(sorted(all_sections), jobs):
+        json_rel = os.path.relpath(path, export_dir)
+        if error:
+            report["json_errors"].append({"json": json_rel, "error": error})
+            continue
+        lang, book_id = book_of[path]
+        for ref in refs:
+            report["image_refs"] += 1
+            if not ref:
+                report["missing_path"].append(json_rel)
+                continue
+            image_rel = resolve_image_ref(export_dir, lang, book_id, path, ref)
+            referenced.add(image_rel)
+            if not os.path.exists(os.path.join(export_dir, image_rel)):
+                report["missing_images"].append(
+                    {"json": json_rel, "path": ref, "expected_path": image_rel}
+                )
+
+    reader = HeaderReader(jobs)
+    try:
+        formats = reader.formats(
+            [os.path.join(export_dir, rel_path) for rel_path in image_files]
+        )
+    finally:
+        reader.close()
+
+    for rel_path in image_files:
+        actual = formats[os.path.join(export_dir, rel_path)]
+        expected = os.path.splitext(rel_path)[1][1:].upper()
+        if expected == "JPG":
+            expected = "JPEG"
+        if actual == "WMF":
+            report["wmf_files"].append(rel_path)
+        elif (
+            actual != expected
+            and actual != "UNKNOWN"
+            and not actual.startswith("ERROR")
+        ):
+            report["format_mismatches"].append(
+                {"file": rel_path, "expected": expected, "actual": actual}
+            )
+        if rel_path not in referenced:
+            report["orphaned_images"].append(rel_path)
+
+    report["ok"] = not (
+        report["missing_images"]
+        or report["missing_path"]
+        or report["json_errors"]
+        or report["format_mismatches"]
+        or report["wmf_files"]
+    )
+    return report
+
+
+def print_summary(report):
+    """Print the human-readable audit summary."""
+    print("=" * 80)
+    print("EXPORT AUDIT")
+    print("=" * 80)
+    print()
+    print(f"✓ Scanned {report['json_files']} JSON files in {report['books']} book(s)")
+    print(f"✓ Found {report['image_refs']} image references")
+    print(f"✓ Found {report['images_on_disk']} image files on disk")
+    print()
+
+    def section(items, problem, ok_message, fmt, limit=20):
+        if not items:
+            print(f"✅ {ok_message}")
+            print()
+            return
+        print(f"{problem}: {len(items)}")
+        print()
+        for item in items[:limit]:
+            print(f"  {fmt(item)}")
+        if len(items) > limit:
+            print(f"  ... and {len(items) - limit} more")
+        print()
+
+    section(
+        report["missing_images"],
+        "❌ MISSING IMAGES",
+        "All referenced images exist on disk",
+        lambda i: f"{i['expected_path']} (referenced in {i['json']})",
+    )
+    section(
+        report["missing_path"],
+        "⚠️  IMAGES WITHOUT PATH",
+        "All image references have a path",
+        str,
+    )
+    section(
+        report["json_errors"],
+        "❌ JSON ERRORS",
+        "All section JSON files parse",
+        lambda i: f"{i['json']}: {i['error']}",
+    )
+    section(
+        report["format_mismatches"],
+        "⚠️  FORMAT MISMATCHES",
+        "All image files match their extensions",
+        lambda i: f"{i['file']} (expected {i['expected']}, actual {i['actual']})",
+    )
+    section(
+        report["wmf_files"],
+        "❌ WMF FILES WITH PNG/JPG EXTENSIONS",
+        "No WMF files with wrong extensions",
+        str,
+    )
+    if report["wmf_files"]:
+        print("  These files need to be converted. Run:")
+        print("    python3 fix_wmf_images.py")
+        print()
+    section(
+        report["orphaned_images"],
+        "🔸 ORPHANED IMAGES (not referenced in any JSON)",
+        "No orphaned images found",
+        str,
+    )
+
+    print("=" * 80)
+    if report["ok"]:
+        print("✅ All checks passed! Images are in good shape.")
+    else:
+        print("⚠️  Issues found. Please review the report above.")
+    print("=" * 80)
+
+
+def _sha256(path):
+    """Hash a file in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def audit_manifest(export_dir="export", check_hashes=False):
+    """Check every file listed in the build manifests and look for orphans."""
+    _, image_files = scan_export(export_dir)
+    manifests = []
+    for lang in sorted(os.listdir(export_dir)):
+        lang_dir = os.path.join(export_dir, lang)
+        if lang == "pictures" or not os.path.isdir(lang_dir):
+            continue
+        for book_id in sorted(os.listdir(lang_dir)):
+            path = os.path.join(lang_dir, book_id, BUILD_MANIFEST_FILE)
+            if os.path.isfile(path):
+                manifests.append(path)
+
+    report = {
+        "export_dir": export_dir,
+        "manifests": len(manifests),
+        "files": 0,
+        "valid_files": 0,
+        "missing_files": [],
+        "size_mismatches": [],
+        "hash_mismatches": [],
+        "orphaned_images": [],
+    }
+    listed = set()
+    for manifest_path in manifests:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for entry in manifest["files"]:
+            report["files"] += 1
+            listed.add(entry["path"])
+            file_path = os.path.join(export_dir, entry["path"])
+            try:
+                size = os.stat(file_path).st_size
+            except FileNotFoundError:
+                report["missing_files"].append(entry["path"])
+                continue
+            if size != entry["size"]:
+                report["size_mismatches"].append(
+                    {"file": entry["path"], "size": size, "expected": entry["size"]}
+                )
+            elif check_hashes and _sha256(file_path) != entry["sha256"]:
+                report["hash_mismatches"].append(entry["path"])
+            else:
+                report["valid_files"] += 1
+
+    report["orphaned_images"] = [
+        rel_path
+        for rel_path in image_files
+        if rel_path.replace(os.sep, "/") not in listed
+    ]
+    report["ok"] = bool(manifests) and not (
+        report["missing_files"]
+        or report["size_mismatches"]
+        or report["hash_mismatches"]
+    )
+    return report
+
+
+def print_manifest_summary(report):
+    """Print the human-readable manifest verification summary."""
+    print("=" * 70)
+    print("Manifest Verification Report")
+    print("=" * 70)
+    if not report["manifests"]:
+        print(f"\n❌ No {BUILD_MANIFEST_FILE} found under {report['export_dir']}")
+        return
+
+    print("\n📊 Statistics:")
+    print(f"   Manifests:                {report['manifests']}")
+    print(f"   Files listed:             {report['files']}")
+    print(f"   Valid files:              {report['valid_files']}")
+    print(f"   Missing files:            {len(report['missing_files'])}")
+    print(f"   Size mismatches:          {len(report['size_mismatches'])}")
+    print(f"   Content mismatches:       {len(report['hash_mismatches'])}")
+    print(f"   Orphaned images:          {len(report['orphaned_images'])}")
+
+    issues = [f"❌ Missing file: {path}" for path in report["missing_files"]]
+    issues += [
+        f"❌ Size mismatch: {item['file']}"
+        f" ({item['size']} bytes, manifest says {item['expected']})"
+        for item in report["size_mismatches"]
+    ]
+    issues += [f"❌ Content changed: {path}" for path in report["hash_mismatches"]]
+    issues += [f"🔸 Orphaned: {path}" for path in report["orphaned_images"]]
+    if issues:
+        print()
+        for issue in issues[:20]:
+            print(f"   {issue}")
+        if len(issues) > 20:
+            print(f"\n   ... and {len(issues) - 20} more")
+
+    if report["ok"]:
+        print("\n✅ All manifest entries verified successfully!")
+    else:
+        print("\n❌ Verification FAILED")
+
+
+def write_report(report, destination):
+    """Write the JSON report to a file, or stdout for "-"."""
+    if destination == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    with open(destination, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {destination}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "export_dir", nargs="?", default="export", help="export directory"
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="parallel workers")
+    parser.add_argument(
+        "--json", metavar="PATH", help='write the JSON report to PATH ("-" = stdout)'
+    )
+    parser.add_argument(
+        "--manifest",
+        action="store_true",
+        help="verify against _build_manifest.json instead of reading JSON",
+    )
+    parser.add_argument(
+        "--hash", action="store_true", help="with --manifest, also compare SHA-256"
+    )
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.export_dir):
+        print(f"❌ Export path not found: {args.export_dir}")
+        return 1
+
+    if args.manifest:
+        report = audit_manifest(args.export_dir, check_hashes=args.hash)
+        summary = print_manifest_summary
+    else:
+        report = audit_export(args.export_dir, jobs=args.jobs)
+        summary = print_summary
+
+    if args.json == "-":
+        write_report(report, "-")
+    else:
+        summary(report)
+        if args.json:
+            write_report(report, args.json)
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
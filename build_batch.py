@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Build many books in one run over a process pool.
+
+The input is a directory of DOCX files, each with an optional book config
+``<name>.toml`` and exceptions file ``<name>.exceptions.conf`` next to it,
+or a TOML manifest:
+
+    [[book]]
+    docx = "books/eng/my-book.docx"
+    config = "books/eng/my-book.toml"              # optional
+    exceptions = "books/eng/my-book.exceptions.conf"  # optional
+    name = "my-book-eng"                           # optional, for logs
+
+Paths in a manifest are relative to the manifest. The WMF toolchain is
+probed once here and shared with the workers, and every build uses the same
+IR and WMF conversion caches under .docx2app_cache/, so a picture that
+appears in several translations is converted only once.
+
+Each book's build output goes to batch_logs/<name>.log and its Markdown to
+export_md/<name>/. A per-book timing and status summary is printed and
+written to batch_logs/batch_summary.json.
+
+Usage:
+    python build_batch.py books/
+    python build_batch.py books.toml -j 4 --incremental
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import build_book
+
+BATCH_LOG_DIR = "batch_logs"
+BATCH_SUMMARY_FILE = "batch_summary.json"
+
+# Worker process state, set by _init_worker
+_probe_results = None
+
+
+def load_toml(path):
+    """Load a TOML file (tomllib on Python 3.11+, tomli before)."""
+    try:
+        import tomllib  # Python 3.11+
+    except ImportError:
+        import tomli as tomllib  # type: ignore[import-not-found]
+
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def book_job(docx, config=None, exceptions=None, name=None):
+    """Describe one book build; missing files fall back to the defaults."""
+    stem = os.path.splitext(os.path.basename(docx))[0]
+    base = os.path.splitext(docx)[0]
+    if config is None and os.path.exists(base + ".toml"):
+        config = base + ".toml"
+    if exceptions is None:
+        if os.path.exists(base + ".exceptions.conf"):
+            exceptions = base + ".exceptions.conf"
+        else:
+            exceptions = build_book.EXCEPTIONS_FILE
+    return {
+        "name": name or stem,
+        "docx": docx,
+        # A config path that does not exist makes the build use DOCX metadata
+        "config": config or base + ".toml",
+        "exceptions": exceptions,
+    }
+
+
+def book_output_dir(job):
+    """The JSON export directory a job writes: export/<language>/<canonical_id>.
+
+    Resolved like build_book.load_book_config(), from the job's config and,
+    when that has no canonical_id, the DOCX metadata.
+    """
+    config = dict(build_book.BOOK_CONFIG_DEFAULTS)
+    if os.path.exists(job["config"]):
+        config.update(load_toml(job["config"]))
+    if not config["canonical_id"]:
+        config = build_book.complete_book_config(
+            config, job["docx"], log=build_book.discard_log
+        )
+    return os.path.join(
+        build_book.EXPORT_DIR, config["language"], config["canonical_id"]
+    )
+
+
+def discover_books(source):
+    """Return the book jobs for a directory of DOCX files or a TOML manifest.
+
+    Each job's ``json_dir`` is resolved up front. Books that would write the
+    same directory (same language and canonical_id) are rejected before
+    anything is built, since concurrent builds would overwrite each other.
+    """
+    if os.path.isdir(source):
+        jobs = [
+            book_job(os.path.join(source, name))
+            for name in sorted(os.listdir(source))
+            if name.endswith(".docx") and not name.startswith("~$")
+        ]
+    else:
+        base_dir = os.path.dirname(source)
+
+        def resolve(path):
+            return os.path.join(base_dir, path) if path else None
+
+        jobs = [
+            book_job(
+                resolve(entry["docx"]),
+                resolve(entry.get("config")),
+                resolve(entry.get("exceptions")),
+                entry.get("name"),
+            )
+            for entry in load_toml(source).get("book", [])
+        ]
+
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate book names: {', '.join(duplicates)}")
+
+    owners = {}
+    for job in jobs:
+        job["json_dir"] = book_output_dir(job)
+        owners.setdefault(job["json_dir"], []).append(job["name"])
+    collisions = [
+        f"{', '.join(names)} -> {json_dir}"
+        for json_dir, names in sorted(owners.items())
+        if len(names) > 1
+    ]
+    if collisions:
+        raise ValueError(
+            "Books share an output directory (give them distinct canonical_id"
+            f" or language values): {'; '.join(collisions)}"
+        )
+    return jobs
+
+
+def docx_has_wmf(docx_path):
+    """True if any media member of the DOCX starts with WMF magic bytes."""
+    import zipfile
+
+    try:
+        with zipfile.ZipFile(docx_path) as docx:
+            for name in docx.namelist():
+                if name.startswith("word/media/"):
+                    with docx.open(name) as f:
+                        if build_book.is_wmf_image(f.read(4)):
+                            return True
+    except (OSError, zipfile.BadZipFile):
+        pass  # Reported by the book's own build
+    return False
+
+
+def _init_worker(probe_results, slot_counter, wmf_concurrency, ir_cache_keep):
+    """Set up a worker process: shared probe, own LibreOffice profiles."""
+    global _probe_results
+    _probe_results = probe_results
+    with slot_counter.get_lock():
+        slot = slot_counter.value
+        slot_counter.value += 1
+
+    # Workers must not share LibreOffice profiles, which are locked per use
+    build_book.LIBREOFFICE_PROFILE_ROOT = os.path.join(
+        build_book.LIBREOFFICE_PROFILE_ROOT, f"batch_{slot:02d}"
+    )
+    build_book.WMF_CONCURRENCY = wmf_concurrency
+    # Keep every book of the batch in the IR cache
+    build_book.IR_CACHE_KEEP = max(build_book.IR_CACHE_KEEP, ir_cache_keep)
+
+
+def build_one(job, incremental=False, no_cache=False, markdown=True):
+    """Build one book in this process; return its status record."""
+    import contextlib
+    import traceback
+
+    build_book.INPUT_DOCX = job["docx"]
+    build_book.BOOK_CONFIG_FILE = job["config"]
+    build_book.EXCEPTIONS_FILE = job["exceptions"]
+    build_book.MARKDOWN_DIR = os.path.join("export_md", job["name"])
+    build_book.ENABLE_MARKDOWN = markdown
+
+    # A fresh toolchain per book so breaker decisions are logged per book
+    if _probe_results:
+        build_book.set_wmf_toolchain(
+            build_book.WmfToolchain.from_probe_results(_probe_results)
+        )
+    else:
+        build_book.set_wmf_toolchain(None)
+
+    log_path = os.path.join(BATCH_LOG_DIR, f"{job['name']}.log")
+    record = {"name": job["name"], "docx": job["docx"], "log": log_path}
+    start = time.monotonic()
+    with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(
+        log
+    ), contextlib.redirect_stderr(log):
+        try:
+            record.update(
+                build_book.build_book_json(incremental=incremental, no_cache=no_cache)
+            )
+            record["status"] = "ok"
+        except Exception as e:
+            traceback.print_exc()
+            record["status"] = "failed"
+            record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.monotonic() - start, 2)
+    return record
+
+
+def run_batch(jobs, workers=None, incremental=False, no_cache=False, markdown=True):
+    """Build every job over a process pool; return records in job order."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    os.makedirs(BATCH_LOG_DIR, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+
+    # Probe the WMF converters once for the whole batch
+    probe_results = None
+    if any(docx_has_wmf(job["docx"]) for job in jobs):
+        probe_results = build_book.WmfToolchain().probe().probe_results()
+    else:
+        print("✓ No WMF images, skipping conversion toolchain probe")
+
+    print(f"\nBuilding {len(jobs)} book(s) with {workers} worker(s)...")
+    wmf_concurrency = max(1, (os.cpu_count() or 1) // workers)
+    records = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(
+            probe_results,
+            multiprocessing.Value("i", 0),
+            wmf_concurrency,
+            len(jobs),
+        ),
+    ) as pool:
+        futures = {
+            pool.submit(build_one, job, incremental, no_cache, markdown): job
+            for job in jobs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:  # Worker died (e.g. killed or out of memory)
+                record = {
+                    "name": job["name"],
+                    "docx": job["docx"],
+                    "status": "failed",
+                    "error": f"{type(e).__name__}: {e}",
+                    "seconds": None,
+                }
+            records[job["name"]] = record
+            mark = "✓" if record["status"] == "ok" else "❌"
+            seconds = record["seconds"]
+            timing = f" ({seconds:.1f}s)" if seconds is not None else ""
+            print(f"  [{done}/{len(jobs)}] {mark} {job['name']}{timing}")
+    return [records[job["name"]] for job in jobs]
+
+
+def print_summary(records, elapsed):
+    """Print the per-book status table."""
+    print("\n" + "=" * 80)
+    print("BATCH SUMMARY")
+    print("=" * 80)
+    width = max(len(record["name"]) for record in records)
+    for record in records:
+        if record["status"] == "ok":
+            print(
+                f"  ✓ {record['name']:<{width}}  {record['seconds']:>7.1f}s"
+                f"  {record['sections']:>4} sections  {record['images']:>4} images"
+                f"  -> {record['json_dir']}"
+            )
+        else:
+            print(f"  ❌ {record['name']:<{width}}  {record['error']}")
+            if record.get("log"):
+                print(f"     See {record['log']}")
+
+    failed = sum(record["status"] != "ok" for record in records)
+    print()
+    print(
+        f"{len(records) - failed}/{len(records)} book(s) built"
+        f" in {elapsed:.1f}s ({failed} failed)"
+    )
+
+
+def write_summary(records, elapsed):
+    """Write the batch summary JSON; return its path."""
+    summary_path = os.path.join(BATCH_LOG_DIR, BATCH_SUMMARY_FILE)
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"seconds": round(elapsed, 2), "books": records},
+            f,
+            indent=2,
+            ensure_ascii=False,
+        )
+    return summary_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build several books from a directory or TOML manifest."
+    )
+    parser.add_argument("source", help="directory of DOCX files or TOML manifest")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="books built in parallel (default: CPU count)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="keep previous output and rewrite only changed files",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="ignore the IR and WMF conversion caches",
+    )
+    parser.add_argument(
+        "--no-markdown",
+        action="store_true",
+        help="write only the JSON export",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = discover_books(args.source)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Could not read {args.source}: {e}")
+        return 1
+    if not jobs:
+        print(f"⚠️  No DOCX files found in {args.source}")
+        return 1
+
+    start = time.monotonic()
+    records = run_batch(
+        jobs, args.jobs, args.incremental, args.no_cache, not args.no_markdown
+    )
+    elapsed = time.monotonic() - start
+    print_summary(records, elapsed)
+    print(f"✓ Summary written to {write_summary(records, elapsed)}")
+    return 0 if all(record["status"] == "ok" for record in records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
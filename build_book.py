@@ -6,20 +6,36 @@ This version uses the lenient sequential parsing strategy from test_first_error.
 to reliably extract chapter/section structure even with numbering errors.
 """
 
+import argparse
+import collections
 import json
 import os
 import re
 import shutil
 import sys
+import threading
 
 from docx import Document
 
 # Configuration
 INPUT_DOCX = "original-book.docx"
+EXPORT_DIR = "export"
 MARKDOWN_DIR = "export_md"
 EXCEPTIONS_FILE = "conf/exceptions.conf"
 BOOK_CONFIG_FILE = "book_config.toml"
 ENABLE_MARKDOWN = True  # Enable markdown generation alongside JSON
+IMAGE_CHUNK_SIZE = 1024 * 1024  # Bytes per read when streaming images from the DOCX
+USE_MMAP = False  # Memory-map the DOCX when streaming images
+IR_CACHE_DIR = os.path.join(".docx2app_cache", "ir")  # Parsed-book cache
+IR_CACHE_KEEP = 5  # Number of cached parses to keep
+WMF_CACHE_DIR = os.path.join(".docx2app_cache", "wmf")  # Converted WMF images
+WMF_CONVERSION_TIMEOUT = 30  # Seconds per external conversion command
+WMF_FAILURE_THRESHOLD = 3  # Consecutive failures before a backend is disabled
+WMF_CONCURRENCY = os.cpu_count() or 1  # Parallel WMF conversions
+# Per-worker LibreOffice profiles, created once and reused between builds
+LIBREOFFICE_PROFILE_ROOT = os.path.join(
+    os.path.expanduser("~"), ".cache", "docx2app", "libreoffice"
+)
 
 
 # ============================================================================
@@ -68,20 +84,35 @@ def build_section_id(chapter_slug, section_slug=None, subsection_slug=None):
         return f"{chapter_slug}/intro"
 
 
-def load_book_config(docx_path):
+BOOK_CONFIG_DEFAULTS = {
+    "canonical_id": None,
+    "language": "eng",
+    "title": None,
+    "is_original": True,
+    "original_language": None,
+    "pictures_location": "root",  # root, book, or chapter
+    "bundle": False,  # Also write the whole book as _book.ndjson
+    "sqlite": False,  # Also write _book.sqlite with FTS5 search
+    "search_index": False,  # Also write the static _search/ index
+    "rag_chunks": False,  # Also stream token-bounded chunks to JSONL
+    "chunk_max_tokens": 512,
+    "chunk_overlap_tokens": 64,
+    "bm25_index": False,  # Also write a NumPy BM25 index to _bm25/
+    "bm25_unit": "sections",  # Index "sections" or "chunks"
+    "compact_json": False,  # Write JSON without indentation
+    "precompress": [],  # Sibling files to write: "gzip" (.gz), "br" (.br)
+    "section_formats": ["json"],  # Plus "msgpack" and/or "cbor"
+}
+
+
+def load_book_config(docx_path, metadata=None):
     """Load book configuration from TOML file or DOCX metadata.
 
     Tries to load from book_config.toml first, then falls back to
-    extracting metadata from the DOCX file.
+    extracting metadata from the DOCX file. *metadata* (from
+    extract_docx_metadata) avoids reopening the DOCX.
     """
-    config = {
-        "canonical_id": None,
-        "language": "eng",
-        "title": None,
-        "is_original": True,
-        "original_language": None,
-        "pictures_location": "root",  # root, book, or chapter
-    }
+    config = dict(BOOK_CONFIG_DEFAULTS)
 
     # Try loading from book_config.toml
     if os.path.exists(BOOK_CONFIG_FILE):
@@ -111,44 +142,50 @@ def load_book_config(docx_path):
     else:
         print(f"No {BOOK_CONFIG_FILE} found, using DOCX metadata fallback...")
 
+    return complete_book_config(config, docx_path, metadata)
+
+
+def complete_book_config(config, docx_path, metadata=None, log=print):
+    """Fill in title and canonical_id from DOCX metadata where missing."""
     # Fallback to DOCX metadata for missing fields
     try:
-        doc = Document(docx_path)
+        if metadata is None:
+            metadata = extract_docx_metadata(load_docx_without_media(docx_path))
 
         # Try DOCX core properties first
-        if not config["title"] and doc.core_properties.title:
-            config["title"] = doc.core_properties.title
-            print(f"  Extracted title from DOCX metadata: {config['title']}")
+        if not config["title"] and metadata["title"]:
+            config["title"] = metadata["title"]
+            log(f"  Extracted title from DOCX metadata: {config['title']}")
 
         # If still no title, use first non-empty paragraph as title
         if not config["title"]:
-            for para in doc.paragraphs[:10]:  # Check first 10 paragraphs
-                text = para.text.strip()
+            for para_text in metadata["paragraphs"]:  # First 10 paragraphs
+                text = para_text.strip()
                 if text and len(text) > 3 and not text.startswith("by "):
                     config["title"] = text
-                    print(f"  Extracted title from document content: {config['title']}")
+                    log(f"  Extracted title from document content: {config['title']}")
                     break
     except Exception as e:
-        print(f"Warning: Could not extract DOCX metadata: {e}")
+        log(f"Warning: Could not extract DOCX metadata: {e}")
 
     # Auto-generate canonical_id from title if missing
     if not config["canonical_id"] and config["title"]:
         config["canonical_id"] = slugify(config["title"])
-        print(f"  Generated canonical_id: {config['canonical_id']}")
+        log(f"  Generated canonical_id: {config['canonical_id']}")
 
     # Warn if required fields still missing
     if not config["canonical_id"]:
-        print("WARNING: No canonical_id configured. Using 'unknown-book'")
+        log("WARNING: No canonical_id configured. Using 'unknown-book'")
         config["canonical_id"] = "unknown-book"
     if not config["title"]:
-        print("WARNING: No title configured. Using 'Untitled Book'")
+        log("WARNING: No title configured. Using 'Untitled Book'")
         config["title"] = "Untitled Book"
 
     return config
 
 
-def create_book_toml(config, output_dir):
-    """Create _book.toml manifest file."""
+def render_book_toml(config):
+    """Render the text of the _book.toml manifest."""
     lines = [
         f'canonical_id = "{config["canonical_id"]}"',
         f'language = "{config["language"]}"',
@@ -157,11 +194,131 @@ def create_book_toml(config, output_dir):
     ]
     if not config["is_original"] and config.get("original_language"):
         lines.append(f'original_language = "{config["original_language"]}"')
+    return "\n".join(lines) + "\n"
 
-    toml_path = os.path.join(output_dir, "_book.toml")
-    with open(toml_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(lines) + "\n")
-    print(f"✓ Created {toml_path}")
+
+NAVIGATION_FILE = "_navigation.json"
+
+
+def build_navigation_tree(config, doc_order, section_stats):
+    """Build the _navigation.json tree from the document order.
+
+    *section_stats* maps (chapter, section, subsection) to {"items",
+    "bytes"} for every section file written; chapters whose intro had no
+    content get ``id``/``path`` of None.
+    """
+    book_id = config["canonical_id"]
+    chapters = []
+    count = 0
+    for entry in doc_order:
+        (
+            chapter_num,
+            section_num,
+            subsection_num,
+            title,
+            dir_name,
+            file_name,
+            chapter_slug,
+            section_slug,
+            subsection_slug,
+        ) = entry
+
+        stats = section_stats.get((chapter_num, section_num, subsection_num))
+        node = {
+            "id": f"{book_id}/{dir_name}/{file_name}" if stats else None,
+            "section_id": build_section_id(chapter_slug, section_slug, subsection_slug),
+            "title": clean_title(title),
+            "path": f"{dir_name}/{file_name}.json" if stats else None,
+            "items": stats["items"] if stats else 0,
+            "bytes": stats["bytes"] if stats else 0,
+        }
+        if stats:
+            count += 1
+
+        if section_num == 0:
+            chapters.append({"chapter": chapter_num, **node, "sections": []})
+        elif subsection_num is None:
+            chapters[-1]["sections"].append(
+                {"section": section_num, **node, "subsections": []}
+            )
+        else:
+            chapters[-1]["sections"][-1]["subsections"].append(
+                {"subsection": subsection_num, **node}
+            )
+
+    return {
+        "book": {
+            "canonical_id": book_id,
+            "language": config["language"],
+            "title": config["title"],
+        },
+        "section_count": count,
+        "chapters": chapters,
+    }
+
+
+# ============================================================================
+# Build State (incremental rebuilds)
+# ============================================================================
+
+BUILD_STATE_FILE = ".build_state.json"
+BUILD_STATE_VERSION = 1  # Bump to invalidate all recorded fingerprints
+
+
+def content_fingerprint(data):
+    """SHA-256 fingerprint of output bytes."""
+    import hashlib
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_build_state(book_dir):
+    """Return {output_path: fingerprint} recorded by the previous build."""
+    state_path = os.path.join(book_dir, BUILD_STATE_FILE)
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get("version") != BUILD_STATE_VERSION:
+        return {}
+    return state.get("outputs", {})
+
+
+def save_build_state(book_dir, outputs):
+    """Record output fingerprints for the next incremental build."""
+    state_path = os.path.join(book_dir, BUILD_STATE_FILE)
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": BUILD_STATE_VERSION, "outputs": outputs},
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+
+
+def remove_stale_outputs(previous_outputs, outputs):
+    """Delete files the previous build produced that this build did not.
+
+    Directories left empty are pruned. Returns the number of files removed.
+    """
+    removed = 0
+    dirs = set()
+    for path in previous_outputs:
+        if path in outputs:
+            continue
+        for stale in (path, path + ".wmf.backup"):
+            if os.path.exists(stale):
+                os.remove(stale)
+                removed += 1
+        dirs.add(os.path.dirname(path))
+
+    # Prune directories left empty, deepest first
+    for directory in sorted(dirs, key=len, reverse=True):
+        while directory and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+    return removed
 
 
 def build_document_order(chapters, title_map):
@@ -271,227 +428,1354 @@ def build_section_json(
     }
 
 
-# Import functions from test_first_error.py
-def normalize_for_comparison(text):
-    """Normalize text for comparison - lowercase, common OCR fixes."""
-    if not text:
-        return ""
-    text = text.lower()
-    text = re.sub(r"\b[Il](\d)", r"1\1", text)
-    text = re.sub(r"\b[O](\d)", r"0\1", text)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+def collect_sections(
+    doc_order, chapter_elements, section_elements, subsection_elements
+):
+    """Return the sections to write, in document order.
 
+    Each section is a dict with its position in *doc_order*, numbers,
+    title, output names, human-readable section_id (also the pictures
+    path), IR elements and Markdown file name.
+    """
+    sections = []
+    for position, entry in enumerate(doc_order):
+        (
+            chapter_num,
+            section_num,
+            subsection_num,
+            title,
+            chapter_dir_name,
+            file_name,
+            chapter_slug,
+            section_slug,
+            subsection_slug,
+        ) = entry
+
+        # Elements and Markdown file name for this level
+        if section_num == 0:
+            elements = chapter_elements.get(chapter_num)
+            md_name = "intro.md"
+        elif subsection_num is None:
+            elements = section_elements.get((chapter_num, section_num))
+            md_name = f"section_{section_num:02d}.md"
+        else:
+            elements = subsection_elements.get(
+                (chapter_num, section_num, subsection_num)
+            )
+            md_name = f"section_{section_num:02d}_{subsection_num:02d}.md"
 
-def load_exceptions(exceptions_file="conf/exceptions.conf"):
-    """Load TOC exceptions from configuration file."""
-    exceptions = {}
-    if not os.path.exists(exceptions_file):
-        return exceptions
-    try:
-        with open(exceptions_file, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                if "=" in line:
-                    wrong_part, correct_part = line.split("=", 1)
-                    wrong_part = wrong_part.strip()
-                    correct_part = correct_part.strip()
-                    wrong_match = re.match(r"^([\d.]+)", wrong_part)
-                    correct_match = re.match(r"^([\d.]+)", correct_part)
-                    if wrong_match and correct_match:
-                        wrong_num = wrong_match.group(1)
-                        correct_num = correct_match.group(1)
-                        exceptions[wrong_num] = correct_num
-    except Exception as e:
-        print(f"Warning: Could not load exceptions file: {e}")
-    return exceptions
+        # Chapter intros are only written when they have content
+        if section_num == 0 and not elements:
+            continue
 
+        sections.append(
+            {
+                "position": position,
+                "chapter_num": chapter_num,
+                "section_num": section_num,
+                "subsection_num": subsection_num,
+                "title": title,
+                "chapter_dir_name": chapter_dir_name,
+                "file_name": file_name,
+                "section_id": build_section_id(
+                    chapter_slug, section_slug, subsection_slug
+                ),
+                "elements": elements,
+                "md_name": md_name,
+            }
+        )
+    return sections
 
-def normalize_toc_text(text):
-    """Normalize text for TOC parsing."""
-    if not text:
-        return ""
-    # Remove page numbers and dots
-    text = re.sub(r"\s*\.{2,}\s*\d+\s*$", "", text)
-    # Clean up whitespace
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
 
+def get_prev_next_ids(doc_order, book_id, position):
+    """Get prev and next document IDs for a given position in doc_order."""
+    prev_id = None
+    next_id = None
 
-def is_toc_false_positive(text, entry_type, chapter, section=None, subsection=None):
-    """Check if this is a false positive (not an actual TOC entry)."""
-    # Filter out dosage patterns like "0.2 mg/kg" - must have unit immediately after number
-    if re.search(r"\d+\.\d+\s*(mg|ml|kg|g(?!\w)|lb|%|cc)\b", text, re.IGNORECASE):
-        return True
+    if position > 0:
+        prev_entry = doc_order[position - 1]
+        prev_id = f"{book_id}/{prev_entry[4]}/{prev_entry[5]}"
 
-    # Filter out age patterns like "1.5 years"
-    if re.search(r"\d+\.\d+\s*(year|month|week|day|hour)", text, re.IGNORECASE):
-        return True
+    if position < len(doc_order) - 1:
+        next_entry = doc_order[position + 1]
+        next_id = f"{book_id}/{next_entry[4]}/{next_entry[5]}"
 
-    # Filter out decimal numbers in context like "0.5 pour-on"
-    if re.match(r"^0\.\d+\s", text):
-        return True
+    return prev_id, next_id
 
-    # Chapter 0 is likely false positives
-    if chapter == 0:
-        return True
 
-    # Section titles should have substantial text after the number
-    # Handle extra spaces in numbering like "3. 1" or "21. 2"
-    text_after_number = re.sub(r"^\d+\.\s*\d+(?:\.\s*\d+)?\s*", "", text)
-    if len(text_after_number) < 3:
-        return True
+def render_section_content(elements, image_json):
+    """Render a section's IR elements as JSON content items.
 
-    # Title should start with a capital letter or quotation mark (after number)
-    # Support both regular quotes and Unicode smart quotes (U+201C, U+201D, U+2018, U+2019)
-    if text_after_number and not (
-        text_after_number[0].isupper()
-        or text_after_number[0] in "\"''\u201c\u201d\u2018\u2019"
-    ):
-        return True
+    *image_json(image_ref, image_index, alt, caption)* places an image and
+    returns its content item.
+    """
+    content = []
+    for elem_type, elem in elements or []:
+        if elem_type == "paragraph":
+            content.append(extract_paragraph_json(elem))
+        elif elem_type == "table":
+            content.append(extract_table_json(elem))
+        elif elem_type == "table_cell":
+            content.append(extract_table_cell_json(elem))
+        elif elem_type == "image":
+            # elem is a tuple: (image_ref, image_index, alt, caption)
+            if isinstance(elem, tuple) and len(elem) >= 2:
+                alt_text = elem[2] if len(elem) > 2 else ""
+                caption_text = elem[3] if len(elem) > 3 else ""
+                content.append(image_json(elem[0], elem[1], alt_text, caption_text))
+    return content
+
+
+def document_section_titles(doc_order):
+    """Map (chapter, section, subsection) to clean titles, for title paths."""
+    return {entry[:3]: clean_title(entry[3]) for entry in doc_order}
+
+
+def section_title_path(section, section_titles):
+    """Chapter, section and subsection titles leading to *section*."""
+    chapter_num = section["chapter_num"]
+    title_path = [section_titles[(chapter_num, 0, None)]]
+    if section["section_num"]:
+        title_path.append(section_titles[(chapter_num, section["section_num"], None)])
+    if section["subsection_num"] is not None:
+        title_path.append(clean_title(section["title"]))
+    return title_path
+
+
+def section_stat(content, section_text):
+    """Navigation stats of a section: item count and JSON size in bytes."""
+    return {"items": len(content), "bytes": len(section_text.encode("utf-8"))}
+
+
+def section_chunks(section, section_json, section_titles, config):
+    """Yield the RAG chunk records of one section (see chunk_section)."""
+    return chunk_section(
+        section_json,
+        section_title_path(section, section_titles),
+        config["chunk_max_tokens"],
+        config["chunk_overlap_tokens"],
+    )
 
-    return False
 
+def render_section_markdown(section):
+    """Render a section's Markdown file.
 
-def extract_toc_from_document(doc):
-    """Extract TOC entries directly from the document."""
-    toc_entries = []
-    in_toc = False
-    consecutive_non_toc = 0
+    Returns (text, images) where images are (image index, picture path
+    relative to the chapter's Markdown folder) pairs.
+    """
+    md_content = list(section["elements"])
+    images = []
+    for elem_type, elem in section["elements"]:
+        if elem_type == "image" and isinstance(elem, tuple) and len(elem) >= 2:
+            img_path = f"pictures/image_{elem[1]:03d}.png"
+            md_content.append(("image", img_path))
+            images.append((elem[1], img_path))
+    text = render_markdown_file(
+        md_content,
+        section["chapter_num"],
+        section["section_num"] or None,
+        section["subsection_num"],
+    )
+    return text, images
 
-    for para in doc.paragraphs:
-        text = para.text.strip()
 
-        # Detect TOC section (entries with dots leading to page numbers)
-        if "....." in text or "....." in text.replace(" ", ""):
-            in_toc = True
-            consecutive_non_toc = 0
+def render_markdown_sections(sections):
+    """Render the Markdown file of every section that has content.
 
-        # Stop when we hit substantial content after TOC
-        if in_toc and text and not "..." in text:
-            # Check if this looks like a TOC entry without dots
-            if not re.match(r"^\d+\.\d+", text):
-                consecutive_non_toc += 1
-                if consecutive_non_toc > 50:
-                    break
-                continue
-            else:
-                consecutive_non_toc = 0
+    Returns (section, text, images) triples in document order (see
+    render_section_markdown).
+    """
+    return [
+        (section, *render_section_markdown(section))
+        for section in sections
+        if section["elements"] is not None
+    ]
 
-        if in_toc and text:
-            # Extract TOC entry
-            normalized = normalize_toc_text(text)
 
-            # Match chapter pattern (N.0) - handle extra spaces
-            chapter_match = re.match(r"^(\d+)\.\s*0\s+(.+)", normalized)
-            if chapter_match:
-                chapter = int(chapter_match.group(1))
-                if not is_toc_false_positive(normalized, "chapter", chapter):
-                    toc_entries.append(
-                        {
-                            "type": "chapter",
-                            "chapter": chapter,
-                            "section": 0,
-                            "subsection": None,
-                            "title": normalized,
-                        }
-                    )
-                continue
+# ============================================================================
+# Compact and Precompressed JSON Output
+# ============================================================================
 
-            # Match section pattern (N.X where X > 0) - handle extra spaces
-            section_match = re.match(r"^(\d+)\.\s*(\d+)\s+(.+)", normalized)
-            if section_match and int(section_match.group(2)) > 0:
-                chapter = int(section_match.group(1))
-                section = int(section_match.group(2))
-                if not is_toc_false_positive(normalized, "section", chapter, section):
-                    toc_entries.append(
-                        {
-                            "type": "section",
-                            "chapter": chapter,
-                            "section": section,
-                            "subsection": None,
-                            "title": normalized,
-                        }
-                    )
-                continue
+SIZE_REPORT_LOG = "size_report.log"
+PRECOMPRESS_SUFFIXES = {"gzip": ".gz", "br": ".br"}
 
-            # Match subsection pattern (N.X.Y) - handle extra spaces
-            subsection_match = re.match(
-                r"^(\d+)\.\s*(\d+)\.\s*(\d+)\s+(.+)", normalized
-            )
-            if subsection_match:
-                chapter = int(subsection_match.group(1))
-                section = int(subsection_match.group(2))
-                subsection = int(subsection_match.group(3))
-                if not is_toc_false_positive(
-                    normalized, "subsection", chapter, section, subsection
-                ):
-                    toc_entries.append(
-                        {
-                            "type": "subsection",
-                            "chapter": chapter,
-                            "section": section,
-                            "subsection": subsection,
-                            "title": normalized,
-                        }
-                    )
+
+def dump_json(data, compact=False):
+    """Serialise an output JSON document in the configured style."""
+    if compact:
+        return json.dumps(data, separators=(",", ":"))
+    return json.dumps(data, indent=2)
+
+
+def available_precompress_formats(formats):
+    """Filter *formats* to known ones whose compressor is installed."""
+    available = []
+    for fmt in formats:
+        if fmt not in PRECOMPRESS_SUFFIXES:
+            print(f"Warning: unknown precompress format {fmt!r}, skipping")
+        elif fmt == "br":
+            try:
+                import brotli  # noqa: F401
+            except ImportError:
+                print("Warning: brotli not installed, skipping .br files")
                 continue
+            available.append(fmt)
+        else:
+            available.append(fmt)
+    return available
 
-    return toc_entries
 
+def precompress_file(path, fmt, reuse=False):
+    """Write ``path + suffix`` compressed with *fmt* ("gzip" or "br").
 
-def build_toc_structure(toc_entries):
-    """Convert flat TOC entries into expected sequence for validation."""
-    expected_sequence = []
+    With *reuse*, an existing sibling is kept as it is: the caller knows
+    from the build state that it was compressed from the same content.
+    Returns (sibling_path, sibling_size, sha256), sha256 being None for a
+    reused sibling. gzip output uses mtime=0 so unchanged input gives
+    byte-identical output.
+    """
+    sibling = path + PRECOMPRESS_SUFFIXES[fmt]
+    if reuse:
+        try:
+            return sibling, os.path.getsize(sibling), None
+        except FileNotFoundError:
+            pass
 
-    for entry in toc_entries:
-        expected_sequence.append(
-            {
-                "type": entry["type"],
-                "chapter": entry["chapter"],
-                "section": entry.get("section", 0),
-                "subsection": entry.get("subsection"),
-                "title": entry["title"],
-                "title_normalized": normalize_for_comparison(entry["title"]),
-            }
-        )
+    with open(path, "rb") as f:
+        data = f.read()
+    if fmt == "gzip":
+        import gzip
 
-    return expected_sequence
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    else:
+        import brotli
 
+        compressed = brotli.compress(data, quality=11)
+    tmp_path = sibling + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(compressed)
+    os.replace(tmp_path, sibling)
+    return sibling, len(compressed), content_fingerprint(compressed)
 
-def extract_number_and_title(text, doc, para_index):
-    """Extract section number and title from text."""
-    if not text:
-        return None
 
-    text = re.sub(r"\s*\.{2,}.*$", "", text).strip()
+def precompress_fingerprint(fmt, source_fingerprint):
+    """Build-state fingerprint of a sibling: format plus source content hash."""
+    return f"{fmt}:{source_fingerprint}"
 
-    # Handle "Chapter N.0" or "Chapter N:" patterns
-    chapter_match = re.match(r"^Chapter\s+(\d+)\.0\s+(.+)", text, re.IGNORECASE)
-    if chapter_match:
-        text = chapter_match.group(1) + ".0 " + chapter_match.group(2)
-    else:
-        chapter_colon_match = re.match(r"^Chapter\s+(\d+):\s+(.+)", text, re.IGNORECASE)
-        if chapter_colon_match:
-            text = chapter_colon_match.group(1) + ".0 " + chapter_colon_match.group(2)
 
-    # Check for embedded section number
-    embedded_match = re.search(r"\D\.(\d+\.\d+(?:\.\d+)?)\s+([A-Z])", text)
-    if embedded_match:
-        start_pos = embedded_match.start(1)
-        text = text[start_pos:]
+def precompress_outputs(paths, formats, jobs=None, reusable=()):
+    """Compress every path in every format concurrently.
 
-    # Fix common OCR errors
-    text = re.sub(r"^[Il](\d)", r"1\1", text)
-    text = re.sub(r"^(\d+)\.[Il]", r"\1.1", text)
-    text = re.sub(r"^(\d+)\.(\d+)\.[Il]", r"\1.\2.1", text)
-    text = re.sub(r"^(\d+)\.\s+(\d+)", r"\1.\2", text)
+    Siblings listed in *reusable* are kept if they exist (see
+    precompress_file). Returns ({format: total compressed bytes},
+    {sibling path: sha256, or None if reused}).
+    """
+    from concurrent.futures import ThreadPoolExecutor
 
-    # Look ahead for continuation lines
-    combined_text = text
-    use_dotall = False
+    reusable = set(reusable)
+    tasks = [
+        (path, fmt, path + PRECOMPRESS_SUFFIXES[fmt] in reusable)
+        for path in paths
+        for fmt in formats
+    ]
+    totals = dict.fromkeys(formats, 0)
+    siblings = {}
+    # zlib and brotli release the GIL while compressing
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+        results = executor.map(lambda task: precompress_file(*task), tasks)
+        for (_, fmt, _), (sibling, size, sha256) in zip(tasks, results):
+            totals[fmt] += size
+            siblings[sibling] = sha256
+    return totals, siblings
+
+
+def write_size_report(log_dir, file_count, sizes):
+    """Write and print the per-book size table (``size_report.log``).
+
+    *sizes* maps mode name ("indent=2", "compact", "gzip", "br") to total
+    bytes over the *file_count* JSON files.
+    """
+    baseline = sizes.get("indent=2") or 1
+    lines = [
+        f"JSON output sizes ({file_count} files)",
+        f"{'mode':<10} {'bytes':>12} {'vs indent=2':>12}",
+    ]
+    for mode, size in sizes.items():
+        lines.append(f"{mode:<10} {size:>12,} {size / baseline:>11.1%}")
+
+    for line in lines:
+        print(f"  {line}")
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, SIZE_REPORT_LOG)
+    with open(log_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"  Log written to {log_path}")
+    return log_path
+
+
+# ============================================================================
+# Build Manifest (every exported file with size and SHA-256)
+# ============================================================================
+
+BUILD_MANIFEST_FILE = "_build_manifest.json"
+BUILD_MANIFEST_VERSION = 1
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read in chunks."""
+    import hashlib
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(IMAGE_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def output_file_type(rel_path):
+    """Classify an exported file by its path relative to the export root."""
+    parts = rel_path.split("/")
+    name = parts[-1]
+    if name.endswith(tuple(PRECOMPRESS_SUFFIXES.values())):
+        return "precompressed"
+    if name.endswith(".log"):
+        return "log"
+    if name == "manifest.json":
+        return "pictures-manifest"
+    if "pictures" in parts[:-1]:
+        return "image"
+    if any(part.startswith("_") for part in parts[:-1]):
+        return "index"
+    if name.startswith("_"):
+        return "book"
+    return "section"
+
+
+def load_build_manifest(book_dir):
+    """Return {relative path: entry} from the previous build manifest."""
+    try:
+        with open(os.path.join(book_dir, BUILD_MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != BUILD_MANIFEST_VERSION:
+        return {}
+    return {entry["path"]: entry for entry in manifest["files"]}
+
+
+def write_build_manifest(
+    book_dir, export_root, book_id, outputs, content_hashes, kept, file_sections
+):
+    """Write _build_manifest.json listing every output under *export_root*.
+
+    Hashes already known from writing (*content_hashes*) are reused, as are
+    the previous manifest's hashes for files an incremental build kept;
+    everything else is hashed from disk. Returns the manifest path.
+    """
+    previous = load_build_manifest(book_dir)
+    manifest_path = os.path.join(book_dir, BUILD_MANIFEST_FILE)
+    skip = {manifest_path, os.path.join(book_dir, BUILD_STATE_FILE)}
+
+    files = []
+    for path in outputs:
+        if path in skip or not os.path.isfile(path):
+            continue
+        rel_path = os.path.relpath(path, export_root).replace(os.sep, "/")
+        if rel_path.startswith("../"):
+            continue  # Markdown export lives outside the export root
+
+        sha256 = content_hashes.get(path)
+        if sha256 is None and path in kept and rel_path in previous:
+            sha256 = previous[rel_path]["sha256"]
+        if sha256 is None:
+            sha256 = file_sha256(path)
+
+        section = file_sections.get(path)
+        if section is None:
+            source, ext = os.path.splitext(path)
+            if ext in PRECOMPRESS_SUFFIXES.values():
+                section = file_sections.get(source)
+        if section is None and path in kept and rel_path in previous:
+            section = previous[rel_path]["section"]
+
+        files.append(
+            {
+                "path": rel_path,
+                "size": os.path.getsize(path),
+                "sha256": sha256,
+                "type": output_file_type(rel_path),
+                "section": section,
+            }
+        )
+
+    files.sort(key=lambda entry: entry["path"])
+    manifest = {
+        "version": BUILD_MANIFEST_VERSION,
+        "book": book_id,
+        "root": export_root,
+        "files": files,
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✓ Created {manifest_path} ({len(files)} files)")
+    return manifest_path
+
+
+# ============================================================================
+# Section Writers (output encodings for section documents)
+# ============================================================================
+
+
+class SectionWriter:
+    """Encode the dict from build_section_json() for one output format.
+
+    Subclasses set ``name`` and ``extension`` and implement encode(), which
+    returns the file contents as str (written as UTF-8) or bytes. Every
+    writer receives the same dict, so all formats share one schema.
+    """
+
+    name = None
+    extension = None
+
+    def encode(self, section_json):
+        raise NotImplementedError
+
+
+class JsonSectionWriter(SectionWriter):
+    name = "json"
+    extension = ".json"
+
+    def __init__(self, compact=False):
+        self.compact = compact
+
+    def encode(self, section_json):
+        return dump_json(section_json, self.compact)
+
+
+class MsgpackSectionWriter(SectionWriter):
+    name = "msgpack"
+    extension = ".msgpack"
+
+    def __init__(self):
+        import msgpack
+
+        self._packb = msgpack.packb
+
+    def encode(self, section_json):
+        return self._packb(section_json, use_bin_type=True)
+
+
+class CborSectionWriter(SectionWriter):
+    name = "cbor"
+    extension = ".cbor"
+
+    def __init__(self):
+        import cbor2
+
+        self._dumps = cbor2.dumps
+
+    def encode(self, section_json):
+        return self._dumps(section_json)
+
+
+SECTION_WRITERS = {
+    "json": JsonSectionWriter,
+    "msgpack": MsgpackSectionWriter,
+    "cbor": CborSectionWriter,
+}
+
+
+def create_section_writers(formats, compact_json=False):
+    """Return the section writers for *formats*, JSON always first.
+
+    JSON is always written because validation and the book-level outputs
+    read it; unknown formats and missing encoder packages are skipped with
+    a warning.
+    """
+    writers = [JsonSectionWriter(compact_json)]
+    for name in formats:
+        if name == "json":
+            continue
+        writer_class = SECTION_WRITERS.get(name)
+        if writer_class is None:
+            print(f"Warning: unknown section format {name!r}, skipping")
+            continue
+        try:
+            writers.append(writer_class())
+        except ImportError:
+            print(f"Warning: {name} encoder not installed, skipping {name} sections")
+    return writers
+
+
+# ============================================================================
+# Book Bundle (whole book in one file)
+# ============================================================================
+#
+# _book.ndjson holds one JSON document per line:
+#   line 1   header: book metadata, navigation and a byte-offset table
+#   line 2+  section JSON (same structure as the per-section files), in
+#            document order
+# Offsets are relative to the first byte after the header line, so a client
+# reads line 1, then seeks to header_end + offset and reads `length` bytes.
+
+BUNDLE_FILE = "_book.ndjson"
+BUNDLE_FORMAT = "docx2app-bundle"
+BUNDLE_VERSION = 1
+
+
+def render_book_bundle(config, records):
+    """Render the bundle text from (section_info, section_json) records.
+
+    *section_info* carries chapter_num, section_num, subsection_num and
+    chapter_dir_name/file_name for the navigation entry.
+    """
+    lines = []
+    navigation = []
+    offset = 0
+    for info, section_json in records:
+        line = json.dumps(section_json, ensure_ascii=False, separators=(",", ":"))
+        length = len(line.encode("utf-8")) + 1  # Including the newline
+        navigation.append(
+            {
+                "id": section_json["id"],
+                "section_id": section_json["section_id"],
+                "title": section_json["title"],
+                "chapter": info["chapter_num"],
+                "section": info["section_num"],
+                "subsection": info["subsection_num"],
+                "path": f"{info['chapter_dir_name']}/{info['file_name']}.json",
+                "offset": offset,
+                "length": length,
+            }
+        )
+        lines.append(line)
+        offset += length
+
+    header = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "book": {
+            "canonical_id": config["canonical_id"],
+            "language": config["language"],
+            "title": config["title"],
+        },
+        "sections": navigation,
+    }
+    header_line = json.dumps(header, ensure_ascii=False, separators=(",", ":"))
+    return "\n".join([header_line] + lines) + "\n"
+
+
+def read_bundle_header(bundle_path):
+    """Return (header, header_end) for a bundle file."""
+    with open(bundle_path, "rb") as f:
+        header_line = f.readline()
+    return json.loads(header_line), len(header_line)
+
+
+def read_bundle_section(bundle_path, key, header=None):
+    """Read one section from a bundle by position, id or section_id."""
+    if header is None:
+        header, header_end = read_bundle_header(bundle_path)
+    else:
+        header, header_end = header
+    sections = header["sections"]
+    if isinstance(key, int):
+        entry = sections[key]
+    else:
+        entry = next((s for s in sections if key in (s["id"], s["section_id"])), None)
+        if entry is None:
+            raise KeyError(key)
+    with open(bundle_path, "rb") as f:
+        f.seek(header_end + entry["offset"])
+        return json.loads(f.read(entry["length"]))
+
+
+# ============================================================================
+# SQLite Export (sections, content and FTS5 search in one database)
+# ============================================================================
+
+SQLITE_FILE = "_book.sqlite"
+
+SQLITE_SCHEMA = """
+CREATE TABLE book (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE sections (
+    position INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    section_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    chapter INTEGER NOT NULL,
+    section INTEGER NOT NULL,
+    subsection INTEGER,
+    prev_id TEXT,
+    next_id TEXT,
+    path TEXT NOT NULL
+);
+CREATE TABLE content (
+    section_position INTEGER NOT NULL REFERENCES sections(position),
+    item_index INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    text TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (section_position, item_index)
+);
+CREATE TABLE images (
+    section_position INTEGER NOT NULL REFERENCES sections(position),
+    path TEXT NOT NULL,
+    alt TEXT NOT NULL,
+    caption TEXT NOT NULL
+);
+CREATE INDEX images_section ON images(section_position);
+"""
+
+SQLITE_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE sections_fts USING fts5(
+    title, body, content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+
+def content_item_text(item):
+    """Plain text of a JSON content item, as indexed for search."""
+    if item["type"] == "table":
+        return "\n".join(
+            " | ".join(cell["text"] for cell in row["cells"]) for row in item["rows"]
+        )
+    if item["type"] == "image":
+        return " ".join(part for part in (item["alt"], item["caption"]) if part)
+    return item.get("text", "")
+
+
+def write_book_sqlite(db_path, config, records):
+    """Write the book to a fresh SQLite database in a single transaction.
+
+    *records* are (section_info, section_json) pairs in document order. The
+    FTS5 table ``sections_fts`` (rowid = sections.position) indexes titles
+    and paragraph/table text; it is skipped with a warning when the SQLite
+    library was built without FTS5.
+    """
+    import sqlite3
+
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SQLITE_SCHEMA)
+        try:
+            conn.executescript(SQLITE_FTS_SCHEMA)
+            has_fts = True
+        except sqlite3.OperationalError as e:
+            print(f"Warning: SQLite FTS5 unavailable ({e}), skipping search index")
+            has_fts = False
+
+        section_rows = []
+        content_rows = []
+        image_rows = []
+        fts_rows = []
+        for position, (info, section_json) in enumerate(records):
+            links = {link["type"]: link["target"] for link in section_json["links"]}
+            section_rows.append(
+                (
+                    position,
+                    section_json["id"],
+                    section_json["section_id"],
+                    section_json["title"],
+                    info["chapter_num"],
+                    info["section_num"],
+                    info["subsection_num"],
+                    links.get("previous"),
+                    links.get("next"),
+                    f"{info['chapter_dir_name']}/{info['file_name']}.json",
+                )
+            )
+            body = []
+            for item_index, item in enumerate(section_json["content"]):
+                text = content_item_text(item)
+                content_rows.append(
+                    (
+                        position,
+                        item_index,
+                        item["type"],
+                        text,
+                        json.dumps(item, ensure_ascii=False),
+                    )
+                )
+                if item["type"] == "image":
+                    image_rows.append(
+                        (position, item["path"], item["alt"], item["caption"])
+                    )
+                elif text:
+                    body.append(text)
+            fts_rows.append((position, section_json["title"], "\n".join(body)))
+
+        with conn:  # One transaction for the whole book
+            conn.executemany(
+                "INSERT INTO book (key, value) VALUES (?, ?)",
+                [
+                    ("canonical_id", config["canonical_id"]),
+                    ("language", config["language"]),
+                    ("title", config["title"]),
+                ],
+            )
+            conn.executemany(
+                "INSERT INTO sections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                section_rows,
+            )
+            conn.executemany("INSERT INTO content VALUES (?, ?, ?, ?, ?)", content_rows)
+            conn.executemany("INSERT INTO images VALUES (?, ?, ?, ?)", image_rows)
+            if has_fts:
+                conn.executemany(
+                    "INSERT INTO sections_fts (rowid, title, body) VALUES (?, ?, ?)",
+                    fts_rows,
+                )
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return len(section_rows)
+
+
+# ============================================================================
+# Static Search Index (prebuilt inverted index, sharded by term prefix)
+# ============================================================================
+#
+# _search/index.json  tokenizer settings, documents and the shard table
+# _search/<shard>.json  {term: [position, tf, position, tf, ...], ...}
+# Positions index build_document_order(); clients must tokenize queries
+# with the same rules (see tokenize_text()).
+
+SEARCH_INDEX_DIR = "_search"
+SEARCH_INDEX_VERSION = 1
+SEARCH_SHARD_PREFIX_LENGTH = 2  # Characters of the term used as shard key
+
+# Small stopword lists keyed by ISO 639-2 code (book_config.toml language)
+STOPWORDS = {
+    "eng": (
+        "a an and are as at be but by for from has have he her his in is it its "
+        "of on or she that the their them they this to was were which will with"
+    ),
+    "fra": (
+        "au aux avec ce ces dans de des du elle en est et il ils je la le les "
+        "leur mais ne nous ou par pas pour qui que sa se son sont sur un une"
+    ),
+    "spa": (
+        "al con de del el en es la las lo los más no o para pero por que se "
+        "su sus un una y"
+    ),
+    "deu": (
+        "als auch auf aus bei das dem den der des die ein eine einer es für "
+        "ist im in mit nicht oder sich sie und von zu zum zur"
+    ),
+    "por": (
+        "a ao as com da das de do dos e em na nas no nos o os para por que se "
+        "sua seu um uma"
+    ),
+}
+
+# Scripts written without spaces are indexed as overlapping character pairs
+CJK_LANGUAGES = {"zho", "chi", "jpn", "kor"}
+CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]+")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def strip_diacritics(text):
+    """Drop combining marks from *text* ("más" -> "mas")."""
+    import unicodedata
+
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def search_stopwords(language):
+    """Return the stopword set for an ISO 639-2 language code.
+
+    Stopwords are normalised the way tokenize_text() normalises terms, so
+    "más" and "für" match the indexed "mas" and "fur".
+    """
+    import unicodedata
+
+    return frozenset(
+        strip_diacritics(unicodedata.normalize("NFKC", word).lower())
+        for word in STOPWORDS.get(language, "").split()
+    )
+
+
+def tokenize_text(text, language="eng", stopwords=None):
+    """Split text into index terms for *language*.
+
+    Text is NFKC-normalised, lowercased and stripped of diacritics; terms
+    shorter than two characters and stopwords are dropped. For CJK
+    languages, runs of CJK characters become overlapping bigrams.
+    """
+    import unicodedata
+
+    if stopwords is None:
+        stopwords = search_stopwords(language)
+
+    text = unicodedata.normalize("NFKC", text).lower()
+    terms = []
+    if language in CJK_LANGUAGES:
+        for run in CJK_PATTERN.findall(text):
+            if len(run) == 1:
+                terms.append(run)
+            terms.extend(run[i : i + 2] for i in range(len(run) - 1))
+        text = CJK_PATTERN.sub(" ", text)
+
+    for word in WORD_PATTERN.findall(strip_diacritics(text)):
+        if len(word) >= 2 and word not in stopwords:
+            terms.append(word)
+    return terms
+
+
+def search_shard_name(term):
+    """File-name-safe shard key for a term (its first characters)."""
+    prefix = term[:SEARCH_SHARD_PREFIX_LENGTH]
+    if prefix.isascii() and prefix.isalnum():
+        return prefix
+    return "x" + "_".join(f"{ord(c):x}" for c in prefix)
+
+
+def build_search_index(records, language):
+    """Build the inverted index over (section_info, section_json) records.
+
+    Returns (index_meta, shards) where shards maps shard name to a
+    {term: [position, tf, ...]} dict.
+    """
+    stopwords = search_stopwords(language)
+    postings = {}
+    documents = []
+    for info, section_json in records:
+        position = info["position"]
+        text = [section_json["title"]]
+        text.extend(content_item_text(item) for item in section_json["content"])
+        terms = tokenize_text("\n".join(text), language, stopwords)
+        documents.append(
+            {
+                "position": position,
+                "id": section_json["id"],
+                "title": section_json["title"],
+                "length": len(terms),
+            }
+        )
+        for term, tf in collections.Counter(terms).items():
+            postings.setdefault(term, []).extend((position, tf))
+
+    shards = {}
+    for term in sorted(postings):
+        shards.setdefault(search_shard_name(term), {})[term] = postings[term]
+
+    index_meta = {
+        "version": SEARCH_INDEX_VERSION,
+        "tokenizer": {
+            "language": language,
+            "normalize": "NFKC, lowercase, strip diacritics",
+            "min_length": 2,
+            "cjk_bigrams": language in CJK_LANGUAGES,
+            "stopwords": sorted(stopwords),
+        },
+        "shard_prefix_length": SEARCH_SHARD_PREFIX_LENGTH,
+        "documents": documents,
+        "terms": len(postings),
+        "shards": {name: f"{name}.json" for name in sorted(shards)},
+    }
+    return index_meta, shards
+
+
+# ============================================================================
+# RAG Chunks (token-bounded chunks streamed to JSONL)
+# ============================================================================
+
+RAG_CHUNKS_FILE = "_chunks.jsonl"
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+")
+TOKEN_ESTIMATE_PATTERN = re.compile(r"\w+|[^\w\s]")
+_token_encoder = None
+
+
+def count_tokens(text):
+    """Count tokens with tiktoken when installed, else estimate them.
+
+    The estimate counts words and punctuation marks, which is close to
+    (slightly below) what BPE tokenizers produce for English prose.
+    """
+    global _token_encoder
+    if _token_encoder is None:
+        try:
+            import tiktoken
+
+            _token_encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # Not installed, or encoding unavailable offline
+            _token_encoder = False
+    if _token_encoder:
+        return len(_token_encoder.encode(text))
+    return len(TOKEN_ESTIMATE_PATTERN.findall(text))
+
+
+def split_oversized_text(text, max_tokens):
+    """Split text over *max_tokens* at sentence, then word boundaries."""
+    pieces = []
+    current = []
+    current_tokens = 0
+    for sentence in SENTENCE_SPLIT_PATTERN.split(text):
+        # Sentences that are too long on their own are split into words
+        parts = [sentence]
+        if count_tokens(sentence) > max_tokens:
+            parts = sentence.split()
+        for part in parts:
+            tokens = count_tokens(part)
+            if current and current_tokens + tokens > max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+                current_tokens = 0
+            current.append(part)
+            current_tokens += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def section_chunk_units(content, max_tokens):
+    """Yield (text, tokens, image) units for a section's content items.
+
+    Paragraphs and tables are kept whole unless they exceed *max_tokens*
+    (tables are then split between rows). Images yield a unit without text
+    so they attach to the chunk they appear in.
+    """
+    for item in content:
+        if item["type"] == "image":
+            yield "", 0, {k: item[k] for k in ("path", "alt", "caption")}
+            continue
+        text = content_item_text(item).strip()
+        if not text:
+            continue
+        tokens = count_tokens(text)
+        if tokens <= max_tokens:
+            yield text, tokens, None
+        elif item["type"] == "table":
+            for row_text in text.split("\n"):
+                for piece in split_oversized_text(row_text, max_tokens):
+                    yield piece, count_tokens(piece), None
+        else:
+            for piece in split_oversized_text(text, max_tokens):
+                yield piece, count_tokens(piece), None
+
+
+def chunk_section(section_json, title_path, max_tokens, overlap_tokens):
+    """Yield token-bounded chunk records for one section.
+
+    Chunks never cut a paragraph or table row in two (unless it is larger
+    than the budget by itself); each chunk after the first starts with the
+    trailing units of the previous one, up to *overlap_tokens* and only as
+    far as the budget leaves room next to the following unit.
+    """
+    units = []
+    tokens = 0
+    chunk_num = 0
+
+    def make_chunk():
+        return {
+            "id": f"{section_json['id']}#{chunk_num:03d}",
+            "doc_id": section_json["id"],
+            "section_id": section_json["section_id"],
+            "title_path": title_path,
+            "chunk": chunk_num,
+            "text": "\n\n".join(text for text, _, _ in units if text),
+            "tokens": tokens,
+            "images": [image for _, _, image in units if image],
+        }
+
+    for unit in section_chunk_units(section_json["content"], max_tokens):
+        if tokens + unit[1] > max_tokens and any(text for text, _, _ in units):
+            yield make_chunk()
+            chunk_num += 1
+            # Carry trailing text units over as overlap
+            overlap = []
+            overlap_total = 0
+            for text, count, image in reversed(units):
+                if image or overlap_total + count > overlap_tokens:
+                    break
+                overlap.insert(0, (text, count, None))
+                overlap_total += count
+            if len(overlap) == len(units):
+                overlap = []
+                overlap_total = 0
+            # Drop the oldest overlap units until the next unit fits
+            while overlap and overlap_total + unit[1] > max_tokens:
+                overlap_total -= overlap.pop(0)[1]
+            units = overlap
+            tokens = overlap_total
+        units.append(unit)
+        tokens += unit[1]
+
+    if any(text for text, _, _ in units) or any(image for _, _, image in units):
+        yield make_chunk()
+
+
+def dump_jsonl_record(record):
+    """One compact JSON line for a JSONL file."""
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+# ============================================================================
+# BM25 Retrieval Index (NumPy arrays, loaded with mmap by query_index.py)
+# ============================================================================
+#
+# _bm25/meta.json      language, k1, b, document count and unit
+# _bm25/vocab.json     term -> column
+# _bm25/doc_ids.json   row -> section or chunk id
+# _bm25/indptr.npy     postings of column c are [indptr[c], indptr[c + 1])
+# _bm25/docs.npy       document row of each posting (int32)
+# _bm25/weights.npy    precomputed BM25 weight of each posting (float32)
+# Together these are the document-term matrix in CSC layout, so a query
+# only touches the postings of its own terms.
+
+BM25_INDEX_DIR = "_bm25"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def iter_bm25_documents(records, unit="sections", chunks_path=None):
+    """Yield (doc_id, text) for sections or for the streamed RAG chunks."""
+    if unit == "chunks":
+        with open(chunks_path, "r", encoding="utf-8") as f:
+            for line in f:
+                chunk = json.loads(line)
+                yield chunk["id"], " ".join(chunk["title_path"] + [chunk["text"]])
+        return
+    for _, section_json in records:
+        text = [section_json["title"]]
+        text.extend(content_item_text(item) for item in section_json["content"])
+        yield section_json["id"], "\n".join(text)
+
+
+def build_bm25_index(documents, language, index_dir, unit="sections"):
+    """Tokenize *documents* and save BM25 postings under *index_dir*.
+
+    Returns the list of files written, or None if NumPy is not installed.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        print("Warning: NumPy not installed, skipping BM25 index")
+        return None
+
+    stopwords = search_stopwords(language)
+    vocab = {}
+    doc_ids = []
+    rows = []
+    cols = []
+    tfs = []
+    for doc_id, text in documents:
+        row = len(doc_ids)
+        doc_ids.append(doc_id)
+        counts = collections.Counter(tokenize_text(text, language, stopwords))
+        for term, tf in counts.items():
+            rows.append(row)
+            cols.append(vocab.setdefault(term, len(vocab)))
+            tfs.append(tf)
+
+    rows = np.asarray(rows, dtype=np.int32)
+    cols = np.asarray(cols, dtype=np.int64)
+    tfs = np.asarray(tfs, dtype=np.float32)
+    n_docs = len(doc_ids)
+
+    doc_len = np.bincount(rows, weights=tfs, minlength=n_docs)
+    avg_len = doc_len.mean() if n_docs and doc_len.mean() > 0 else 1.0
+    df = np.bincount(cols, minlength=len(vocab))
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[rows] / avg_len)
+    weights = idf[cols] * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+    # Group postings by term (CSC); stable sort keeps rows ascending
+    order = np.argsort(cols, kind="stable")
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(df, out=indptr[1:])
+
+    os.makedirs(index_dir, exist_ok=True)
+    arrays = {
+        "indptr.npy": indptr,
+        "docs.npy": rows[order],
+        "weights.npy": weights[order].astype(np.float32),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(index_dir, name), array)
+
+    meta = {
+        "language": language,
+        "unit": unit,
+        "k1": BM25_K1,
+        "b": BM25_B,
+        "documents": n_docs,
+        "terms": len(vocab),
+        "avg_length": float(avg_len),
+    }
+    for name, data in (
+        ("meta.json", meta),
+        ("vocab.json", vocab),
+        ("doc_ids.json", doc_ids),
+    ):
+        with open(os.path.join(index_dir, name), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+    return [
+        os.path.join(index_dir, name)
+        for name in list(arrays) + ["meta.json", "vocab.json", "doc_ids.json"]
+    ]
+
+
+def load_bm25_index(index_dir):
+    """Load a BM25 index; the postings arrays are memory-mapped."""
+    import numpy as np
+
+    index = {}
+    for name in ("meta", "vocab", "doc_ids"):
+        with open(os.path.join(index_dir, f"{name}.json"), "r", encoding="utf-8") as f:
+            index[name] = json.load(f)
+    for name in ("indptr", "docs", "weights"):
+        index[name] = np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+    return index
+
+
+def query_bm25(index, query, top_k=10):
+    """Return [(doc_id, score), ...] for the *top_k* best matches."""
+    import numpy as np
+
+    scores = np.zeros(len(index["doc_ids"]), dtype=np.float32)
+    for term in set(tokenize_text(query, index["meta"]["language"])):
+        col = index["vocab"].get(term)
+        if col is None:
+            continue
+        start, end = index["indptr"][col], index["indptr"][col + 1]
+        # A document appears at most once per term, so plain indexing is safe
+        scores[index["docs"][start:end]] += index["weights"][start:end]
+
+    matches = np.flatnonzero(scores)
+    if len(matches) > top_k:
+        matches = matches[np.argpartition(-scores[matches], top_k - 1)[:top_k]]
+    matches = matches[np.argsort(-scores[matches], kind="stable")]
+    return [(index["doc_ids"][i], float(scores[i])) for i in matches]
+
+
+# Import functions from test_first_error.py
+def normalize_for_comparison(text):
+    """Normalize text for comparison - lowercase, common OCR fixes."""
+    if not text:
+        return ""
+    text = text.lower()
+    text = re.sub(r"\b[Il](\d)", r"1\1", text)
+    text = re.sub(r"\b[O](\d)", r"0\1", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+def load_exceptions(exceptions_file="conf/exceptions.conf"):
+    """Load TOC exceptions from configuration file."""
+    exceptions = {}
+    if not os.path.exists(exceptions_file):
+        return exceptions
+    try:
+        with open(exceptions_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if "=" in line:
+                    wrong_part, correct_part = line.split("=", 1)
+                    wrong_part = wrong_part.strip()
+                    correct_part = correct_part.strip()
+                    wrong_match = re.match(r"^([\d.]+)", wrong_part)
+                    correct_match = re.match(r"^([\d.]+)", correct_part)
+                    if wrong_match and correct_match:
+                        wrong_num = wrong_match.group(1)
+                        correct_num = correct_match.group(1)
+                        exceptions[wrong_num] = correct_num
+    except Exception as e:
+        print(f"Warning: Could not load exceptions file: {e}")
+    return exceptions
+
+
+def normalize_toc_text(text):
+    """Normalize text for TOC parsing."""
+    if not text:
+        return ""
+    # Remove page numbers and dots
+    text = re.sub(r"\s*\.{2,}\s*\d+\s*$", "", text)
+    # Clean up whitespace
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+def is_toc_false_positive(text, entry_type, chapter, section=None, subsection=None):
+    """Check if this is a false positive (not an actual TOC entry)."""
+    # Filter out dosage patterns like "0.2 mg/kg" - must have unit immediately after number
+    if re.search(r"\d+\.\d+\s*(mg|ml|kg|g(?!\w)|lb|%|cc)\b", text, re.IGNORECASE):
+        return True
+
+    # Filter out age patterns like "1.5 years"
+    if re.search(r"\d+\.\d+\s*(year|month|week|day|hour)", text, re.IGNORECASE):
+        return True
+
+    # Filter out decimal numbers in context like "0.5 pour-on"
+    if re.match(r"^0\.\d+\s", text):
+        return True
+
+    # Chapter 0 is likely false positives
+    if chapter == 0:
+        return True
+
+    # Section titles should have substantial text after the number
+    # Handle extra spaces in numbering like "3. 1" or "21. 2"
+    text_after_number = re.sub(r"^\d+\.\s*\d+(?:\.\s*\d+)?\s*", "", text)
+    if len(text_after_number) < 3:
+        return True
+
+    # Title should start with a capital letter or quotation mark (after number)
+    # Support both regular quotes and Unicode smart quotes (U+201C, U+201D, U+2018, U+2019)
+    if text_after_number and not (
+        text_after_number[0].isupper()
+        or text_after_number[0] in "\"''\u201c\u201d\u2018\u2019"
+    ):
+        return True
+
+    return False
+
+
+def extract_toc_from_document(doc):
+    """Extract TOC entries directly from the document."""
+    toc_entries = []
+    in_toc = False
+    consecutive_non_toc = 0
+
+    for para in doc.paragraphs:
+        text = para.text.strip()
+
+        # Detect TOC section (entries with dots leading to page numbers)
+        if "....." in text or "....." in text.replace(" ", ""):
+            in_toc = True
+            consecutive_non_toc = 0
+
+        # Stop when we hit substantial content after TOC
+        if in_toc and text and not "..." in text:
+            # Check if this looks like a TOC entry without dots
+            if not re.match(r"^\d+\.\d+", text):
+                consecutive_non_toc += 1
+                if consecutive_non_toc > 50:
+                    break
+                continue
+            else:
+                consecutive_non_toc = 0
+
+        if in_toc and text:
+            # Extract TOC entry
+            normalized = normalize_toc_text(text)
+
+            # Match chapter pattern (N.0) - handle extra spaces
+            chapter_match = re.match(r"^(\d+)\.\s*0\s+(.+)", normalized)
+            if chapter_match:
+                chapter = int(chapter_match.group(1))
+                if not is_toc_false_positive(normalized, "chapter", chapter):
+                    toc_entries.append(
+                        {
+                            "type": "chapter",
+                            "chapter": chapter,
+                            "section": 0,
+                            "subsection": None,
+                            "title": normalized,
+                        }
+                    )
+                continue
+
+            # Match section pattern (N.X where X > 0) - handle extra spaces
+            section_match = re.match(r"^(\d+)\.\s*(\d+)\s+(.+)", normalized)
+            if section_match and int(section_match.group(2)) > 0:
+                chapter = int(section_match.group(1))
+                section = int(section_match.group(2))
+                if not is_toc_false_positive(normalized, "section", chapter, section):
+                    toc_entries.append(
+                        {
+                            "type": "section",
+                            "chapter": chapter,
+                            "section": section,
+                            "subsection": None,
+                            "title": normalized,
+                        }
+                    )
+                continue
+
+            # Match subsection pattern (N.X.Y) - handle extra spaces
+            subsection_match = re.match(
+                r"^(\d+)\.\s*(\d+)\.\s*(\d+)\s+(.+)", normalized
+            )
+            if subsection_match:
+                chapter = int(subsection_match.group(1))
+                section = int(subsection_match.group(2))
+                subsection = int(subsection_match.group(3))
+                if not is_toc_false_positive(
+                    normalized, "subsection", chapter, section, subsection
+                ):
+                    toc_entries.append(
+                        {
+                            "type": "subsection",
+                            "chapter": chapter,
+                            "section": section,
+                            "subsection": subsection,
+                            "title": normalized,
+                        }
+                    )
+                continue
+
+    return toc_entries
+
+
+def build_toc_structure(toc_entries):
+    """Convert flat TOC entries into expected sequence for validation."""
+    expected_sequence = []
+
+    for entry in toc_entries:
+        expected_sequence.append(
+            {
+                "type": entry["type"],
+                "chapter": entry["chapter"],
+                "section": entry.get("section", 0),
+                "subsection": entry.get("subsection"),
+                "title": entry["title"],
+                "title_normalized": normalize_for_comparison(entry["title"]),
+            }
+        )
+
+    return expected_sequence
+
+
+def extract_number_and_title(text, doc, para_index):
+    """Extract section number and title from text."""
+    if not text:
+        return None
+
+    text = re.sub(r"\s*\.{2,}.*$", "", text).strip()
+
+    # Handle "Chapter N.0" or "Chapter N:" patterns
+    chapter_match = re.match(r"^Chapter\s+(\d+)\.0\s+(.+)", text, re.IGNORECASE)
+    if chapter_match:
+        text = chapter_match.group(1) + ".0 " + chapter_match.group(2)
+    else:
+        chapter_colon_match = re.match(r"^Chapter\s+(\d+):\s+(.+)", text, re.IGNORECASE)
+        if chapter_colon_match:
+            text = chapter_colon_match.group(1) + ".0 " + chapter_colon_match.group(2)
+
+    # Check for embedded section number
+    embedded_match = re.search(r"\D\.(\d+\.\d+(?:\.\d+)?)\s+([A-Z])", text)
+    if embedded_match:
+        start_pos = embedded_match.start(1)
+        text = text[start_pos:]
+
+    # Fix common OCR errors
+    text = re.sub(r"^[Il](\d)", r"1\1", text)
+    text = re.sub(r"^(\d+)\.[Il]", r"\1.1", text)
+    text = re.sub(r"^(\d+)\.(\d+)\.[Il]", r"\1.\2.1", text)
+    text = re.sub(r"^(\d+)\.\s+(\d+)", r"\1.\2", text)
+
+    # Look ahead for continuation lines
+    combined_text = text
+    use_dotall = False
 
     if doc and para_index is not None:
         for offset in range(1, 6):
@@ -538,11 +1822,11 @@ def extract_number_and_title(text, doc, para_index):
     return None
 
 
-def extract_toc_structure(doc):
+def extract_toc_structure(doc, log=print):
     """Extract TOC structure directly from document."""
-    print("Extracting TOC from document...")
+    log("Extracting TOC from document...")
     toc_entries = extract_toc_from_document(doc)
-    print(f"  Found {len(toc_entries)} TOC entries")
+    log(f"  Found {len(toc_entries)} TOC entries")
 
     expected_sequence = build_toc_structure(toc_entries)
     return expected_sequence
@@ -568,7 +1852,7 @@ def find_toc_end(doc):
     return toc_end
 
 
-def get_document_elements_in_order(doc, toc_end_index):
+def get_document_elements_in_order(doc, toc_end_index, log=print):
     """Yield document elements (paragraphs, tables, and images) in document order."""
     para_map = {id(p._element): (i, p) for i, p in enumerate(doc.paragraphs)}
     table_map = {id(t._element): (i, t) for i, t in enumerate(doc.tables)}
@@ -691,7 +1975,7 @@ def get_document_elements_in_order(doc, toc_end_index):
                             and len(text) < 200
                             and not re.match(r"^\d+\.\d+", text)
                         ):
-                            print(
+                            log(
                                 f'    WARNING: Possible orphan caption at para {para_index}: "{text[:80]}..."'
                             )
 
@@ -769,18 +2053,18 @@ def get_document_elements_in_order(doc, toc_end_index):
                     }
 
 
-def parse_document_structure(doc, exceptions, expected_sequence=None):
+def parse_document_structure(doc, exceptions, expected_sequence=None, log=print):
     """Parse document using TOC-guided approach."""
     if expected_sequence is None:
-        print("Extracting TOC structure...")
-        expected_sequence = extract_toc_structure(doc)
-        print(f"✓ Extracted {len(expected_sequence)} expected entries")
+        log("Extracting TOC structure...")
+        expected_sequence = extract_toc_structure(doc, log)
+        log(f"✓ Extracted {len(expected_sequence)} expected entries")
 
-    print("Finding TOC end...")
+    log("Finding TOC end...")
     toc_end_index = find_toc_end(doc)
-    print(f"✓ TOC section ends at paragraph {toc_end_index}")
+    log(f"✓ TOC section ends at paragraph {toc_end_index}")
 
-    print("\nParsing document structure...")
+    log("\nParsing document structure...")
 
     expected_index = 0
     found_count = 0
@@ -796,7 +2080,7 @@ def parse_document_structure(doc, exceptions, expected_sequence=None):
     section_elements = {}  # (chapter, section) -> list of elements
     subsection_elements = {}  # (chapter, section, subsection) -> list of elements
 
-    for source in get_document_elements_in_order(doc, toc_end_index):
+    for source in get_document_elements_in_order(doc, toc_end_index, log):
         # Handle images separately - they don't have element_obj initially
         if source["type"] == "image":
             element_obj = (
@@ -1021,8 +2305,8 @@ def parse_document_structure(doc, exceptions, expected_sequence=None):
                             (source["type"], element_obj)
                         )
 
-    print(f"✓ Found {found_count} numbered entries")
-    print(f"✓ Organized into {len(chapters)} chapters")
+    log(f"✓ Found {found_count} numbered entries")
+    log(f"✓ Organized into {len(chapters)} chapters")
 
     return chapters, chapter_elements, section_elements, subsection_elements
 
@@ -1057,7 +2341,7 @@ def _is_caption_paragraph(elem_type, elem_obj):
 
 
 def reconcile_captions_and_images(
-    chapters, chapter_elements, section_elements, subsection_elements
+    chapters, chapter_elements, section_elements, subsection_elements, log=print
 ):
     """Post-pass: move images to sections with matching orphan captions.
 
@@ -1154,16 +2438,16 @@ def reconcile_captions_and_images(
 
                 _set_elements(key_type, key, target_elements)
                 moves += len(images_to_move)
-                print(
+                log(
                     f"    Caption reconciliation: moved {len(images_to_move)} image(s)"
                     f" from {donor_key} to {key}"
                 )
                 break  # Only one donor per orphan
 
     if moves:
-        print(f"  Caption reconciliation: {moves} image(s) relocated total")
+        log(f"  Caption reconciliation: {moves} image(s) relocated total")
     else:
-        print("  Caption reconciliation: no relocations needed")
+        log("  Caption reconciliation: no relocations needed")
 
 
 def validate_image_sequence(
@@ -1255,11 +2539,265 @@ def validate_image_sequence(
     return warnings
 
 
+# ============================================================================
+# Intermediate Representation (parsed book as plain data)
+# ============================================================================
+#
+# After parsing and caption reconciliation, element lists keep their
+# (elem_type, payload) shape but python-docx objects are replaced by plain
+# data, so the parsed book can be cached and rendered without the DOCX:
+#   paragraph  -> {"text", "runs": [{"text", "bold", "italic"}], "style",
+#                  "list": None or {"kind": "bullet"|"number", "level": int}}
+#   table      -> {"rows": [[cell_text, ...], ...]}
+#   table_cell -> ("table_cell", index_string, text)   (unchanged)
+#   image      -> ((partname, content_type), image_index, alt, caption)
+#
+# Only builtin types are used, so the pickled IR loads the same whether
+# build_book.py ran as a script or was imported (build_batch.py, serve.py).
+
+
+def paragraph_list_style(para, style_name):
+    """Return {"kind", "level"} for list paragraphs, or None.
+
+    The kind comes from the paragraph style ("List Number ..." is numbered,
+    any other "List ..." style is bulleted); the nesting level from the
+    paragraph's own numbering properties (w:numPr/w:ilvl).
+    """
+    if "List Number" in style_name:
+        kind = "number"
+    elif "List" in style_name:
+        kind = "bullet"
+    else:
+        return None
+
+    level = 0
+    p_pr = para._p.pPr
+    if p_pr is not None and p_pr.numPr is not None and p_pr.numPr.ilvl is not None:
+        level = p_pr.numPr.ilvl.val
+    return {"kind": kind, "level": level}
+
+
+def paragraph_ir(para):
+    """Capture a paragraph's text, run formatting, style name and list style."""
+    style_name = para.style.name if para.style else ""
+    return {
+        "text": para.text,
+        "runs": [
+            {"text": run.text, "bold": run.bold, "italic": run.italic}
+            for run in para.runs
+        ],
+        "style": style_name,
+        "list": paragraph_list_style(para, style_name),
+    }
+
+
+def table_ir(table):
+    """Capture a table as rows of cell texts."""
+    return {"rows": [[cell.text for cell in row.cells] for row in table.rows]}
+
+
+def elements_to_ir(elements):
+    """Convert one element list from python-docx objects to plain data."""
+    converted = []
+    for elem_type, elem in elements:
+        if elem_type == "paragraph" and hasattr(elem, "runs"):
+            elem = paragraph_ir(elem)
+        elif elem_type == "table" and hasattr(elem, "rows"):
+            elem = table_ir(elem)
+        elif elem_type == "image" and isinstance(elem, tuple):
+            image_part = elem[0]
+            elem = ((str(image_part.partname), image_part.content_type),) + tuple(
+                elem[1:]
+            )
+        converted.append((elem_type, elem))
+    return converted
+
+
+def extract_docx_metadata(doc):
+    """Collect the DOCX fields load_book_config() falls back to."""
+    return {
+        "title": doc.core_properties.title,
+        "paragraphs": [para.text for para in doc.paragraphs[:10]],
+    }
+
+
+def build_title_map(expected_sequence):
+    """Map (chapter, "chapter") / (chapter, section) / (ch, sec, sub) to TOC titles."""
+    title_map = {}
+    for entry in expected_sequence:
+        chapter = entry["chapter"]
+        section = entry.get("section", 0)
+        subsection = entry.get("subsection")
+        title = entry["title"]
+
+        if subsection is not None:
+            key = (chapter, section, subsection)
+        elif section == 0:
+            key = (chapter, "chapter")
+        else:
+            key = (chapter, section)
+
+        title_map[key] = title
+    return title_map
+
+
+def parse_book_ir(docx_path, exceptions, log=print):
+    """Load, parse and reconcile a DOCX into the cacheable book IR."""
+    doc, expected_sequence = load_book_document(docx_path, log)
+    return structure_book_ir(doc, expected_sequence, exceptions, log)
+
+
+def load_book_document(docx_path, log=print):
+    """Load the DOCX XML and extract its TOC; return (doc, expected_sequence).
+
+    This is the part of parsing that does not depend on the exceptions.
+    """
+    # Load document
+    log(f"Loading document: {docx_path}")
+    doc = load_docx_without_media(docx_path)
+    log(f"✓ Loaded {len(doc.paragraphs)} paragraphs, {len(doc.tables)} tables")
+    log()
+
+    # Extract TOC structure for navigation index
+    log("Extracting TOC structure...")
+    expected_sequence = extract_toc_structure(doc, log)
+    log(f"✓ Extracted {len(expected_sequence)} expected entries")
+    log()
+    return doc, expected_sequence
+
+
+def structure_book_ir(doc, expected_sequence, exceptions, log=print):
+    """Apply the exceptions to a loaded document and build the book IR."""
+    # Parse structure
+    chapters, chapter_elements, section_elements, subsection_elements = (
+        parse_document_structure(doc, exceptions, expected_sequence, log)
+    )
+
+    # Reconcile frame-positioned images with orphan captions
+    log("\nReconciling image-caption pairs...")
+    reconcile_captions_and_images(
+        chapters, chapter_elements, section_elements, subsection_elements, log
+    )
+
+    return {
+        "metadata": extract_docx_metadata(doc),
+        "title_map": build_title_map(expected_sequence),
+        "chapters": chapters,
+        "chapter_elements": {
+            key: elements_to_ir(elements) for key, elements in chapter_elements.items()
+        },
+        "section_elements": {
+            key: elements_to_ir(elements) for key, elements in section_elements.items()
+        },
+        "subsection_elements": {
+            key: elements_to_ir(elements)
+            for key, elements in subsection_elements.items()
+        },
+    }
+
+
+def iter_ir_images(book_ir):
+    """Yield every image element tuple in the book IR."""
+    for group in ("chapter_elements", "section_elements", "subsection_elements"):
+        for elements in book_ir[group].values():
+            for elem_type, elem in elements:
+                if elem_type == "image":
+                    yield elem
+
+
+def ir_cache_key(docx_path, exceptions_file):
+    """Hash of everything the IR depends on: DOCX, exceptions and parser code.
+
+    The parser code is this module's source, so any edit to build_book.py
+    invalidates cached IR.
+    """
+    import hashlib
+    from importlib.metadata import PackageNotFoundError, version
+
+    digest = hashlib.sha256()
+    with open(__file__, "rb") as f:
+        digest.update(hashlib.sha256(f.read()).digest())
+    try:
+        digest.update(f"python-docx {version('python-docx')}\n".encode())
+    except PackageNotFoundError:
+        pass
+    for path in (docx_path, exceptions_file):
+        digest.update(f"{path}\n".encode())
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(IMAGE_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_ir_cache(key):
+    """Return the cached book IR for *key*, or None on a miss."""
+    import pickle
+
+    cache_path = os.path.join(IR_CACHE_DIR, f"{key}.pickle")
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        return None
+    if cached.get("key") != key:
+        return None
+    os.utime(cache_path)  # Mark as recently used
+    return cached["ir"]
+
+
+def save_ir_cache(key, book_ir):
+    """Store the book IR and keep only the IR_CACHE_KEEP most recent entries."""
+    import pickle
+
+    os.makedirs(IR_CACHE_DIR, exist_ok=True)
+    cache_path = os.path.join(IR_CACHE_DIR, f"{key}.pickle")
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(
+            {"key": key, "ir": book_ir},
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    os.replace(tmp_path, cache_path)
+
+    entries = sorted(
+        (
+            os.path.join(IR_CACHE_DIR, name)
+            for name in os.listdir(IR_CACHE_DIR)
+            if name.endswith(".pickle")
+        ),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for old_path in entries[IR_CACHE_KEEP:]:
+        try:
+            os.remove(old_path)
+        except FileNotFoundError:
+            pass  # Pruned by a concurrent build
+
+
+def load_book_ir(docx_path, exceptions_file, exceptions, no_cache=False):
+    """Return the book IR from the cache, or parse (and cache) the DOCX."""
+    cache_key = ir_cache_key(docx_path, exceptions_file)
+    book_ir = None if no_cache else load_ir_cache(cache_key)
+    if book_ir is not None:
+        print(f"IR cache: hit ({cache_key[:12]}) - skipping document parsing")
+        print()
+    else:
+        print(f"IR cache: miss ({cache_key[:12]}) - parsing document")
+        print()
+        book_ir = parse_book_ir(docx_path, exceptions)
+        save_ir_cache(cache_key, book_ir)
+        print()
+    return book_ir
+
+
 def extract_paragraph_json(para):
     """Extract paragraph data as JSON (md2rag format)."""
     return {
         "type": "paragraph",
-        "text": para.text,
+        "text": para["text"],
     }
 
 
@@ -1276,8 +2814,8 @@ def extract_image_json(image_path, alt="", caption=""):
 def extract_table_json(table):
     """Extract table data as JSON (md2rag format)."""
     rows = []
-    for row in table.rows:
-        cells = [{"text": cell.text} for cell in row.cells]
+    for row in table["rows"]:
+        cells = [{"text": cell_text} for cell_text in row]
         rows.append({"cells": cells})
 
     return {"type": "table", "rows": rows}
@@ -1491,8 +3029,8 @@ hr {
     return css_content
 
 
-def create_markdown_index(chapters, markdown_dir):
-    """Create README.md index file for markdown chapters."""
+def render_markdown_index(chapters):
+    """Render the README.md index of the markdown chapters."""
     lines = [
         "# Book Content - Markdown Format",
         "",
@@ -1550,20 +3088,7 @@ def create_markdown_index(chapters, markdown_dir):
             "",
         ]
     )
-
-    # Write README
-    readme_path = os.path.join(markdown_dir, "README.md")
-    with open(readme_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(lines))
-
-    print(f"\n✓ Created markdown index: {readme_path}")
-
-    # Write CSS file
-    css_path = os.path.join(markdown_dir, "style.css")
-    with open(css_path, "w", encoding="utf-8") as f:
-        f.write(create_markdown_css())
-
-    print(f"✓ Created CSS file: {css_path}")
+    return "\n".join(lines)
 
 
 def format_text_markdown(text, runs=None):
@@ -1590,49 +3115,59 @@ def format_text_markdown(text, runs=None):
     return "".join(result) if result else text
 
 
+# A number typed at the start of a list item ("3. ", "3) "), possibly
+# inside emphasis
+LIST_NUMBER_PREFIX_PATTERN = re.compile(r"^(\*{0,3})(\d+[.)])\s+")
+
+
+def list_item_markdown(formatted_text, list_style):
+    """Render a list paragraph as a Markdown list item.
+
+    Nested levels are indented three spaces each. Numbered items keep a
+    number typed in the text ("3) Options") as their marker, unchanged;
+    otherwise they get "1." and the Markdown renderer counts them.
+    """
+    indent = "   " * list_style["level"]
+    if list_style["kind"] != "number":
+        return f"{indent}- {formatted_text}"
+
+    match = LIST_NUMBER_PREFIX_PATTERN.match(formatted_text)
+    if not match:
+        return f"{indent}1. {formatted_text}"
+    emphasis, rest = match.group(1), formatted_text[match.end() :]
+    if emphasis and rest.startswith(emphasis):
+        emphasis, rest = "", rest[len(emphasis) :]  # "**1. **Input"
+    return f"{indent}{match.group(2)} {emphasis}{rest}"
+
+
 def extract_paragraph_markdown(para):
     """Extract paragraph as markdown."""
-    text = para.text.strip()
+    text = para["text"].strip()
     if not text:
         return ""
 
-    # Check for heading styles
-    style_name = para.style.name if para.style else ""
-
     # Format runs for inline formatting
-    runs_data = []
-    for run in para.runs:
-        runs_data.append(
-            {
-                "text": run.text,
-                "bold": run.bold,
-                "italic": run.italic,
-            }
-        )
-
-    formatted_text = format_text_markdown(text, runs_data)
+    formatted_text = format_text_markdown(text, para["runs"])
 
     # Handle list styles
-    if "List Bullet" in style_name or "List" in style_name:
-        return f"- {formatted_text}"
-    elif "List Number" in style_name:
-        return f"1. {formatted_text}"
+    if para["list"]:
+        return list_item_markdown(formatted_text, para["list"])
 
     return formatted_text
 
 
 def extract_table_markdown(table):
     """Extract table as markdown."""
-    if not table.rows:
+    if not table["rows"]:
         return ""
 
     lines = []
 
     # Process rows
-    for row_idx, row in enumerate(table.rows):
+    for row_idx, row in enumerate(table["rows"]):
         cells = []
-        for cell in row.cells:
-            cell_text = cell.text.strip().replace("\n", " ")
+        for cell_text in row:
+            cell_text = cell_text.strip().replace("\n", " ")
             cells.append(cell_text)
 
         # Create table row
@@ -1655,7 +3190,7 @@ def postprocess_image(image_path, max_size=1200, border=10, white_threshold=240)
         white_threshold: RGB values above this are treated as background.
     """
     try:
-        from PIL import Image, ImageChops
+        from PIL import Image
     except ImportError:
         return  # Pillow not installed, skip post-processing
 
@@ -1664,6 +3199,13 @@ def postprocess_image(image_path, max_size=1200, border=10, white_threshold=240)
     except Exception:
         return  # Can't open image, skip
 
+    postprocess_pil_image(img, max_size, border, white_threshold).save(image_path)
+
+
+def postprocess_pil_image(img, max_size=1200, border=10, white_threshold=240):
+    """Auto-crop and downscale a Pillow image; return the processed image."""
+    from PIL import Image, ImageChops
+
     # Convert to RGB if necessary (handles RGBA, palette, etc.)
     if img.mode not in ("RGB", "L"):
         img = img.convert("RGB")
@@ -1691,149 +3233,576 @@ def postprocess_image(image_path, max_size=1200, border=10, white_threshold=240)
             new_h = int(img.height * scale)
             img = img.resize((new_w, new_h), Image.LANCZOS)
 
-    img.save(image_path)
+    return img
+
+
+def process_image_bytes(data):
+    """Turn non-WMF image bytes into the exported PNG, entirely in memory.
+
+    Same result as writing the image, converting it to PNG and running
+    postprocess_image() on it. Without Pillow, or for data Pillow cannot
+    read, the bytes are returned unchanged.
+    """
+    import io
+
+    try:
+        from PIL import Image
+    except ImportError:
+        return data  # Pillow not installed, keep original format
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception:
+        return data  # Can't open image, keep as-is
+
+    out = io.BytesIO()
+    postprocess_pil_image(img).save(out, "PNG")
+    return out.getvalue()
+
+
+def is_wmf_image(image_data):
+    """Check if image data is WMF format by checking magic bytes."""
+    if len(image_data) < 4:
+        return False
+    # WMF magic bytes: 0xD7CDC69A or 0x01000900
+    magic = image_data[:4]
+    return magic == b"\xd7\xcd\xc6\x9a" or magic == b"\x01\x00\x09\x00"
+
+
+# ============================================================================
+# Image Source Layer (stream media straight from the DOCX zip)
+# ============================================================================
+
+
+def _is_package_xml(member_name):
+    """Return True for DOCX members python-docx needs to parse (XML and rels)."""
+    return member_name.endswith((".xml", ".rels"))
+
+
+def load_docx_without_media(docx_path):
+    """Open a DOCX with python-docx while leaving media parts in the zip.
+
+    python-docx reads every part blob into memory when a package is opened
+    and keeps it for the lifetime of the Document. We hand it a copy of the
+    package in which all non-XML members (images, thumbnails, embeddings)
+    are empty, so only the document XML is held in memory. Image parts keep
+    their partname and content type; the bytes are streamed on demand by
+    DocxImageSource.
+    """
+    import io
+    import zipfile
+
+    stub = io.BytesIO()
+    with zipfile.ZipFile(docx_path) as src, zipfile.ZipFile(
+        stub, "w", zipfile.ZIP_STORED
+    ) as dst:
+        for info in src.infolist():
+            if _is_package_xml(info.filename):
+                dst.writestr(info.filename, src.read(info.filename))
+            else:
+                dst.writestr(info.filename, b"")
+    stub.seek(0)
+    return Document(stub)
+
+
+class DocxImageSource:
+    """Read-only access to the media members of a DOCX zip.
+
+    Images are opened one member at a time, so peak memory tracks the
+    largest single image rather than the whole media folder.
+
+    Args:
+        docx_path: Path to the DOCX file, or a seekable binary file object
+            (which is left open by close()).
+        use_mmap: Memory-map the DOCX instead of reading it through a
+            regular file handle (paths only).
+    """
+
+    def __init__(self, docx_path, use_mmap=False):
+        import contextlib
+        import zipfile
+
+        self.docx_path = docx_path
+        # Everything opened here is closed together by close(), or at once
+        # if opening the zip fails
+        with contextlib.ExitStack() as stack:
+            docx = docx_path
+            if not hasattr(docx_path, "read"):
+                docx = stack.enter_context(open(docx_path, "rb"))
+                if use_mmap:
+                    import mmap
+
+                    class _SeekableMmap(mmap.mmap):
+                        # zipfile checks seekable(), which mmap only has from 3.13
+                        def seekable(self):
+                            return True
+
+                    docx = stack.enter_context(
+                        _SeekableMmap(docx.fileno(), 0, access=mmap.ACCESS_READ)
+                    )
+            self._zip = stack.enter_context(zipfile.ZipFile(docx))
+            self._resources = stack.pop_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Close the zip and the file (and mapping) opened for it.
+
+        A file object passed in is left open.
+        """
+        self._resources.close()
+
+    @staticmethod
+    def member_name(image_ref):
+        """Map an image reference's partname ("/word/media/x.png") to a zip member."""
+        partname, _content_type = image_ref
+        return partname.lstrip("/")
+
+    def size(self, image_part):
+        """Uncompressed size of the image in bytes."""
+        return self._zip.getinfo(self.member_name(image_part)).file_size
+
+    def read_header(self, image_part, length=8):
+        """Read only the first *length* bytes of the image (for magic sniffing)."""
+        with self._zip.open(self.member_name(image_part)) as f:
+            return f.read(length)
+
+    def fingerprint(self, image_part):
+        """Cheap identity of the image bytes (CRC-32 and size from the zip index)."""
+        info = self._zip.getinfo(self.member_name(image_part))
+        return f"{info.CRC:08x}:{info.file_size}"
+
+    def open(self, image_part):
+        """Return a readable file handle for the image."""
+        return self._zip.open(self.member_name(image_part))
+
+
+def _is_wmf_part(image_part, image_source):
+    """Sniff an image part for WMF magic bytes.
+
+    The DOCX is loaded without media (and the IR keeps only the partname
+    and content type), so image bytes always come from the DocxImageSource.
+    """
+    return is_wmf_image(image_source.read_header(image_part, 4))
+
+
+def _find_imagemagick():
+    """Return the ImageMagick executable name ("magick" or "convert") or None."""
+    if shutil.which("magick"):
+        return "magick"
+    if shutil.which("convert"):
+        return "convert"
+    return None
+
+
+def _is_png_file(path):
+    """Check that *path* exists and starts with the PNG signature."""
+    if not os.path.exists(path):
+        return False
+    with open(path, "rb") as f:
+        return f.read(8)[:4] == b"\x89PNG"
+
+
+def _convert_wmf_libreoffice(wmf_path, output_path, profile_dir=None):
+    """Convert WMF to PNG using LibreOffice -> PDF -> ImageMagick.
+
+    *profile_dir* gives soffice its own user installation; concurrent
+    soffice processes sharing one profile serialise on its lock or fail.
+    """
+    import subprocess
+    import tempfile
+    from pathlib import Path
+
+    soffice = shutil.which("soffice") or shutil.which("libreoffice")
+    magick = _find_imagemagick()
+    if not soffice or not magick:
+        return False
+
+    soffice_cmd = [soffice]
+    if profile_dir:
+        soffice_cmd.append(
+            f"-env:UserInstallation={Path(os.path.abspath(profile_dir)).as_uri()}"
+        )
+
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Convert WMF to PDF using LibreOffice
+            subprocess.run(
+                soffice_cmd
+                + [
+                    "--headless",
+                    "--convert-to",
+                    "pdf",
+                    "--outdir",
+                    tmpdir,
+                    wmf_path,
+                ],
+                capture_output=True,
+                text=True,
+                timeout=WMF_CONVERSION_TIMEOUT,
+            )
+
+            # Find the generated PDF (LibreOffice might name it differently)
+            pdf_files = list(Path(tmpdir).glob("*.pdf"))
+            if not pdf_files:
+                print("    ⚠️  LibreOffice produced no PDF")
+                return False
+
+            # Convert PDF to PNG using ImageMagick
+            # Use -trim to extract just the vector content (not the full page)
+            result = subprocess.run(
+                [
+                    magick,
+                    "-density",
+                    "150",
+                    str(pdf_files[0]),
+                    "-flatten",
+                    "-trim",
+                    "+repage",
+                    "png:" + output_path,
+                ],
+                capture_output=True,
+                text=True,
+                timeout=WMF_CONVERSION_TIMEOUT,
+            )
+
+            if result.returncode == 0 and os.path.exists(output_path):
+                if _is_png_file(output_path):
+                    return True
+                print("    ⚠️  Output is not PNG format")
+            return False
+
+    except subprocess.TimeoutExpired:
+        print("    ⚠️  WMF conversion timeout")
+        return False
+    except Exception as e:
+        print(f"    ⚠️  LibreOffice conversion error: {e}")
+        return False
+
+
+def _convert_wmf_imagemagick(wmf_path, output_path, profile_dir=None):
+    """Convert WMF to PNG with ImageMagick directly (needs WMF delegates)."""
+    import subprocess
+
+    magick = _find_imagemagick()
+    if not magick:
+        return False
+
+    try:
+        result = subprocess.run(
+            [magick, wmf_path, "png:" + output_path],
+            capture_output=True,
+            text=True,
+            timeout=WMF_CONVERSION_TIMEOUT,
+        )
+
+        if result.returncode == 0 and os.path.exists(output_path):
+            if _is_png_file(output_path):
+                return True
+            print("    ⚠️  Output is not PNG format")
+            return False
+        print(f"    ⚠️  WMF conversion failed: {result.stderr}")
+        return False
+    except subprocess.TimeoutExpired:
+        print("    ⚠️  WMF conversion timeout")
+        return False
+    except Exception as e:
+        print(f"    ⚠️  WMF conversion error: {e}")
+        return False
+
+
+# Conversion backends in order of preference: (name, converter, required tools)
+WMF_BACKENDS = [
+    (
+        "libreoffice",
+        _convert_wmf_libreoffice,
+        (("soffice", "libreoffice"), ("magick", "convert")),
+    ),
+    ("imagemagick", _convert_wmf_imagemagick, (("magick", "convert"),)),
+]
+
+
+def _wmf_probe_sample():
+    """Build a tiny placeable WMF (one filled rectangle) for toolchain probing."""
+    import struct
+
+    records = [
+        struct.pack("<IHhh", 5, 0x020B, 0, 0),  # META_SETWINDOWORG
+        struct.pack("<IHhh", 5, 0x020C, 100, 100),  # META_SETWINDOWEXT
+        struct.pack("<IHhhhh", 7, 0x041B, 90, 90, 10, 10),  # META_RECTANGLE
+        struct.pack("<IH", 3, 0x0000),  # META_EOF
+    ]
+    body = b"".join(records)
+    size_words = (18 + len(body)) // 2
+    header = struct.pack("<HHHIHIH", 1, 9, 0x0300, size_words, 0, 7, 0)
+
+    placeable = struct.pack("<IHhhhhHI", 0x9AC6CDD7, 0, 0, 0, 100, 100, 1440, 0)
+    checksum = 0
+    for (word,) in struct.iter_unpack("<H", placeable):
+        checksum ^= word
+    placeable += struct.pack("<H", checksum)
+
+    return placeable + header + body
+
+
+class WmfToolchain:
+    """Probed WMF conversion backends guarded by a circuit breaker.
+
+    Each backend is tested once on an embedded WMF sample. During the build
+    a backend that fails *failure_threshold* times in a row is disabled for
+    the rest of the run, so a broken LibreOffice costs a few timeouts rather
+    than one per image.
+    """
+
+    def __init__(self, failure_threshold=None):
+        if failure_threshold is None:
+            failure_threshold = WMF_FAILURE_THRESHOLD
+        self.failure_threshold = failure_threshold
+        self.backends = {}  # name -> state dict
+        self.events = []  # human-readable decisions for the build report
+        self._lock = threading.Lock()
+        for name, converter, requirements in WMF_BACKENDS:
+            self.backends[name] = {
+                "converter": converter,
+                "requirements": requirements,
+                "available": False,
+                "reason": "not probed",
+                "consecutive_failures": 0,
+                "tripped": False,
+                "successes": 0,
+                "failures": 0,
+            }
+
+    def probe(self):
+        """Test every backend once on the embedded sample and record the result."""
+        import tempfile
+        import time
+
+        print("Probing WMF conversion toolchain...")
+        sample = _wmf_probe_sample()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            wmf_path = os.path.join(tmpdir, "probe.wmf")
+            with open(wmf_path, "wb") as f:
+                f.write(sample)
+
+            for name, state in self.backends.items():
+                missing = [
+                    "/".join(tools)
+                    for tools in state["requirements"]
+                    if not any(shutil.which(tool) for tool in tools)
+                ]
+                if missing:
+                    state["reason"] = f"missing {', '.join(missing)}"
+                else:
+                    output_path = os.path.join(tmpdir, f"probe_{name}.png")
+                    start = time.monotonic()
+                    ok = state["converter"](
+                        wmf_path, output_path, libreoffice_profile_dir(0)
+                    )
+                    elapsed = time.monotonic() - start
+                    state["available"] = ok
+                    state["reason"] = (
+                        f"probe ok ({elapsed:.1f}s)"
+                        if ok
+                        else f"probe failed ({elapsed:.1f}s)"
+                    )
+                mark = "✓" if state["available"] else "✗"
+                self._log(f"{mark} {name}: {state['reason']}")
+        return self
+
+    def probe_results(self):
+        """Plain-data probe outcome, to hand to other processes."""
+        return {
+            name: {"available": state["available"], "reason": state["reason"]}
+            for name, state in self.backends.items()
+        }
 
+    @classmethod
+    def from_probe_results(cls, results, failure_threshold=None):
+        """Create a toolchain from probe_results() without probing again."""
+        toolchain = cls(failure_threshold)
+        for name, result in results.items():
+            if name in toolchain.backends:
+                toolchain.backends[name].update(result)
+                mark = "✓" if result["available"] else "✗"
+                toolchain.events.append(f"{mark} {name}: {result['reason']} (shared)")
+        return toolchain
+
+    def is_enabled(self, name):
+        """True if the backend passed the probe and its breaker is closed."""
+        state = self.backends[name]
+        return state["available"] and not state["tripped"]
+
+    def enabled_backends(self):
+        """Names of the backends that may still be used, in preference order."""
+        return [name for name in self.backends if self.is_enabled(name)]
+
+    def record(self, name, ok):
+        """Record a conversion result and trip the breaker on repeated failure."""
+        with self._lock:
+            state = self.backends[name]
+            if ok:
+                state["successes"] += 1
+                state["consecutive_failures"] = 0
+                return
+            state["failures"] += 1
+            state["consecutive_failures"] += 1
+            if (
+                not state["tripped"]
+                and state["consecutive_failures"] >= self.failure_threshold
+            ):
+                state["tripped"] = True
+                self._log(
+                    f"⚠️  {name} disabled after {state['consecutive_failures']}"
+                    " consecutive failures"
+                )
 
-def is_wmf_image(image_data):
-    """Check if image data is WMF format by checking magic bytes."""
-    if len(image_data) < 4:
+    def convert(self, wmf_path, output_path, profile_dir=None):
+        """Convert with the first enabled backend that succeeds."""
+        for name in self.enabled_backends():
+            ok = self.backends[name]["converter"](wmf_path, output_path, profile_dir)
+            self.record(name, ok)
+            if ok:
+                return True
         return False
-    # WMF magic bytes: 0xD7CDC69A or 0x01000900
-    magic = image_data[:4]
-    return magic == b"\xd7\xcd\xc6\x9a" or magic == b"\x01\x00\x09\x00"
 
+    def _log(self, message):
+        print(f"  {message}")
+        self.events.append(message)
 
-def convert_wmf_to_png(wmf_path, output_path):
-    """Convert WMF to PNG using LibreOffice -> PDF -> PNG chain."""
-    import shutil
-    import subprocess
-    import tempfile
-    from pathlib import Path
+    def report_lines(self):
+        """Summarise probe results, breaker decisions and conversion counts."""
+        lines = ["WMF conversion toolchain", ""]
+        for name, state in self.backends.items():
+            status = "enabled" if self.is_enabled(name) else "disabled"
+            lines.append(
+                f"  {name}: {status} - {state['reason']}"
+                f" (ok={state['successes']}, failed={state['failures']})"
+            )
+        lines.append("")
+        lines.append("Decisions:")
+        lines.extend(f"  {event}" for event in self.events)
+        return lines
 
-    # Try LibreOffice first (best for WMF)
-    soffice = shutil.which("soffice") or shutil.which("libreoffice")
-    if soffice:
-        try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                # Convert WMF to PDF using LibreOffice
-                result = subprocess.run(
-                    [
-                        soffice,
-                        "--headless",
-                        "--convert-to",
-                        "pdf",
-                        "--outdir",
-                        tmpdir,
-                        wmf_path,
-                    ],
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                )
+    def write_log(self, log_dir):
+        """Write the toolchain report to ``<log_dir>/wmf_toolchain.log``."""
+        os.makedirs(log_dir, exist_ok=True)
+        log_path = os.path.join(log_dir, "wmf_toolchain.log")
+        with open(log_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.report_lines()) + "\n")
+        print(f"  Log written to {log_path}")
 
-                # Find the generated PDF (LibreOffice might name it differently)
-                pdf_files = list(Path(tmpdir).glob("*.pdf"))
-                if pdf_files:
-                    pdf_path = str(pdf_files[0])
-
-                    # Convert PDF to PNG using ImageMagick
-                    # Use -trim to extract just the vector content (not the full page)
-                    magick_cmd = None
-                    if shutil.which("magick"):
-                        magick_cmd = [
-                            "magick",
-                            "-density",
-                            "150",
-                            pdf_path,
-                            "-flatten",
-                            "-trim",
-                            "+repage",
-                            "png:" + output_path,
-                        ]
-                    elif shutil.which("convert"):
-                        magick_cmd = [
-                            "convert",
-                            "-density",
-                            "150",
-                            pdf_path,
-                            "-flatten",
-                            "-trim",
-                            "+repage",
-                            "png:" + output_path,
-                        ]
-
-                    if magick_cmd:
-                        result = subprocess.run(
-                            magick_cmd,
-                            capture_output=True,
-                            text=True,
-                            timeout=30,
-                        )
 
-                        if result.returncode == 0 and os.path.exists(output_path):
-                            # Verify it's actually a PNG
-                            with open(output_path, "rb") as f:
-                                header = f.read(8)
-                                if header[:4] == b"\x89PNG":
-                                    return True
-                            print(f"    ⚠️  Output is not PNG format")
-                            return False
-
-        except subprocess.TimeoutExpired:
-            print(f"    ⚠️  WMF conversion timeout")
-            return False
-        except Exception as e:
-            print(f"    ⚠️  LibreOffice conversion error: {e}")
+_wmf_toolchain = None
 
-    # Fallback: Try ImageMagick directly (needs WMF delegates)
-    try:
-        magick_cmd = None
-        if shutil.which("magick"):
-            magick_cmd = ["magick", wmf_path, "png:" + output_path]
-        elif shutil.which("convert"):
-            magick_cmd = ["convert", wmf_path, "png:" + output_path]
-        else:
-            print(f"    ⚠️  No conversion tools found - cannot convert WMF")
-            return False
 
-        result = subprocess.run(
-            magick_cmd,
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
+def get_wmf_toolchain():
+    """Return the process-wide WMF toolchain, probing it on first use."""
+    global _wmf_toolchain
+    if _wmf_toolchain is None:
+        _wmf_toolchain = WmfToolchain().probe()
+    return _wmf_toolchain
 
-        if result.returncode == 0 and os.path.exists(output_path):
-            # Verify it's actually a PNG
-            with open(output_path, "rb") as f:
-                header = f.read(8)
-                if header[:4] == b"\x89PNG":
-                    return True
-            print(f"    ⚠️  Output is not PNG format")
-            return False
-        else:
-            print(f"    ⚠️  WMF conversion failed: {result.stderr}")
-            return False
-    except subprocess.TimeoutExpired:
-        print(f"    ⚠️  WMF conversion timeout")
-        return False
-    except Exception as e:
-        print(f"    ⚠️  WMF conversion error: {e}")
+
+def set_wmf_toolchain(toolchain):
+    """Use *toolchain* as the process-wide WMF toolchain (None to re-probe)."""
+    global _wmf_toolchain
+    _wmf_toolchain = toolchain
+
+
+def convert_wmf_to_png(wmf_path, output_path, toolchain=None, profile_dir=None):
+    """Convert WMF to PNG using LibreOffice -> PDF -> PNG chain.
+
+    Falls back to ImageMagick's WMF delegate. Backends that failed the
+    toolchain probe, or tripped its circuit breaker, are skipped.
+    """
+    if toolchain is None:
+        toolchain = get_wmf_toolchain()
+    if not toolchain.enabled_backends():
+        print("    ⚠️  No working conversion tools - cannot convert WMF")
         return False
+    return toolchain.convert(wmf_path, output_path, profile_dir)
+
+
+def libreoffice_profile_dir(slot):
+    """Return (creating once) the LibreOffice user profile for worker *slot*."""
+    path = os.path.join(LIBREOFFICE_PROFILE_ROOT, f"worker_{slot:02d}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
 
+def convert_wmf_batch(jobs, concurrency=None, toolchain=None, on_done=None, log=print):
+    """Convert many WMF files concurrently.
 
-def extract_and_save_image(image_part, image_index, config, export_root, section_path):
-    """Extract image and save to pictures directory with hierarchy.
+    Each worker holds its own LibreOffice profile for the duration of a
+    job, so up to *concurrency* soffice processes run side by side.
 
     Args:
-        image_part: The image part from the DOCX
-        image_index: Index number for the image filename
-        config: Book configuration dict
-        export_root: Root export directory (e.g., "export")
-        section_path: Human-readable section path (e.g., "intro/overview")
+        jobs: List of (wmf_path, output_path) tuples.
+        concurrency: Maximum parallel conversions (default WMF_CONCURRENCY).
+        toolchain: WmfToolchain to use (default: the probed process toolchain).
+        on_done: Optional callback ``on_done(job, ok)`` run in the worker
+            thread after each conversion (e.g. for post-processing).
+        log: Callable taking print() arguments for the timing summary.
+
+    Returns:
+        List of booleans, one per job, in job order.
+    """
+    import queue
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not jobs:
+        return []
+    if toolchain is None:
+        toolchain = get_wmf_toolchain()
+    concurrency = max(1, min(concurrency or WMF_CONCURRENCY, len(jobs)))
+
+    profiles = queue.Queue()
+    for slot in range(concurrency):
+        profiles.put(libreoffice_profile_dir(slot))
+
+    def _run(job):
+        wmf_path, output_path = job
+        profile_dir = profiles.get()
+        try:
+            ok = convert_wmf_to_png(wmf_path, output_path, toolchain, profile_dir)
+        finally:
+            profiles.put(profile_dir)
+        if on_done:
+            on_done(job, ok)
+        return ok
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(_run, jobs))
+    elapsed = time.monotonic() - start
+    log(
+        f"  Converted {sum(results)}/{len(jobs)} WMF image(s) in {elapsed:.1f}s"
+        f" with {concurrency} worker(s)"
+    )
+    return results
+
+
+def book_pictures_dir(config, export_root):
+    """Folder of the book's pictures manifest (and, for "root", its pictures)."""
+    lang = config.get("language", "eng")
+    book_id = config["canonical_id"]
+    if config.get("pictures_location", "root") == "root":
+        return os.path.join(export_root, "pictures", lang, book_id)
+    return os.path.join(export_root, lang, book_id, "pictures")
+
+
+def image_output_location(config, export_root, section_path, image_index):
+    """Work out where an image is written and how JSON refers to it.
 
     Returns:
-        (filename, logical_path) tuple
+        (pictures_dir, image_filename, logical_path) tuple
     """
     # Build physical path based on pictures_location config
     pictures_location = config.get("pictures_location", "root")
@@ -1860,112 +3829,30 @@ def extract_and_save_image(image_part, image_index, config, export_root, section
             export_root, lang, book_id, chapter_part, "pictures"
         )
 
-    os.makedirs(pictures_dir, exist_ok=True)
-
     # Always use .png extension for consistency
-    ext = "png"
-
-    # Save image
-    image_filename = f"image_{image_index:03d}.{ext}"
-    image_path = os.path.join(pictures_dir, image_filename)
-
-    # Get image data
-    image_data = image_part.blob
-
-    # Check if it's WMF and needs conversion
-    if is_wmf_image(image_data):
-        # Save as temporary WMF file
-        wmf_path = image_path + ".wmf.tmp"
-        with open(wmf_path, "wb") as f:
-            f.write(image_data)
-
-        # Convert to PNG
-        if convert_wmf_to_png(wmf_path, image_path):
-            # Backup original WMF
-            backup_path = image_path + ".wmf.backup"
-            os.rename(wmf_path, backup_path)
-        else:
-            # Conversion failed, save as-is
-            os.remove(wmf_path)
-            with open(image_path, "wb") as f:
-                f.write(image_data)
-    else:
-        # Regular image, save directly then convert to PNG if needed
-        with open(image_path, "wb") as f:
-            f.write(image_data)
-
-        # Convert non-PNG images (e.g., JPEG) to PNG
-        content_type = image_part.content_type
-        if "png" not in content_type:
-            try:
-                from PIL import Image
-
-                img = Image.open(image_path)
-                img.save(image_path, "PNG")
-            except ImportError:
-                pass  # Pillow not installed, file keeps original format with .png ext
-            except Exception:
-                pass  # Conversion failed, keep as-is
-
-    # Post-process: auto-crop whitespace and limit resolution
-    postprocess_image(image_path)
+    image_filename = f"image_{image_index:03d}.png"
 
     # Build logical path for JSON references (relative to section)
     logical_path = f"pictures/{section_path}/{image_filename}"
-    return image_filename, logical_path
-
-
-def extract_and_save_image_markdown(image_part, image_index, output_dir, chapter_dir):
-    """Extract image and save for markdown output. Returns relative path or None."""
-    pictures_dir = os.path.join(output_dir, chapter_dir, "pictures")
-    os.makedirs(pictures_dir, exist_ok=True)
-
-    # Always use .png extension for consistency
-    ext = "png"
-
-    image_filename = f"image_{image_index:03d}.{ext}"
-    image_path = os.path.join(pictures_dir, image_filename)
-    image_data = image_part.blob
-
-    # Check if it's WMF and needs conversion
-    if is_wmf_image(image_data):
-        wmf_path = image_path + ".wmf.tmp"
-        with open(wmf_path, "wb") as f:
-            f.write(image_data)
-
-        if convert_wmf_to_png(wmf_path, image_path):
-            backup_path = image_path + ".wmf.backup"
-            os.rename(wmf_path, backup_path)
-        else:
-            os.remove(wmf_path)
-            with open(image_path, "wb") as f:
-                f.write(image_data)
-    else:
-        with open(image_path, "wb") as f:
-            f.write(image_data)
-
-        # Convert non-PNG images (e.g., JPEG) to PNG
-        content_type = image_part.content_type
-        if "png" not in content_type:
-            try:
-                from PIL import Image
-
-                img = Image.open(image_path)
-                img.save(image_path, "PNG")
-            except (ImportError, Exception):
-                pass  # Keep as-is if conversion fails
-
-    # Post-process: auto-crop whitespace and limit resolution
-    final_path = os.path.join(pictures_dir, image_filename)
-    postprocess_image(final_path)
-
-    return f"pictures/{image_filename}"
+    return pictures_dir, image_filename, logical_path
 
 
 def save_markdown_file(
     filepath, content_items, chapter_num, section_num=None, subsection_num=None
 ):
     """Save content as markdown file."""
+    text = render_markdown_file(content_items, chapter_num, section_num, subsection_num)
+
+    # Write file
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def render_markdown_file(
+    content_items, chapter_num, section_num=None, subsection_num=None
+):
+    """Render section content as the text of a markdown file."""
     lines = []
 
     # Add HTML head with CSS link for better viewing
@@ -2028,16 +3915,16 @@ def save_markdown_file(
     lines.append(f'<a href="intro.md">Chapter {chapter_num} Home</a>')
     lines.append("</div>")
 
-    # Write file
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write("\n".join(lines))
+    return "\n".join(lines)
 
 
 def create_navigation_index(
     chapters, expected_sequence, output_dir, book_title="Untitled Book"
 ):
-    """Create index.json for navigation (legacy format, no longer used)."""
+    """Create index.json for navigation (legacy format, no longer used).
+
+    Superseded by build_navigation_tree() and _navigation.json.
+    """
     # Build a map of chapter/section numbers to titles from TOC
     title_map = {}
     for entry in expected_sequence:
@@ -2108,16 +3995,17 @@ def create_navigation_index(
         json.dump(index_data, f, indent=2)
 
 
-def validate_images(json_dir, images_dir):
-    """Validate image references after generation.
-
-    Checks that every JSON image reference has a file on disk, and reports
-    any orphaned image files not referenced by any JSON.
-    """
+def collect_json_image_refs(json_dir):
+    """Read every section JSON under *json_dir* and return its image paths."""
     import glob as glob_mod
 
     json_refs = set()
     for jf in glob_mod.glob(f"{json_dir}/**/*.json", recursive=True):
+        # Book-level outputs such as _search/ are not section files
+        if any(
+            part.startswith("_") for part in os.path.relpath(jf, json_dir).split(os.sep)
+        ):
+            continue
         try:
             with open(jf, "r", encoding="utf-8") as f:
                 data = json.load(f)
@@ -2126,556 +4014,1700 @@ def validate_images(json_dir, images_dir):
                     json_refs.add(item["path"])
         except (json.JSONDecodeError, KeyError):
             continue
+    return json_refs
+
+
+def scan_image_files(images_dir):
+    """Return "pictures/<relpath>" for every image under *images_dir*."""
+    disk_files = set()
+    stack = [images_dir]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith((".png", ".jpg")):
+                    rel = os.path.relpath(entry.path, images_dir)
+                    disk_files.add(f"pictures/{rel.replace(os.sep, '/')}")
+    return disk_files
+
+
+def validate_images(images_dir, json_refs=None, json_dir=None):
+    """Validate image references after generation.
+
+    Checks that every JSON image reference has a file on disk, and reports
+    any orphaned image files not referenced by any JSON. *json_refs* is the
+    set of image paths collected while writing; without it (deep verify)
+    the references are re-read from the JSON files under *json_dir*.
+    """
+    if json_refs is None:
+        json_refs = collect_json_image_refs(json_dir)
+    disk_files = scan_image_files(images_dir)
+
+    missing_on_disk = json_refs - disk_files
+    orphaned_on_disk = disk_files - json_refs
+
+    print("\n" + "=" * 80)
+    print("POST-GENERATION IMAGE VALIDATION")
+    print("=" * 80)
+
+    if missing_on_disk:
+        print(f"\nERROR: {len(missing_on_disk)} JSON refs with no file on disk:")
+        for p in sorted(missing_on_disk):
+            print(f"  {p}")
+    else:
+        print("\nAll JSON image references have matching files on disk.")
+
+    if orphaned_on_disk:
+        print(f"\nWARNING: {len(orphaned_on_disk)} image files not referenced in JSON:")
+        for p in sorted(orphaned_on_disk):
+            print(f"  {p}")
+    else:
+        print("No orphaned image files found.")
+
+    if not missing_on_disk and not orphaned_on_disk:
+        print("\nAll image checks passed.")
+    print("=" * 80)
+
+    return len(missing_on_disk) == 0
+
+
+# ============================================================================
+# Library API (build a book in memory, write it through OutputWriter objects)
+# ============================================================================
+
+
+class OutputWriter:
+    """Destination for the files of an in-memory build (see BookBuild.write).
+
+    Paths are relative and "/"-separated, e.g.
+    "export/eng/my-book/01_intro/01_overview.json".
+    """
+
+    def write(self, path, data):
+        """Store *data* (bytes) under *path*."""
+        raise NotImplementedError
+
+    def close(self):
+        """Finish the output (e.g. close an archive)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DirectoryWriter(OutputWriter):
+    """Write files below *root*, creating directories as needed."""
+
+    def __init__(self, root="."):
+        self.root = root
+
+    def write(self, path, data):
+        target = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+
+
+class MemoryWriter(OutputWriter):
+    """Collect files in the ``files`` dict (path -> bytes)."""
+
+    def __init__(self):
+        self.files = {}
+
+    def write(self, path, data):
+        self.files[path] = data
+
+
+ARCHIVE_FORMATS = {".zip": "zip", ".tar": "tar", ".tar.gz": "tar.gz", ".tgz": "tar.gz"}
+# Already compressed outputs are stored in zip archives, not deflated again
+ARCHIVE_STORED_SUFFIXES = (".png", ".jpg", ".jpeg", ".gz", ".br")
+
+
+def archive_format(dest):
+    """Guess the archive format from a file name ("zip" for stdout)."""
+    name = dest.lower() if isinstance(dest, str) else ""
+    for suffix, fmt in sorted(ARCHIVE_FORMATS.items(), key=lambda item: -len(item[0])):
+        if name.endswith(suffix):
+            return fmt
+    return "zip"
+
+
+class ArchiveWriter(OutputWriter):
+    """Stream outputs straight into a zip or tar archive.
+
+    An archive path is written under a temporary name in the same folder
+    and renamed into place by close(). Leaving a ``with`` block with an
+    exception calls abort() instead, so a failed build never leaves a
+    truncated archive at *dest*.
+
+    Args:
+        dest: Archive path, "-" for stdout, or a writable binary file object.
+            Neither needs to be seekable.
+        fmt: "zip", "tar" or "tar.gz" (default: from the file name, else zip).
+    """
+
+    def __init__(self, dest, fmt=None):
+        import contextlib
+        import tarfile
+        import zipfile
+
+        self.format = fmt or archive_format(dest)
+        if self.format not in ARCHIVE_FORMATS.values():
+            raise ValueError(f"Unknown archive format: {self.format}")
+        self.dest = dest
+        self.count = 0
+        self._tmp_path = None
+        self._zip = None
+        self._tar = None
+        # The archive and the file opened for it are closed together by
+        # close() or abort(), in reverse order
+        with contextlib.ExitStack() as stack:
+            if dest == "-":
+                self._stream = sys.stdout.buffer
+            elif hasattr(dest, "write"):
+                self._stream = dest
+            else:
+                self._tmp_path = f"{dest}.{os.getpid()}.tmp"
+                self._stream = stack.enter_context(open(self._tmp_path, "wb"))
+            if self.format == "zip":
+                self._zip = stack.enter_context(
+                    zipfile.ZipFile(self._stream, "w", zipfile.ZIP_DEFLATED)
+                )
+            else:
+                mode = "w|gz" if self.format == "tar.gz" else "w|"
+                self._tar = stack.enter_context(
+                    tarfile.open(fileobj=self._stream, mode=mode)
+                )
+            self._resources = stack.pop_all()
+
+    def write(self, path, data):
+        import io
+        import tarfile
+        import time
+        import zipfile
+
+        if self._zip is not None:
+            compress = (
+                zipfile.ZIP_STORED
+                if path.lower().endswith(ARCHIVE_STORED_SUFFIXES)
+                else zipfile.ZIP_DEFLATED
+            )
+            self._zip.writestr(path, data, compress_type=compress)
+        else:
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._tar.addfile(info, io.BytesIO(data))
+        self.count += 1
+
+    def close(self):
+        """Finish the archive and move it to its destination path."""
+        self._resources.close()
+        if self._tmp_path is not None:
+            os.replace(self._tmp_path, self.dest)
+            self._tmp_path = None
+        else:
+            self._stream.flush()
+
+    def abort(self):
+        """Give up on the archive; a destination path is left untouched."""
+        self._resources.close()
+        if self._tmp_path is not None:
+            os.remove(self._tmp_path)
+            self._tmp_path = None
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def convert_wmf_bytes(data, toolchain=None, cache_dir=None):
+    """Convert WMF bytes to the exported PNG bytes.
+
+    The external converters only work on files, so this goes through a
+    temporary directory. If conversion fails the WMF bytes are returned
+    unchanged, as the file-based build keeps the WMF data. *cache_dir* is
+    a conversion cache as used by BookBuild.convert_wmf_images().
+    """
+    import tempfile
+
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f"{content_fingerprint(data)}.png")
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                return f.read()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        wmf_path = os.path.join(tmpdir, "image.wmf")
+        png_path = os.path.join(tmpdir, "image.png")
+        with open(wmf_path, "wb") as f:
+            f.write(data)
+        if not convert_wmf_to_png(wmf_path, png_path, toolchain):
+            return data
+        postprocess_image(png_path)
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(png_path, tmp_path)
+            os.replace(tmp_path, cache_path)
+        with open(png_path, "rb") as f:
+            return f.read()
+
+
+_image_pipeline_version = None
+
+
+def image_pipeline_version():
+    """Short hash identifying how pictures are converted and post-processed.
+
+    Covers the source of the WMF converters and of the post-processing
+    code, and the Pillow version, so incremental builds redo the pictures
+    when any of them changes (see BookBuild.fingerprint).
+    """
+    global _image_pipeline_version
+    if _image_pipeline_version is None:
+        import hashlib
+        import inspect
+
+        digest = hashlib.sha256()
+        for func in (
+            _convert_wmf_libreoffice,
+            _convert_wmf_imagemagick,
+            postprocess_pil_image,
+            process_image_bytes,
+        ):
+            digest.update(inspect.getsource(func).encode("utf-8"))
+        try:
+            import PIL
+
+            digest.update(f"Pillow {PIL.__version__}".encode())
+        except ImportError:
+            pass
+        _image_pipeline_version = digest.hexdigest()[:12]
+    return _image_pipeline_version
+
+
+class BookImage:
+    """Lazy handle on one picture of a BookBuild.
+
+    Nothing is read from the DOCX until read() or read_raw() is called, so
+    a caller that only needs the section JSON never decodes an image.
+    """
+
+    def __init__(
+        self, build, image_ref, index, path, ref, alt="", caption="", section=None
+    ):
+        self._build = build
+        self.image_ref = image_ref
+        self.index = index
+        self.path = path  # Output path, e.g. "export/pictures/eng/book/x/image_001.png"
+        self.ref = ref  # Path used in the section JSON
+        self.alt = alt
+        self.caption = caption
+        self.section = section  # Id of the section that shows the picture
+        self.outcome = None  # Set by read(): "png", "wmf" or "raw"
+
+    @property
+    def content_type(self):
+        _partname, content_type = self.image_ref
+        return content_type
+
+    def read_raw(self):
+        """The image bytes exactly as stored in the DOCX."""
+        with self._build.image_source.open(self.image_ref) as f:
+            return f.read()
+
+    def read(self):
+        """The exported PNG bytes (converted and post-processed).
+
+        Sets ``outcome`` to "png" for a post-processed image, "wmf" for a
+        converted WMF, or "raw" when the image could not be converted and
+        its DOCX bytes are exported unchanged.
+        """
+        build = self._build
+        if self.index in build.wmf_results:
+            png_path = build.wmf_results[self.index]
+            if png_path is None:
+                self.outcome = "raw"
+                return self.read_raw()
+            self.outcome = "wmf"
+            with open(png_path, "rb") as f:
+                return f.read()
+
+        data = self.read_raw()
+        if is_wmf_image(data):
+            converted = convert_wmf_bytes(data, build.toolchain, build.wmf_cache_dir)
+            self.outcome = "raw" if converted is data else "wmf"
+            return converted
+        processed = process_image_bytes(data)
+        self.outcome = "raw" if processed is data else "png"
+        return processed
+
+
+class BookBuild:
+    """A book converted in memory by convert_book().
+
+    Attributes:
+        config: The completed book configuration.
+        sections: Section dicts (see collect_sections) with the output
+            ``path`` of the JSON file, the ``files`` of every section
+            format and the rendered ``json`` added.
+        images: BookImage handles in document order.
+        pictures_manifest: Contents of the pictures manifest.json.
+        navigation: The _navigation.json tree.
+        outputs: Every output path -> str, bytes or BookImage, in document
+            order (each section file followed by its pictures, then the
+            Markdown and book-level files).
+        chapter_of: Output path -> chapter number for the files that belong
+            to one chapter (section files, pictures and Markdown).
+    """
+
+    def __init__(self, config, image_source, toolchain=None, export_root=None):
+        self.config = config
+        self.image_source = image_source
+        self.toolchain = toolchain
+        self.export_root = export_root or EXPORT_DIR
+        self.written = {}  # path -> (size, sha256) of outputs already written
+        self.wmf_cache_dir = None  # WMF conversion cache, if any
+        self.wmf_results = {}  # image index -> converted PNG path, None if failed
+        self.log = discard_log
+        self.sections = []
+        self.images = []
+        self.pictures_manifest = {}
+        self.navigation = None
+        self.outputs = {}
+        self.chapter_of = {}
+        self._tmpdir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Release the DOCX and converted WMF files (image handles stop working)."""
+        self.image_source.close()
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def file_sections(self):
+        """Output path -> id of the section, for section files and pictures."""
+        sections = {}
+        for section in self.sections:
+            for path in section["files"]:
+                sections[path] = section["json"]["id"]
+        for image in self.images:
+            sections[image.path] = image.section
+        return sections
+
+    def fingerprint(self, path):
+        """Identity of an output's content, for incremental builds.
+
+        Text and bytes outputs are identified by their SHA-256. Pictures
+        are identified by their DOCX member (DocxImageSource.fingerprint)
+        and image_pipeline_version(), so telling whether one changed does
+        not process it. A written picture's conversion outcome (see
+        BookImage.read) is appended by the caller, as "<fingerprint>:png".
+        """
+        data = self.outputs[path]
+        if isinstance(data, BookImage):
+            source = self.image_source.fingerprint(data.image_ref)
+            return f"{source}:{image_pipeline_version()}"
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return content_fingerprint(data)
+
+    def convert_wmf_images(self, images):
+        """Convert the WMF pictures among *images* in one concurrent batch.
+
+        Conversions run through convert_wmf_batch(), so each worker has its
+        own LibreOffice profile, and are reused from and stored in
+        ``wmf_cache_dir``. read() then returns the converted PNGs. Pictures
+        converted by an earlier call are skipped.
+        """
+        import tempfile
+
+        jobs = []
+        targets = {}  # WMF temp path -> (image index, cache file)
+        seen = set(self.wmf_results)
+        reused = 0
+        for image in images:
+            if image.index in seen:
+                continue
+            seen.add(image.index)
+            if not _is_wmf_part(image.image_ref, self.image_source):
+                continue
+            data = image.read_raw()
+            cache_path = None
+            if self.wmf_cache_dir:
+                cache_path = os.path.join(
+                    self.wmf_cache_dir, f"{content_fingerprint(data)}.png"
+                )
+                if os.path.exists(cache_path):
+                    self.wmf_results[image.index] = cache_path
+                    reused += 1
+                    continue
+            if self._tmpdir is None:
+                self._tmpdir = tempfile.mkdtemp(prefix="docx2app-wmf-")
+            wmf_path = os.path.join(self._tmpdir, f"image_{image.index:03d}.wmf")
+            with open(wmf_path, "wb") as f:
+                f.write(data)
+            jobs.append((wmf_path, wmf_path[: -len(".wmf")] + ".png"))
+            targets[wmf_path] = (image.index, cache_path)
+
+        def _finish(job, ok):
+            wmf_path, png_path = job
+            index, cache_path = targets[wmf_path]
+            if ok:
+                postprocess_image(png_path)
+                if cache_path:
+                    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    shutil.copyfile(png_path, tmp_path)
+                    os.replace(tmp_path, cache_path)
+            self.wmf_results[index] = png_path if ok else None
+
+        if reused:
+            self.log(
+                f"\n✓ Reused {reused} cached WMF conversion(s) from {self.wmf_cache_dir}"
+            )
+        if not jobs:
+            return
+        if self.toolchain is None:
+            self.toolchain = get_wmf_toolchain()
+        if self.wmf_cache_dir:
+            os.makedirs(self.wmf_cache_dir, exist_ok=True)
+        self.log(f"\nConverting {len(jobs)} WMF image(s)...")
+        convert_wmf_batch(jobs, toolchain=self.toolchain, on_done=_finish, log=self.log)
+
+    def iter_files(self, paths=None):
+        """Yield (path, bytes) for every output, processing images lazily.
+
+        *paths* limits the outputs to those paths (still in document order).
+        The WMF pictures among them are converted first, in one batch (see
+        convert_wmf_images). A picture used by several outputs (its JSON and
+        Markdown copies) is processed once; its bytes are kept only until
+        its last output.
+        """
+        if paths is None:
+            paths = list(self.outputs)
+        else:
+            selected = set(paths)
+            paths = [path for path in self.outputs if path in selected]
+        images = [
+            self.outputs[path]
+            for path in paths
+            if isinstance(self.outputs[path], BookImage)
+        ]
+        self.convert_wmf_images(images)
+
+        uses = collections.Counter(image.index for image in images)
+        processed = {}  # image index -> bytes still needed by a later output
+        for path in paths:
+            data = self.outputs[path]
+            if isinstance(data, BookImage):
+                index = data.index
+                data = processed.pop(index, None) or data.read()
+                uses[index] -= 1
+                if uses[index]:
+                    processed[index] = data
+            elif isinstance(data, str):
+                data = data.encode("utf-8")
+            yield path, data
+
+    def write(self, writer, paths=None):
+        """Send the outputs to *writer* in document order; return the count.
+
+        *paths* limits the outputs written (see iter_files). Sizes and
+        hashes are recorded on the way, so a manifest() call afterwards
+        does not process the pictures again.
+        """
+        import hashlib
+
+        count = 0
+        for path, data in self.iter_files(paths):
+            writer.write(path, data)
+            self.written[path] = (len(data), hashlib.sha256(data).hexdigest())
+            count += 1
+        return count
+
+    def manifest(self):
+        """Build-manifest dict (as in _build_manifest.json) for the export files.
+
+        Before write(), pictures are processed to hash them, so this costs
+        as much as writing the build.
+        """
+        import hashlib
+
+        prefix = self.export_root.rstrip("/") + "/"
+        if all(path in self.written for path in self.outputs):
+            sizes = ((path, *self.written[path]) for path in self.outputs)
+        else:
+            sizes = (
+                (path, len(data), hashlib.sha256(data).hexdigest())
+                for path, data in self.iter_files()
+            )
+
+        section_of = self.file_sections()
+        files = []
+        for path, size, sha256 in sizes:
+            if not path.startswith(prefix):
+                continue  # Markdown export lives outside the export root
+            rel_path = path[len(prefix) :]
+            files.append(
+                {
+                    "path": rel_path,
+                    "size": size,
+                    "sha256": sha256,
+                    "type": output_file_type(rel_path),
+                    "section": section_of.get(path),
+                }
+            )
+        files.sort(key=lambda entry: entry["path"])
+        return {
+            "version": BUILD_MANIFEST_VERSION,
+            "book": self.config["canonical_id"],
+            "root": self.export_root,
+            "files": files,
+        }
+
+
+def discard_log(*args, **kwargs):
+    """A log callable that drops progress messages (see convert_book)."""
+
+
+def render_book_outputs(
+    config, export_root, doc_order, section_stats, section_records, pictures_manifest
+):
+    """Render the book-level files of a build as {path: text}.
+
+    Covers _book.toml, _navigation.json, the bundle and static search index
+    when enabled, and the pictures manifest when the book has pictures.
+    *section_records* are (section, section JSON) pairs in document order.
+    Shared by build_book_json() and convert_book(); RAG chunks are
+    streamed by the callers and the SQLite database and BM25 index need
+    files on disk. Returns (navigation tree, outputs).
+    """
+    book_dir = os.path.join(export_root, config["language"], config["canonical_id"])
+    compact = config["compact_json"]
+    navigation = build_navigation_tree(config, doc_order, section_stats)
+    outputs = {
+        os.path.join(book_dir, "_book.toml"): render_book_toml(config),
+        os.path.join(book_dir, NAVIGATION_FILE): dump_json(navigation, compact),
+    }
+    if config["bundle"]:
+        outputs[os.path.join(book_dir, BUNDLE_FILE)] = render_book_bundle(
+            config, section_records
+        )
+    if config["search_index"]:
+        index_meta, shards = build_search_index(section_records, config["language"])
+        search_dir = os.path.join(book_dir, SEARCH_INDEX_DIR)
+        for name, shard in shards.items():
+            outputs[os.path.join(search_dir, f"{name}.json")] = json.dumps(
+                shard, ensure_ascii=False, separators=(",", ":")
+            )
+        outputs[os.path.join(search_dir, "index.json")] = json.dumps(
+            index_meta, ensure_ascii=False, separators=(",", ":")
+        )
+    if pictures_manifest:
+        manifest_path = os.path.join(
+            book_pictures_dir(config, export_root), "manifest.json"
+        )
+        outputs[manifest_path] = dump_json(pictures_manifest, compact)
+    return navigation, outputs
+
+
+def convert_book(
+    docx,
+    config=None,
+    exceptions=None,
+    markdown=False,
+    toolchain=None,
+    export_root=None,
+    markdown_dir=None,
+    quiet=True,
+    book_ir=None,
+    wmf_cache_dir=None,
+    log=None,
+):
+    """Convert a DOCX into a BookBuild without writing any files.
+
+    Args:
+        docx: Path, bytes, or seekable binary file object of the DOCX.
+        config: Book configuration overrides (keys of BOOK_CONFIG_DEFAULTS);
+            title and canonical_id fall back to the DOCX metadata.
+        exceptions: TOC exceptions dict ({"wrong": "correct"}, see
+            load_exceptions).
+        markdown: Also render the Markdown export.
+        toolchain: WmfToolchain for WMF pictures (default: probed on first
+            WMF image read).
+        export_root: Prefix of the JSON output paths (default EXPORT_DIR).
+        markdown_dir: Prefix of the Markdown output paths (default
+            MARKDOWN_DIR).
+        quiet: Suppress the parser's progress output (unless *log* is given).
+        book_ir: Already parsed book (see load_book_ir), to skip parsing.
+        wmf_cache_dir: Reuse and store WMF conversions here (see
+            WMF_CACHE_DIR); by default nothing is written.
+        log: Callable taking print() arguments that receives the parser's
+            progress output (default: print, or nothing when *quiet*).
+            sys.stdout is never replaced, so other threads are unaffected.
+
+    The section JSON, navigation, _book.toml and pictures manifest are
+    always produced, plus the bundle, search index, RAG chunks and
+    MessagePack/CBOR sections when enabled in *config*. The SQLite
+    database, BM25 index and precompressed files need files on disk and
+    are only written by build_book_json().
+
+    Returns:
+        BookBuild; close it (or use it as a context manager) when done.
+    """
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+
+    if isinstance(docx, (bytes, bytearray)):
+        docx = io.BytesIO(docx)
+    export_root = export_root or EXPORT_DIR
+    markdown_dir = markdown_dir or MARKDOWN_DIR
+    if log is None:
+        log = discard_log if quiet else print
+
+    if book_ir is None:
+        book_ir = parse_book_ir(docx, exceptions or {}, log)
+    config = complete_book_config(
+        {**BOOK_CONFIG_DEFAULTS, **(config or {})}, docx, book_ir["metadata"], log
+    )
+    doc_order = build_document_order(book_ir["chapters"], book_ir["title_map"])
+    sections = collect_sections(
+        doc_order,
+        book_ir["chapter_elements"],
+        book_ir["section_elements"],
+        book_ir["subsection_elements"],
+    )
+
+    build = BookBuild(
+        config, DocxImageSource(docx, use_mmap=USE_MMAP), toolchain, export_root
+    )
+    build.wmf_cache_dir = wmf_cache_dir
+    build.log = log
+    book_id = config["canonical_id"]
+    book_dir = f"{export_root}/{config['language']}/{book_id}"
+    section_writers = create_section_writers(
+        config["section_formats"], config["compact_json"]
+    )
+    images_by_index = {}
+    records = []
+    section_stats = {}
+
+    # JSON and Markdown are independent renderers over the same IR
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        md_future = (
+            executor.submit(render_markdown_sections, sections) if markdown else None
+        )
+
+        for section in sections:
+            doc_id = f"{book_id}/{section['chapter_dir_name']}/{section['file_name']}"
+            section_images = []
+
+            def image_json(image_ref, img_idx, alt_text, caption_text):
+                pictures_dir, image_filename, image_rel_path = image_output_location(
+                    config, export_root, section["section_id"], img_idx
+                )
+                image = BookImage(
+                    build,
+                    image_ref,
+                    img_idx,
+                    f"{pictures_dir}/{image_filename}",
+                    image_rel_path,
+                    alt_text,
+                    caption_text,
+                    doc_id,
+                )
+                images_by_index.setdefault(img_idx, image)
+                section_images.append(image)
+                build.pictures_manifest[f"{section['section_id']}/{image_filename}"] = {
+                    "alt": alt_text,
+                    "caption": caption_text,
+                }
+                return extract_image_json(image_rel_path, alt_text, caption_text)
+
+            content = render_section_content(section["elements"], image_json)
+            prev_id, next_id = get_prev_next_ids(
+                doc_order, book_id, section["position"]
+            )
+            section_json = build_section_json(
+                content,
+                book_id,
+                section["chapter_dir_name"],
+                section["file_name"],
+                section["title"],
+                section["section_id"],
+                prev_id,
+                next_id,
+            )
+            base_path = (
+                f"{book_dir}/{section['chapter_dir_name']}/{section['file_name']}"
+            )
+            files = [base_path + writer.extension for writer in section_writers]
+            build.sections.append(
+                {
+                    **section,
+                    "path": base_path + ".json",
+                    "files": files,
+                    "json": section_json,
+                }
+            )
+            records.append((section, section_json))
+            for writer, path in zip(section_writers, files):
+                encoded = writer.encode(section_json)
+                build.outputs[path] = encoded
+                build.chapter_of[path] = section["chapter_num"]
+                if writer.name == "json":
+                    section_stats[
+                        (
+                            section["chapter_num"],
+                            section["section_num"],
+                            section["subsection_num"],
+                        )
+                    ] = section_stat(content, encoded)
+            for image in section_images:
+                build.outputs[image.path] = image
+                build.chapter_of[image.path] = section["chapter_num"]
+        build.images = list(images_by_index.values())
+
+        if markdown:
+            for section, md_text, md_images in md_future.result():
+                md_chapter_dir = f"{markdown_dir}/chapter_{section['chapter_num']:02d}"
+                md_paths = {f"{md_chapter_dir}/{section['md_name']}": md_text}
+                for img_idx, img_path in md_images:
+                    md_paths[f"{md_chapter_dir}/{img_path}"] = images_by_index[img_idx]
+                for path, data in md_paths.items():
+                    build.outputs[path] = data
+                    build.chapter_of[path] = section["chapter_num"]
+            build.outputs[f"{markdown_dir}/README.md"] = render_markdown_index(
+                book_ir["chapters"]
+            )
+            build.outputs[f"{markdown_dir}/style.css"] = create_markdown_css()
 
-    disk_files = set()
-    for root, dirs, files in os.walk(images_dir):
-        for f in files:
-            if f.endswith((".png", ".jpg")) and ".backup" not in f:
-                rel = os.path.relpath(os.path.join(root, f), images_dir)
-                disk_files.add(f"pictures/{rel}")
+    build.navigation, book_outputs = render_book_outputs(
+        config, export_root, doc_order, section_stats, records, build.pictures_manifest
+    )
+    build.outputs.update(book_outputs)
+    if config["rag_chunks"]:
+        section_titles = document_section_titles(doc_order)
+        build.outputs[f"{book_dir}/{RAG_CHUNKS_FILE}"] = "".join(
+            dump_jsonl_record(chunk)
+            for section, section_json in records
+            for chunk in section_chunks(section, section_json, section_titles, config)
+        )
+    return build
 
-    missing_on_disk = json_refs - disk_files
-    orphaned_on_disk = disk_files - json_refs
 
-    print("\n" + "=" * 80)
-    print("POST-GENERATION IMAGE VALIDATION")
-    print("=" * 80)
+def build_book_json(
+    incremental=False, no_cache=False, deep_verify=False, book_ir=None, chapters=None
+):
+    """Build book JSON files and markdown from Word document (md2rag format).
 
-    if missing_on_disk:
-        print(f"\nERROR: {len(missing_on_disk)} JSON refs with no file on disk:")
-        for p in sorted(missing_on_disk):
-            print(f"  {p}")
-    else:
-        print("\nAll JSON image references have matching files on disk.")
+    The book is converted by convert_book() and written through a
+    DirectoryWriter; write_book_build() adds the steps that need the files
+    on disk.
 
-    if orphaned_on_disk:
-        print(f"\nWARNING: {len(orphaned_on_disk)} image files not referenced in JSON:")
-        for p in sorted(orphaned_on_disk):
-            print(f"  {p}")
-    else:
-        print("No orphaned image files found.")
+    With *incremental*, the previous output is kept and only files whose
+    fingerprint changed are rewritten; files the previous build produced
+    but this one does not are deleted.
 
-    if not missing_on_disk and not orphaned_on_disk:
-        print("\nAll image checks passed.")
-    print("=" * 80)
+    The parsed book is cached in IR_CACHE_DIR, keyed by the DOCX, the
+    exceptions file and the parser source, and converted WMF images in
+    WMF_CACHE_DIR; *no_cache* forces a fresh parse and fresh conversions.
 
-    return len(missing_on_disk) == 0
+    Image validation uses the references collected while converting;
+    *deep_verify* re-reads them from the written JSON files instead.
+
+    *book_ir* is an already parsed book (e.g. kept warm by watch mode); the
+    exceptions file and IR cache are then not consulted.
 
+    *chapters* (a set of chapter numbers) limits the section, picture and
+    Markdown files written to those chapters. Document order, prev/next
+    links and the book-level outputs still cover the whole book, and the
+    other chapters' files are left as they are.
 
-def build_book_json():
-    """Build book JSON files and markdown from Word document (md2rag format)."""
+    Returns a summary dict (book id, language, JSON directory and counts).
+    """
     print("=" * 80)
     print("BUILD BOOK - JSON (md2rag format) and Markdown Generation")
     print("=" * 80)
     print()
 
+    if book_ir is None:
+        # Load exceptions
+        print("Loading exceptions configuration...")
+        exceptions = load_exceptions(EXCEPTIONS_FILE)
+        if exceptions:
+            print(f"✓ Loaded {len(exceptions)} exception(s)")
+        else:
+            print("✓ No exceptions configured")
+        print()
+
+        # Parse the document, or reuse the IR cached for the same inputs
+        book_ir = load_book_ir(INPUT_DOCX, EXCEPTIONS_FILE, exceptions, no_cache)
+
     # Load book configuration
     print("Loading book configuration...")
-    config = load_book_config(INPUT_DOCX)
+    config = load_book_config(INPUT_DOCX, metadata=book_ir["metadata"])
     print(f"  Book: {config['title']}")
     print(f"  Canonical ID: {config['canonical_id']}")
     print(f"  Language: {config['language']}")
     print(f"  Pictures location: {config.get('pictures_location', 'root')}")
     print()
 
-    # Load exceptions
-    print("Loading exceptions configuration...")
-    exceptions = load_exceptions(EXCEPTIONS_FILE)
-    if exceptions:
-        print(f"✓ Loaded {len(exceptions)} exception(s)")
+    print("Converting chapters...")
+    with convert_book(
+        INPUT_DOCX,
+        config,
+        markdown=ENABLE_MARKDOWN,
+        export_root=EXPORT_DIR,
+        markdown_dir=MARKDOWN_DIR,
+        book_ir=book_ir,
+        wmf_cache_dir=None if no_cache else WMF_CACHE_DIR,
+        log=print,
+    ) as build:
+        print(f"✓ {len(build.sections)} sections in document order")
+        return write_book_build(build, book_ir, incremental, deep_verify, chapters)
+
+
+def write_book_build(
+    build, book_ir, incremental=False, deep_verify=False, selected_chapters=None
+):
+    """Write a BookBuild to the export directories (see build_book_json).
+
+    Besides the build's own outputs this writes what needs the files on
+    disk: the SQLite database, BM25 index, precompressed siblings, WMF
+    backups, logs, the build manifest and the incremental build state.
+    """
+    config = build.config
+    chapters = book_ir["chapters"]
+    book_id = config["canonical_id"]
+    export_root = build.export_root
+    lang = config["language"]
+    json_book_dir = os.path.join(export_root, lang, book_id)
+    pictures_location = config.get("pictures_location", "root")
+
+    # Probe WMF converters once up front instead of failing per image
+    if any(_is_wmf_part(image.image_ref, build.image_source) for image in build.images):
+        if build.toolchain is None:
+            build.toolchain = get_wmf_toolchain()
     else:
-        print("✓ No exceptions configured")
-    print()
+        print("✓ No WMF images, skipping conversion toolchain probe")
+    toolchain = build.toolchain
+
+    # Fingerprints of the previous build's outputs (empty for a clean build)
+    partial = selected_chapters is not None
+    previous_outputs = load_build_state(json_book_dir) if incremental or partial else {}
+
+    if partial:
+        unknown = sorted(set(selected_chapters) - set(chapters))
+        if unknown:
+            raise ValueError(
+                f"Chapter(s) not in the book: {', '.join(map(str, unknown))}"
+                f" (available: {min(chapters)}-{max(chapters)})"
+            )
+        names = ", ".join(str(num) for num in sorted(selected_chapters))
+        print(f"\nPartial build: writing chapter(s) {names} only")
+        if not previous_outputs:
+            print("  ⚠️  No previous build found, other chapters will be missing")
+
+    if incremental or partial:
+        if incremental:
+            print(f"\nIncremental build: reusing {json_book_dir}")
+            print(f"  {len(previous_outputs)} output(s) recorded by the previous build")
+        os.makedirs(json_book_dir, exist_ok=True)
+        if ENABLE_MARKDOWN:
+            os.makedirs(MARKDOWN_DIR, exist_ok=True)
+    else:
+        # Clean and create output directories
+        print(f"\nCleaning output directory: {json_book_dir}")
+        if os.path.exists(json_book_dir):
+            shutil.rmtree(json_book_dir)
+        os.makedirs(json_book_dir, exist_ok=True)
 
-    # Load document
-    print(f"Loading document: {INPUT_DOCX}")
-    doc = Document(INPUT_DOCX)
-    print(f"✓ Loaded {len(doc.paragraphs)} paragraphs, {len(doc.tables)} tables")
-    print()
+        # Clean pictures directory if using root location
+        if pictures_location == "root":
+            pictures_root = os.path.join(export_root, "pictures", lang, book_id)
+            if os.path.exists(pictures_root):
+                shutil.rmtree(pictures_root)
 
-    # Extract TOC structure for navigation index
-    print("Extracting TOC structure...")
-    expected_sequence = extract_toc_structure(doc)
-    print(f"✓ Extracted {len(expected_sequence)} expected entries")
-    print()
+        if ENABLE_MARKDOWN:
+            print(f"Cleaning markdown directory: {MARKDOWN_DIR}")
+            if os.path.exists(MARKDOWN_DIR):
+                shutil.rmtree(MARKDOWN_DIR)
+            os.makedirs(MARKDOWN_DIR, exist_ok=True)
+
+    def is_unchanged(path, fingerprint):
+        """True if an incremental build can keep the existing file.
+
+        Pictures are recorded with their conversion outcome. One exported
+        raw, because its conversion failed, is never kept, so the next
+        build tries again.
+        """
+        previous = previous_outputs.get(path)
+        if isinstance(build.outputs.get(path), BookImage):
+            matches = previous in (f"{fingerprint}:png", f"{fingerprint}:wmf")
+        else:
+            matches = previous == fingerprint
+        return incremental and matches and os.path.exists(path)
 
-    # Parse structure
-    chapters, chapter_elements, section_elements, subsection_elements = (
-        parse_document_structure(doc, exceptions, expected_sequence)
-    )
+    def is_selected(path):
+        """True if this build writes the file (see *chapters*)."""
+        chapter = build.chapter_of.get(path)
+        return not partial or chapter is None or chapter in selected_chapters
 
-    # Reconcile frame-positioned images with orphan captions
-    print("\nReconciling image-caption pairs...")
-    reconcile_captions_and_images(
-        chapters, chapter_elements, section_elements, subsection_elements
+    # Fingerprint every output this build covers; write the changed ones
+    outputs = {
+        path: build.fingerprint(path) for path in build.outputs if is_selected(path)
+    }
+    to_write = [path for path in outputs if not is_unchanged(path, outputs[path])]
+    kept_outputs = set(outputs).difference(to_write)
+
+    print(f"\nWriting {len(to_write)} file(s)...")
+    build.write(DirectoryWriter(), to_write)
+    for path in outputs:
+        data = build.outputs[path]
+        if path in kept_outputs:
+            outputs[path] = previous_outputs[path]
+        elif isinstance(data, BookImage):
+            outputs[path] = f"{outputs[path]}:{data.outcome}"
+    written = len(to_write)
+    unchanged = len(kept_outputs)
+    print_build_files(build, outputs, set(to_write))
+
+    # Keep the original of every converted WMF next to its PNG
+    for image in build.images:
+        if image.outcome == "wmf" and image.path in build.written:
+            with open(image.path + ".wmf.backup", "wb") as f:
+                f.write(image.read_raw())
+
+    # Hashes of everything written, for the manifest and precompression
+    content_hashes = {
+        path: fingerprint
+        for path, fingerprint in outputs.items()
+        if not isinstance(build.outputs[path], BookImage)
+    }
+    content_hashes.update(
+        (path, sha256) for path, (_size, sha256) in build.written.items()
     )
 
-    # Build title map from expected sequence
-    title_map = {}
-    for entry in expected_sequence:
-        chapter = entry["chapter"]
-        section = entry.get("section", 0)
-        subsection = entry.get("subsection")
-        title = entry["title"]
+    section_records = [(section, section["json"]) for section in build.sections]
 
-        if subsection is not None:
-            key = (chapter, section, subsection)
-        elif section == 0:
-            key = (chapter, "chapter")
+    # Write the SQLite database (rebuilt only when a section changed)
+    if config["sqlite"]:
+        db_path = os.path.join(json_book_dir, SQLITE_FILE)
+        fingerprint = content_fingerprint(
+            json.dumps(
+                [config["title"], [record[1] for record in section_records]]
+            ).encode("utf-8")
+        )
+        outputs[db_path] = fingerprint
+        if is_unchanged(db_path, fingerprint):
+            unchanged += 1
+            kept_outputs.add(db_path)
+            print(f"= {db_path} (unchanged)")
         else:
-            key = (chapter, section)
-
-        title_map[key] = title
-
-    # Build document order for prev/next links
-    print("\nBuilding document order for navigation links...")
-    doc_order = build_document_order(chapters, title_map)
-    print(f"✓ {len(doc_order)} sections in document order")
+            written += 1
+            count = write_book_sqlite(db_path, config, section_records)
+            print(f"✓ Created {db_path} ({count} sections)")
+
+    # Build the BM25 retrieval index
+    if config["bm25_index"]:
+        unit = config["bm25_unit"]
+        if unit == "chunks" and not config["rag_chunks"]:
+            print('Warning: bm25_unit = "chunks" needs rag_chunks, using sections')
+            unit = "sections"
+        index_dir = os.path.join(json_book_dir, BM25_INDEX_DIR)
+        chunks_path = (
+            os.path.join(json_book_dir, RAG_CHUNKS_FILE)
+            if config["rag_chunks"]
+            else None
+        )
+        index_files = build_bm25_index(
+            iter_bm25_documents(section_records, unit, chunks_path),
+            config["language"],
+            index_dir,
+            unit,
+        )
+        if index_files:
+            for path in index_files:
+                outputs[path] = None
+            print(f"✓ BM25 index over {unit}: {index_dir}")
+
+    # Section JSON, navigation and pictures manifest get .gz/.br siblings
+    json_documents = {section["path"]: section["json"] for section in build.sections}
+    json_documents[os.path.join(json_book_dir, NAVIGATION_FILE)] = build.navigation
+    if build.pictures_manifest:
+        manifest_path = os.path.join(
+            book_pictures_dir(config, export_root), "manifest.json"
+        )
+        json_documents[manifest_path] = build.pictures_manifest
+    json_paths = [path for path in json_documents if path in outputs]
+
+    # Size both JSON styles for the report, reusing the one written
+    precompress = available_precompress_formats(config["precompress"])
+    json_sizes = {"indent=2": 0, "compact": 0}  # Totals for the size report
+    style = config["compact_json"]
+    if style or precompress:
+        for path in json_paths:
+            sizes = {
+                style: len(build.outputs[path].encode("utf-8")),
+                not style: len(
+                    dump_json(json_documents[path], not style).encode("utf-8")
+                ),
+            }
+            json_sizes["indent=2"] += sizes[False]
+            json_sizes["compact"] += sizes[True]
+
+    # Write .gz/.br siblings of every JSON file in parallel
+    if precompress:
+        print(f"\nPrecompressing {len(json_paths)} JSON file(s)...")
+        # A sibling is reused only if the build state says it was compressed
+        # from exactly the content its source has now
+        fingerprints = {
+            path
+            + PRECOMPRESS_SUFFIXES[fmt]: precompress_fingerprint(
+                fmt, content_hashes[path]
+            )
+            for path in json_paths
+            for fmt in precompress
+        }
+        reusable = [
+            sibling
+            for sibling, fingerprint in fingerprints.items()
+            if previous_outputs.get(sibling) == fingerprint
+        ]
+        compressed_sizes, siblings = precompress_outputs(
+            json_paths, precompress, reusable=reusable
+        )
+        for sibling, sha256 in siblings.items():
+            outputs[sibling] = fingerprints[sibling]
+            if sha256 is None:
+                kept_outputs.add(sibling)
+            else:
+                content_hashes[sibling] = sha256
+        json_sizes.update(compressed_sizes)
+    if style or precompress:
+        outputs[write_size_report(json_book_dir, len(json_paths), json_sizes)] = None
+
+    # Logs and the build manifest are rewritten on every build but must
+    # survive stale cleanup
+    outputs[os.path.join(json_book_dir, "image_sequence_validation.log")] = None
+    outputs[os.path.join(json_book_dir, BUILD_MANIFEST_FILE)] = None
+    if toolchain:
+        outputs[os.path.join(json_book_dir, "wmf_toolchain.log")] = None
+
+    # Files of the chapters this partial build skipped stay on record
+    if partial:
+        selected_prefixes = set()
+        for section in build.sections:
+            if section["chapter_num"] not in selected_chapters:
+                continue
+            chapter_slug = section["section_id"].split("/")[0]
+            pictures_dir = image_output_location(config, export_root, chapter_slug, 0)[
+                0
+            ]
+            selected_prefixes.update(
+                [
+                    os.path.join(json_book_dir, section["chapter_dir_name"], ""),
+                    os.path.join(pictures_dir, ""),
+                    os.path.join(
+                        MARKDOWN_DIR, f"chapter_{section['chapter_num']:02d}", ""
+                    ),
+                ]
+            )
+        for path, fingerprint in previous_outputs.items():
+            if path not in outputs and not path.startswith(tuple(selected_prefixes)):
+                outputs[path] = fingerprint
+                kept_outputs.add(path)
+
+    if incremental or partial:
+        removed = remove_stale_outputs(previous_outputs, outputs)
+        label = "Partial build" if partial else "Incremental build"
+        print(
+            f"\n{label}: {written} file(s) written,"
+            f" {unchanged} unchanged, {removed} stale file(s) removed"
+        )
 
-    # Create lookup for prev/next by position
-    # doc_order entries: (chapter_num, section_num, subsection_num, title, dir_name, file_name,
-    #                     chapter_slug, section_slug, subsection_slug)
-    book_id = config["canonical_id"]
+    print("\n" + "=" * 80)
+    print("✓ Book JSON (md2rag format) and Markdown generation complete!")
+    print(f"✓ JSON files: {json_book_dir}/")
+    if build.pictures_manifest:
+        print(f"✓ Pictures: {book_pictures_dir(config, export_root)}/")
+    if ENABLE_MARKDOWN:
+        print(f"✓ Markdown files: {MARKDOWN_DIR}/")
+    print("=" * 80)
 
-    def get_prev_next_ids(position):
-        """Get prev and next document IDs for a given position in doc_order."""
-        prev_id = None
-        next_id = None
+    # Validate image references against files on disk
+    images_root = book_pictures_dir(config, export_root)
+    if os.path.exists(images_root):
+        if deep_verify:
+            validate_images(images_root, json_dir=json_book_dir)
+        else:
+            validate_images(
+                images_root, json_refs={image.ref for image in build.images}
+            )
 
-        if position > 0:
-            prev_entry = doc_order[position - 1]
-            prev_id = f"{book_id}/{prev_entry[4]}/{prev_entry[5]}"
+    # Validate image index sequence to detect misplaced pairings
+    print("\nValidating image sequence...")
+    validate_image_sequence(
+        chapters,
+        book_ir["chapter_elements"],
+        book_ir["section_elements"],
+        book_ir["subsection_elements"],
+        log_dir=json_book_dir,
+    )
 
-        if position < len(doc_order) - 1:
-            next_entry = doc_order[position + 1]
-            next_id = f"{book_id}/{next_entry[4]}/{next_entry[5]}"
+    # Record WMF toolchain probe and circuit breaker decisions
+    if toolchain:
+        print("\nWMF conversion toolchain report...")
+        toolchain.write_log(json_book_dir)
+
+    # List every exported file with its hash for deployment and verification
+    print("\nWriting build manifest...")
+    write_build_manifest(
+        json_book_dir,
+        export_root,
+        book_id,
+        outputs,
+        content_hashes,
+        kept_outputs,
+        build.file_sections(),
+    )
 
-        return prev_id, next_id
+    # Record output fingerprints for the next incremental build
+    save_build_state(json_book_dir, outputs)
 
-    # Create position lookup
-    position_lookup = {}
-    for i, entry in enumerate(doc_order):
-        chapter_num, section_num, subsection_num = entry[0], entry[1], entry[2]
-        position_lookup[(chapter_num, section_num, subsection_num)] = i
+    return {
+        "book_id": book_id,
+        "language": lang,
+        "json_dir": json_book_dir,
+        "sections": len(build.sections),
+        "images": len(build.images),
+        "written": written,
+        "unchanged": unchanged,
+    }
 
-    # Set up output directories with new structure: export/{lang}/{book_id}/
-    export_root = "export"
-    lang = config["language"]
-    json_book_dir = os.path.join(export_root, lang, book_id)
 
-    # Clean and create output directories
-    print(f"\nCleaning output directory: {json_book_dir}")
-    if os.path.exists(json_book_dir):
-        shutil.rmtree(json_book_dir)
-    os.makedirs(json_book_dir, exist_ok=True)
+def print_build_files(build, outputs, written):
+    """Print what a build wrote (✓) and kept (=).
 
-    # Clean pictures directory if using root location
-    pictures_location = config.get("pictures_location", "root")
-    if pictures_location == "root":
-        pictures_root = os.path.join(export_root, "pictures", lang, book_id)
-        if os.path.exists(pictures_root):
-            shutil.rmtree(pictures_root)
+    Section files are listed one by one, pictures and Markdown files as
+    counts. *outputs* are the paths the build covers, *written* those it
+    wrote.
+    """
+    section_files = set()
+    current_chapter = None
+    for section in build.sections:
+        section_files.update(section["files"])
+        if section["path"] not in outputs:
+            continue  # Chapter not selected by a partial build
+        if section["chapter_num"] != current_chapter:
+            current_chapter = section["chapter_num"]
+            print(f"\n  Chapter {current_chapter} ({section['chapter_dir_name']}):")
+        indent = "      " if section["subsection_num"] is not None else "    "
+        label = ", ".join(os.path.basename(path) for path in section["files"])
+        if any(path in written for path in section["files"]):
+            print(f"{indent}✓ {label} ({len(section['json']['content'])} items)")
+        else:
+            print(f"{indent}= {label} (unchanged)")
 
-    if ENABLE_MARKDOWN:
-        print(f"Cleaning markdown directory: {MARKDOWN_DIR}")
-        if os.path.exists(MARKDOWN_DIR):
-            shutil.rmtree(MARKDOWN_DIR)
-        os.makedirs(MARKDOWN_DIR, exist_ok=True)
+    counts = collections.Counter()
+    book_files = []
+    for path in outputs:
+        if path in section_files:
+            continue
+        if isinstance(build.outputs[path], BookImage):
+            kind = "Pictures"
+        elif path in build.chapter_of:
+            kind = "Markdown"
+        else:
+            book_files.append(path)
+            continue
+        counts[kind, path in written] += 1
+    print()
+    for kind in ("Pictures", "Markdown"):
+        if counts[kind, True] or counts[kind, False]:
+            print(
+                f"✓ {kind}: {counts[kind, True]} written,"
+                f" {counts[kind, False]} unchanged"
+            )
 
-    # Track images for markdown and manifest
-    image_paths = {}
-    manifest_data = {}  # For pictures manifest.json
+    print("\nCreating book-level files...")
+    search_dir = os.path.join(
+        build.export_root,
+        build.config["language"],
+        build.config["canonical_id"],
+        SEARCH_INDEX_DIR,
+        "",
+    )
+    search_files = 0
+    for path in book_files:
+        if path.startswith(search_dir):
+            search_files += 1
+        elif path in written:
+            print(f"✓ Created {path}")
+        else:
+            print(f"= {path} (unchanged)")
+    if search_files:
+        print(f"✓ Search index: {search_files} file(s) under {search_dir}")
 
-    # Process each chapter
-    print("\nProcessing chapters...")
-    for chapter_num in sorted(chapters.keys()):
-        # Get chapter title and create slugified directory name
-        chapter_key = (chapter_num, "chapter")
-        chapter_title = title_map.get(chapter_key, f"Chapter {chapter_num}")
-        chapter_slug = slugify(chapter_title)
-        chapter_dir_name = f"{chapter_num:02d}_{chapter_slug}"
 
-        print(f"\n  Chapter {chapter_num} ({chapter_dir_name}):")
+# book_config.toml options that only apply to builds on disk
+ARCHIVE_SKIPPED_OPTIONS = ("sqlite", "bm25_index", "precompress")
 
-        chapter_dir = os.path.join(json_book_dir, chapter_dir_name)
-        os.makedirs(chapter_dir, exist_ok=True)
 
-        md_chapter_dir = None
-        if ENABLE_MARKDOWN:
-            md_chapter_dir = os.path.join(MARKDOWN_DIR, f"chapter_{chapter_num:02d}")
-            os.makedirs(md_chapter_dir, exist_ok=True)
+def build_book_archive(dest, fmt=None, no_cache=False):
+    """Build the book straight into a zip or tar archive (see ArchiveWriter).
 
-        chapter_data = chapters[chapter_num]
+    Uses the same inputs and caches as build_book_json(), but nothing is
+    written to the export directories: section files, pictures, manifests
+    and the build manifest are streamed into the archive in document order.
+    With *dest* "-" the archive goes to stdout and progress to stderr.
+    Returns the number of files in the archive.
+    """
+    import contextlib
+
+    # Grab stdout for the archive before progress output is redirected
+    writer = ArchiveWriter(dest, fmt)
+    progress = (
+        contextlib.redirect_stdout(sys.stderr)
+        if dest == "-"
+        else contextlib.nullcontext()
+    )
+    with writer, progress:
+        print("=" * 80)
+        print(f"BUILD BOOK - {writer.format} archive")
+        print("=" * 80)
+        print()
+
+        exceptions = load_exceptions(EXCEPTIONS_FILE)
+        book_ir = load_book_ir(INPUT_DOCX, EXCEPTIONS_FILE, exceptions, no_cache)
+        config = load_book_config(INPUT_DOCX, metadata=book_ir["metadata"])
+        skipped = [key for key in ARCHIVE_SKIPPED_OPTIONS if config[key]]
+        if skipped:
+            print(
+                f"Warning: {', '.join(skipped)} not supported for archive builds,"
+                " skipping"
+            )
+        with convert_book(
+            INPUT_DOCX,
+            config,
+            exceptions,
+            markdown=ENABLE_MARKDOWN,
+            book_ir=book_ir,
+            wmf_cache_dir=None if no_cache else WMF_CACHE_DIR,
+            log=print,
+        ) as build:
+            print(f"\nWriting {len(build.outputs)} file(s) to {dest}...")
+            count = build.write(writer)
+            book_dir = (
+                f"{build.export_root}/{config['language']}/{config['canonical_id']}"
+            )
+            manifest_text = dump_json(build.manifest(), config["compact_json"])
+            writer.write(
+                f"{book_dir}/{BUILD_MANIFEST_FILE}", manifest_text.encode("utf-8")
+            )
+            count += 1
+        print(f"✓ {count} file(s) in {dest} ({writer.format})")
+    return count
 
-        # Build intro section (chapter-level elements)
-        intro_content = []
-        # Section path for intro: chapter_slug/intro
-        intro_section_path = f"{chapter_slug}/intro"
-
-        if chapter_num in chapter_elements:
-            for elem_type, elem in chapter_elements[chapter_num]:
-                if elem_type == "paragraph":
-                    intro_content.append(extract_paragraph_json(elem))
-                elif elem_type == "table":
-                    intro_content.append(extract_table_json(elem))
-                elif elem_type == "table_cell":
-                    intro_content.append(extract_table_cell_json(elem))
-                elif elem_type == "image":
-                    # elem is a tuple: (image_part, image_index, alt, caption)
-                    if isinstance(elem, tuple) and len(elem) >= 2:
-                        image_part = elem[0]
-                        img_idx = elem[1]
-                        alt_text = elem[2] if len(elem) > 2 else ""
-                        caption_text = elem[3] if len(elem) > 3 else ""
-
-                        # Save to JSON directory with new structure
-                        result = extract_and_save_image(
-                            image_part, img_idx, config, export_root, intro_section_path
-                        )
-                        if result:
-                            image_filename, image_rel_path = result
-                            intro_content.append(
-                                extract_image_json(
-                                    image_rel_path, alt_text, caption_text
-                                )
-                            )
-                            # Add to manifest
-                            manifest_data[f"{intro_section_path}/{image_filename}"] = {
-                                "alt": alt_text,
-                                "caption": caption_text,
-                            }
 
-                        # Also save to markdown directory if enabled
-                        if ENABLE_MARKDOWN:
-                            md_img_path = extract_and_save_image_markdown(
-                                image_part,
-                                img_idx,
-                                MARKDOWN_DIR,
-                                f"chapter_{chapter_num:02d}",
-                            )
-                            if md_img_path:
-                                if (chapter_num, None, None) not in image_paths:
-                                    image_paths[(chapter_num, None, None)] = []
-                                image_paths[(chapter_num, None, None)].append(
-                                    md_img_path
-                                )
+def book_plan(book_ir, config, chapters=None):
+    """Return the chapter/section tree of a parsed book as plain data.
 
-        # Save intro with md2rag metadata
-        if intro_content:
-            intro_file_name = "00_intro"
-            position = position_lookup.get((chapter_num, 0, None), 0)
-            prev_id, next_id = get_prev_next_ids(position)
-            # Human-readable section_id
-            section_id = build_section_id(chapter_slug)
+    Every section lists its number, title, section_id, output file, element
+    counts by type and the indices of its images. Chapter intros without
+    content are listed with written=False. *chapters* limits the tree to
+    those chapter numbers. Nothing is read from the DOCX or written.
+    """
+    doc_order = build_document_order(book_ir["chapters"], book_ir["title_map"])
+    sections = {
+        section["position"]: section
+        for section in collect_sections(
+            doc_order,
+            book_ir["chapter_elements"],
+            book_ir["section_elements"],
+            book_ir["subsection_elements"],
+        )
+    }
 
-            intro_json = build_section_json(
-                intro_content,
-                book_id,
-                chapter_dir_name,
-                intro_file_name,
-                chapter_title,
-                section_id,
-                prev_id,
-                next_id,
-            )
+    plan_chapters = {}
+    for position, entry in enumerate(doc_order):
+        chapter_num, section_num, subsection_num, title, dir_name, file_name = entry[:6]
+        if chapters is not None and chapter_num not in chapters:
+            continue
+        chapter = plan_chapters.setdefault(
+            chapter_num,
+            {"chapter": chapter_num, "title": title, "dir": dir_name, "sections": []},
+        )
+        section = sections.get(position)
+        elements = section["elements"] if section else []
+        items = {}
+        for elem_type, _ in elements:
+            items[elem_type] = items.get(elem_type, 0) + 1
+        number = f"{chapter_num}.{section_num}"
+        if subsection_num is not None:
+            number += f".{subsection_num}"
+        chapter["sections"].append(
+            {
+                "number": number,
+                "title": title,
+                "section_id": section["section_id"] if section else None,
+                "file": f"{dir_name}/{file_name}.json",
+                "written": section is not None,
+                "items": items,
+                "images": [
+                    elem[1] for elem_type, elem in elements if elem_type == "image"
+                ],
+            }
+        )
 
-            intro_file = os.path.join(chapter_dir, f"{intro_file_name}.json")
-            with open(intro_file, "w", encoding="utf-8") as f:
-                json.dump(intro_json, f, indent=2)
-            print(f"    ✓ {intro_file_name}.json ({len(intro_content)} items)")
-
-            if ENABLE_MARKDOWN and md_chapter_dir and chapter_num in chapter_elements:
-                md_file = os.path.join(md_chapter_dir, "intro.md")
-                md_content = list(chapter_elements[chapter_num])
-                key = (chapter_num, None, None)
-                if key in image_paths:
-                    for img_path in image_paths[key]:
-                        md_content.append(("image", img_path))
-                save_markdown_file(md_file, md_content, chapter_num)
-                print("    ✓ intro.md")
-
-        # Process sections
-        for section_num in sorted(chapter_data["sections"].keys()):
-            section_data = chapter_data["sections"][section_num]
+    plan_sections = [
+        section
+        for chapter in plan_chapters.values()
+        for section in chapter["sections"]
+        if section["written"]
+    ]
+    return {
+        "book_id": config["canonical_id"],
+        "language": config["language"],
+        "title": config["title"],
+        "json_dir": os.path.join(
+            EXPORT_DIR, config["language"], config["canonical_id"]
+        ),
+        "sections": len(plan_sections),
+        "images": sum(len(section["images"]) for section in plan_sections),
+        "chapters": list(plan_chapters.values()),
+    }
 
-            # Get section title and create slugified file name
-            section_key = (chapter_num, section_num)
-            section_title = title_map.get(section_key, f"{chapter_num}.{section_num}")
-            section_slug = slugify(section_title)
-            section_file_name = f"{section_num:02d}_{section_slug}"
-            # Section path for pictures: chapter_slug/section_slug
-            section_path = f"{chapter_slug}/{section_slug}"
 
-            # Build section content
-            section_content = []
+def print_book_plan(plan):
+    """Print a book plan (see book_plan) as an indented tree."""
+    for chapter in plan["chapters"]:
+        chapter_images = sum(len(s["images"]) for s in chapter["sections"])
+        print(
+            f"\nChapter {chapter['chapter']}: {chapter['title']}"
+            f"  ({chapter['dir']}, {chapter_images} images)"
+        )
+        for section in chapter["sections"]:
+            indent = "    " if section["number"].count(".") > 1 else "  "
+            if not section["written"]:
+                print(f"{indent}{section['title']}  (no intro content, not written)")
+                continue
+            count = sum(section["items"].values())
+            images = section["images"]
+            image_text = ""
+            if images:
+                image_text = f", images #{', #'.join(str(index) for index in images)}"
+            print(
+                f"{indent}{section['title']}"
+                f"  [{count} items{image_text}]  -> {section['file']}"
+            )
+    print()
+    print(
+        f"✓ {len(plan['chapters'])} chapters, {plan['sections']} sections,"
+        f" {plan['images']} images -> {plan['json_dir']}"
+    )
 
-            key = (chapter_num, section_num)
-            if key in section_elements:
-                for elem_type, elem in section_elements[key]:
-                    if elem_type == "paragraph":
-                        section_content.append(extract_paragraph_json(elem))
-                    elif elem_type == "table":
-                        section_content.append(extract_table_json(elem))
-                    elif elem_type == "table_cell":
-                        section_content.append(extract_table_cell_json(elem))
-                    elif elem_type == "image":
-                        if isinstance(elem, tuple) and len(elem) >= 2:
-                            image_part = elem[0]
-                            img_idx = elem[1]
-                            alt_text = elem[2] if len(elem) > 2 else ""
-                            caption_text = elem[3] if len(elem) > 3 else ""
-
-                            result = extract_and_save_image(
-                                image_part, img_idx, config, export_root, section_path
-                            )
-                            if result:
-                                image_filename, image_rel_path = result
-                                section_content.append(
-                                    extract_image_json(
-                                        image_rel_path, alt_text, caption_text
-                                    )
-                                )
-                                manifest_data[f"{section_path}/{image_filename}"] = {
-                                    "alt": alt_text,
-                                    "caption": caption_text,
-                                }
-
-                            if ENABLE_MARKDOWN:
-                                md_img_path = extract_and_save_image_markdown(
-                                    image_part,
-                                    img_idx,
-                                    MARKDOWN_DIR,
-                                    f"chapter_{chapter_num:02d}",
-                                )
-                                if md_img_path:
-                                    if (
-                                        chapter_num,
-                                        section_num,
-                                        None,
-                                    ) not in image_paths:
-                                        image_paths[
-                                            (chapter_num, section_num, None)
-                                        ] = []
-                                    image_paths[
-                                        (chapter_num, section_num, None)
-                                    ].append(md_img_path)
-
-            # Save section with md2rag metadata
-            position = position_lookup.get((chapter_num, section_num, None), 0)
-            prev_id, next_id = get_prev_next_ids(position)
-            # Human-readable section_id
-            section_id = build_section_id(chapter_slug, section_slug)
 
-            section_json = build_section_json(
-                section_content,
-                book_id,
-                chapter_dir_name,
-                section_file_name,
-                section_title,
-                section_id,
-                prev_id,
-                next_id,
-            )
+def plan_book(no_cache=False, chapters=None, json_path=None):
+    """Print the book's structure without converting images or writing output.
 
-            section_file = os.path.join(chapter_dir, f"{section_file_name}.json")
-            with open(section_file, "w", encoding="utf-8") as f:
-                json.dump(section_json, f, indent=2)
-            print(f"    ✓ {section_file_name}.json ({len(section_content)} items)")
+    Runs TOC extraction, structure parsing, caption reconciliation and the
+    image sequence check (or takes the parsed book from the IR cache), then
+    prints the chapter/section tree. Image parts are never read, and no
+    export or Markdown directories are created. With *json_path* the plan
+    is also written as JSON ("-" for stdout, with progress on stderr).
+    Returns the plan dict, including the sequence warning count.
+    """
+    import contextlib
 
-            if ENABLE_MARKDOWN and md_chapter_dir:
-                key = (chapter_num, section_num)
-                if key in section_elements:
-                    md_file = os.path.join(
-                        md_chapter_dir, f"section_{section_num:02d}.md"
-                    )
-                    md_content = list(section_elements[key])
-                    img_key = (chapter_num, section_num, None)
-                    if img_key in image_paths:
-                        for img_path in image_paths[img_key]:
-                            md_content.append(("image", img_path))
-                    save_markdown_file(md_file, md_content, chapter_num, section_num)
-                    print(f"    ✓ section_{section_num:02d}.md")
-
-            # Process subsections
-            if section_data["subsections"]:
-                for subsection_num in sorted(section_data["subsections"].keys()):
-                    # Get subsection title and create slugified file name
-                    subsection_key = (chapter_num, section_num, subsection_num)
-                    subsection_title = title_map.get(
-                        subsection_key,
-                        f"{chapter_num}.{section_num}.{subsection_num}",
-                    )
-                    subsection_slug = slugify(subsection_title)
-                    subsection_file_name = (
-                        f"{section_num:02d}_{subsection_num:02d}_{subsection_slug}"
-                    )
-                    # Section path for pictures: chapter_slug/section_slug/subsection_slug
-                    subsection_path = f"{chapter_slug}/{section_slug}/{subsection_slug}"
+    progress = (
+        contextlib.redirect_stdout(sys.stderr)
+        if json_path == "-"
+        else contextlib.nullcontext()
+    )
+    with progress:
+        print("=" * 80)
+        print("BUILD BOOK - Structure plan (no files written)")
+        print("=" * 80)
+        print()
+
+        exceptions = load_exceptions(EXCEPTIONS_FILE)
+        if exceptions:
+            print(f"✓ Loaded {len(exceptions)} exception(s)")
+        else:
+            print("✓ No exceptions configured")
+        book_ir = load_book_ir(INPUT_DOCX, EXCEPTIONS_FILE, exceptions, no_cache)
+        config = load_book_config(INPUT_DOCX, metadata=book_ir["metadata"])
+        print(f"  Book: {config['title']}")
+        print(f"  Canonical ID: {config['canonical_id']}")
+        print(f"  Language: {config['language']}")
+
+        if chapters is not None:
+            unknown = sorted(set(chapters) - set(book_ir["chapters"]))
+            if unknown:
+                raise ValueError(
+                    f"Chapter(s) not in the book: {', '.join(map(str, unknown))}"
+                )
+        plan = book_plan(book_ir, config, chapters)
+        print_book_plan(plan)
+
+        print("\nValidating image sequence...")
+        plan["sequence_warnings"] = validate_image_sequence(
+            book_ir["chapters"],
+            book_ir["chapter_elements"],
+            book_ir["section_elements"],
+            book_ir["subsection_elements"],
+        )
 
-                    subsection_content = []
+    if json_path:
+        text = json.dumps(plan, indent=2, ensure_ascii=False)
+        if json_path == "-":
+            print(text)
+        else:
+            with open(json_path, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+            print(f"✓ Plan written to {json_path}")
+    return plan
 
-                    key = (chapter_num, section_num, subsection_num)
-                    if key in subsection_elements:
-                        for elem_type, elem in subsection_elements[key]:
-                            if elem_type == "paragraph":
-                                subsection_content.append(extract_paragraph_json(elem))
-                            elif elem_type == "table":
-                                subsection_content.append(extract_table_json(elem))
-                            elif elem_type == "table_cell":
-                                subsection_content.append(extract_table_cell_json(elem))
-                            elif elem_type == "image":
-                                if isinstance(elem, tuple) and len(elem) >= 2:
-                                    image_part = elem[0]
-                                    img_idx = elem[1]
-                                    alt_text = elem[2] if len(elem) > 2 else ""
-                                    caption_text = elem[3] if len(elem) > 3 else ""
-
-                                    result = extract_and_save_image(
-                                        image_part,
-                                        img_idx,
-                                        config,
-                                        export_root,
-                                        subsection_path,
-                                    )
-                                    if result:
-                                        image_filename, image_rel_path = result
-                                        subsection_content.append(
-                                            extract_image_json(
-                                                image_rel_path, alt_text, caption_text
-                                            )
-                                        )
-                                        manifest_data[
-                                            f"{subsection_path}/{image_filename}"
-                                        ] = {
-                                            "alt": alt_text,
-                                            "caption": caption_text,
-                                        }
 
-                                    if ENABLE_MARKDOWN:
-                                        md_img_path = extract_and_save_image_markdown(
-                                            image_part,
-                                            img_idx,
-                                            MARKDOWN_DIR,
-                                            f"chapter_{chapter_num:02d}",
-                                        )
-                                        if md_img_path:
-                                            key = (
-                                                chapter_num,
-                                                section_num,
-                                                subsection_num,
-                                            )
-                                            if key not in image_paths:
-                                                image_paths[key] = []
-                                            image_paths[key].append(md_img_path)
-
-                    # Save subsection with md2rag metadata
-                    position = position_lookup.get(
-                        (chapter_num, section_num, subsection_num), 0
-                    )
-                    prev_id, next_id = get_prev_next_ids(position)
-                    # Human-readable section_id
-                    sub_section_id = build_section_id(
-                        chapter_slug, section_slug, subsection_slug
-                    )
+WATCH_POLL_INTERVAL = 1.0  # Seconds between input mtime checks
+WATCH_DEBOUNCE = 0.5  # Seconds the inputs must stay unchanged before a rebuild
 
-                    subsection_json = build_section_json(
-                        subsection_content,
-                        book_id,
-                        chapter_dir_name,
-                        subsection_file_name,
-                        subsection_title,
-                        sub_section_id,
-                        prev_id,
-                        next_id,
-                    )
 
-                    subsection_file = os.path.join(
-                        chapter_dir, f"{subsection_file_name}.json"
-                    )
-                    with open(subsection_file, "w", encoding="utf-8") as f:
-                        json.dump(subsection_json, f, indent=2)
-                    print(
-                        f"      ✓ {subsection_file_name}.json ({len(subsection_content)} items)"
-                    )
+def input_snapshot(paths):
+    """(mtime_ns, size) of each path, None for missing files."""
+    snapshot = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            snapshot[path] = None
+    return snapshot
 
-                    if ENABLE_MARKDOWN and md_chapter_dir:
-                        key = (chapter_num, section_num, subsection_num)
-                        if key in subsection_elements:
-                            md_file = os.path.join(
-                                md_chapter_dir,
-                                f"section_{section_num:02d}_{subsection_num:02d}.md",
-                            )
-                            md_content = list(subsection_elements[key])
-                            img_key = (chapter_num, section_num, subsection_num)
-                            if img_key in image_paths:
-                                for img_path in image_paths[img_key]:
-                                    md_content.append(("image", img_path))
-                            save_markdown_file(
-                                md_file,
-                                md_content,
-                                chapter_num,
-                                section_num,
-                                subsection_num,
-                            )
-                            print(
-                                f"      ✓ section_{section_num:02d}_{subsection_num:02d}.md"
-                            )
 
-    # Create markdown index and CSS
-    if ENABLE_MARKDOWN:
-        create_markdown_index(chapters, MARKDOWN_DIR)
+def watch_book(no_cache=False, interval=None, debounce=None, chapters=None):
+    """Rebuild incrementally whenever the DOCX, exceptions or config change.
 
-    # Create _book.toml manifest
-    print("\nCreating book manifest...")
-    create_book_toml(config, json_book_dir)
+    Inputs are polled every *interval* seconds; a rebuild starts once they
+    have not changed for *debounce* seconds, so a save that writes the file
+    in several steps triggers one cycle. The loaded document is kept in
+    memory between cycles and only the affected stages run again:
 
-    # Create pictures manifest.json if we have images
-    pictures_dir = None
-    if manifest_data:
-        print("Creating pictures manifest...")
-        if pictures_location == "root":
-            pictures_dir = os.path.join(export_root, "pictures", lang, book_id)
-        else:
-            pictures_dir = os.path.join(json_book_dir, "pictures")
-        manifest_path = os.path.join(pictures_dir, "manifest.json")
-        os.makedirs(pictures_dir, exist_ok=True)
-        with open(manifest_path, "w", encoding="utf-8") as f:
-            json.dump(manifest_data, f, indent=2)
-        print(f"✓ Created {manifest_path}")
+    - DOCX changed: load and parse it again.
+    - Only the exceptions changed: re-apply them to the loaded document
+      (no XML loading or TOC extraction).
+    - Only book_config.toml changed: re-render from the parsed book.
 
-    print("\n" + "=" * 80)
-    print("✓ Book JSON (md2rag format) and Markdown generation complete!")
-    print(f"✓ JSON files: {json_book_dir}/")
-    if pictures_dir:
-        print(f"✓ Pictures: {pictures_dir}/")
-    if ENABLE_MARKDOWN:
-        print(f"✓ Markdown files: {MARKDOWN_DIR}/")
-    print("=" * 80)
+    Each cycle is an incremental build, so unchanged files stay untouched;
+    *chapters* limits it to those chapters (see build_book_json). Stops on
+    Ctrl+C.
+    """
+    import time
+
+    interval = WATCH_POLL_INTERVAL if interval is None else interval
+    debounce = WATCH_DEBOUNCE if debounce is None else debounce
+    paths = [INPUT_DOCX, EXCEPTIONS_FILE, BOOK_CONFIG_FILE]
+    document = None  # (doc, expected_sequence) of the current DOCX
+    book_ir = None
+    changed = set(paths)
+    snapshot = input_snapshot(paths)
+
+    while True:
+        timings = {}
+        cycle_start = time.monotonic()
+        try:
+            if INPUT_DOCX in changed:
+                document = None
+                book_ir = None
+            if book_ir is None or EXCEPTIONS_FILE in changed:
+                exceptions = load_exceptions(EXCEPTIONS_FILE)
+                cache_key = ir_cache_key(INPUT_DOCX, EXCEPTIONS_FILE)
+                cached = None if no_cache else load_ir_cache(cache_key)
+                if cached is not None:
+                    print(f"IR cache: hit ({cache_key[:12]}) - skipping parsing")
+                    book_ir = cached
+                else:
+                    if document is None:
+                        start = time.monotonic()
+                        document = load_book_document(INPUT_DOCX)
+                        timings["load"] = time.monotonic() - start
+                    else:
+                        print("Re-applying exceptions to the loaded document...")
+                    start = time.monotonic()
+                    book_ir = structure_book_ir(*document, exceptions)
+                    if not no_cache:
+                        save_ir_cache(cache_key, book_ir)
+                    timings["structure"] = time.monotonic() - start
+            start = time.monotonic()
+            build_book_json(
+                incremental=True, no_cache=no_cache, book_ir=book_ir, chapters=chapters
+            )
+            timings["render"] = time.monotonic() - start
+            stages = ", ".join(f"{name} {secs:.2f}s" for name, secs in timings.items())
+            print(
+                f"\n[watch] ✓ Cycle done in {time.monotonic() - cycle_start:.2f}s"
+                f" ({stages})"
+            )
+        except Exception as e:
+            print(f"\n[watch] ❌ Build failed: {e}")
+            import traceback
 
-    # Validate image references against files on disk
-    if pictures_location == "root":
-        images_root = os.path.join(export_root, "pictures", lang, book_id)
-    else:
-        images_root = os.path.join(json_book_dir, "pictures")
-    if os.path.exists(images_root):
-        validate_images(json_book_dir, images_root)
+            traceback.print_exc()
 
-    # Validate image index sequence to detect misplaced pairings
-    print("\nValidating image sequence...")
-    validate_image_sequence(
-        chapters,
-        chapter_elements,
-        section_elements,
-        subsection_elements,
-        log_dir=json_book_dir,
+        print(f"[watch] Watching {', '.join(paths)} (Ctrl+C to stop)...")
+        while True:
+            time.sleep(interval)
+            current = input_snapshot(paths)
+            if current == snapshot:
+                continue
+            # Debounce: wait until the files stop changing
+            while True:
+                time.sleep(debounce)
+                settled = input_snapshot(paths)
+                if settled == current:
+                    break
+                current = settled
+            changed = {path for path in paths if current[path] != snapshot[path]}
+            snapshot = current
+            print(f"\n[watch] Changed: {', '.join(sorted(changed))}")
+            break
+
+
+def parse_chapter_selection(text):
+    """Parse a chapter selection such as "3,7-9" into {3, 7, 8, 9}."""
+    chapters = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        try:
+            start = int(first)
+            end = int(last) if dash else start
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid chapter selection: {part!r}")
+        if end < start:
+            raise argparse.ArgumentTypeError(f"empty chapter range: {part!r}")
+        chapters.update(range(start, end + 1))
+    if not chapters:
+        raise argparse.ArgumentTypeError("no chapters selected")
+    return chapters
+
+
+def parse_args(argv=None):
+    """Parse command-line options for a build."""
+    parser = argparse.ArgumentParser(
+        description="Build book JSON and Markdown from a Word document."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="keep previous output and rewrite only changed files",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="ignore the parsed-document (IR) cache and parse the DOCX again",
     )
+    parser.add_argument(
+        "--deep-verify",
+        action="store_true",
+        help="validate images by re-reading the written JSON files",
+    )
+    parser.add_argument(
+        "--chapters",
+        type=parse_chapter_selection,
+        metavar="LIST",
+        help="write only these chapters, e.g. 3,7-9 (other chapters' files are kept)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="rebuild incrementally whenever the DOCX, exceptions or config change",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="print the chapter/section tree only; no images are converted"
+        " and nothing is written",
+    )
+    parser.add_argument(
+        "--plan-json",
+        metavar="PATH",
+        help="with --plan, also write the tree as JSON ('-' for stdout)",
+    )
+    parser.add_argument(
+        "--archive",
+        metavar="PATH",
+        help="write the export into a .zip, .tar or .tar.gz archive instead"
+        " of export/ and export_md/ ('-' for a zip on stdout)",
+    )
+    parser.add_argument(
+        "--archive-format",
+        choices=sorted(set(ARCHIVE_FORMATS.values())),
+        help="archive format (default: from the --archive file name)",
+    )
+    args = parser.parse_args(argv)
+    if args.archive and (
+        args.incremental or args.deep_verify or args.watch or args.chapters
+    ):
+        parser.error(
+            "--archive cannot be combined with --incremental, --deep-verify,"
+            " --watch or --chapters"
+        )
+    if args.plan_json and not args.plan:
+        parser.error("--plan-json requires --plan")
+    if args.plan and (
+        args.incremental or args.deep_verify or args.watch or args.archive
+    ):
+        parser.error(
+            "--plan cannot be combined with --incremental, --deep-verify,"
+            " --watch or --archive"
+        )
+    return args
 
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        build_book_json()
+        if args.plan:
+            plan_book(
+                no_cache=args.no_cache, chapters=args.chapters, json_path=args.plan_json
+            )
+        elif args.archive:
+            build_book_archive(args.archive, args.archive_format, args.no_cache)
+        elif args.watch:
+            try:
+                watch_book(no_cache=args.no_cache, chapters=args.chapters)
+            except KeyboardInterrupt:
+                print("\n[watch] Stopped")
+        else:
+            build_book_json(
+                incremental=args.incremental,
+                no_cache=args.no_cache,
+                deep_verify=args.deep_verify,
+                chapters=args.chapters,
+            )
     except Exception as e:
-        print(f"\n❌ Error: {e}")
+        print(
+            f"\n❌ Error: {e}",
+            file=sys.stderr if "-" in (args.archive, args.plan_json) else None,
+        )
         import traceback
 
         traceback.print_exc()
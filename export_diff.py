@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Compare two build manifests and list the files to upload or delete.
+
+Each side is a _build_manifest.json file, or a directory that is searched
+for them (e.g. a whole export/ tree with several books). Only the recorded
+paths and SHA-256 hashes are compared; file contents are never read.
+The manifests do not list themselves, so each new manifest is always in the
+upload set: a deploy driven by the diff then ships it with the files.
+
+Usage:
+    python export_diff.py old_export/ export/
+    python export_diff.py deployed/_build_manifest.json export/ --json
+"""
+
+import argparse
+import json
+import os
+import sys
+
+BUILD_MANIFEST_FILE = "_build_manifest.json"
+
+
+def find_manifests(path):
+    """Return the manifest paths for a manifest file or a directory tree."""
+    if os.path.isfile(path):
+        return [path]
+    manifests = []
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.name == BUILD_MANIFEST_FILE and entry.is_file():
+                    manifests.append(entry.path)
+                elif entry.is_dir(follow_symlinks=False) and entry.name != "pictures":
+                    stack.append(entry.path)
+    return sorted(manifests)
+
+
+def manifest_entry(manifest_path, data):
+    """Entry for a manifest file itself, which sits in {lang}/{book}/."""
+    import hashlib
+
+    parts = os.path.normpath(os.path.abspath(manifest_path)).split(os.sep)
+    return {
+        "path": "/".join(parts[-3:]),
+        "size": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "type": "manifest",
+        "section": None,
+    }
+
+
+def load_files(path):
+    """Return {path relative to the export root: manifest entry}.
+
+    The manifests themselves are included with type "manifest".
+    """
+    files = {}
+    for manifest_path in find_manifests(path):
+        with open(manifest_path, "rb") as f:
+            data = f.read()
+        manifest = json.loads(data)
+        for entry in manifest["files"]:
+            files[entry["path"]] = entry
+        entry = manifest_entry(manifest_path, data)
+        files[entry["path"]] = entry
+    return files
+
+
+def diff_manifests(old_files, new_files):
+    """Return {"upload": [...], "delete": [...], "unchanged": n}.
+
+    New manifests are always uploaded, so the deployed manifest matches the
+    deployed files.
+    """
+    upload = [
+        path
+        for path, entry in sorted(new_files.items())
+        if entry.get("type") == "manifest"
+        or path not in old_files
+        or old_files[path]["sha256"] != entry["sha256"]
+    ]
+    delete = sorted(path for path in old_files if path not in new_files)
+    return {
+        "upload": upload,
+        "delete": delete,
+        "unchanged": len(new_files) - len(upload),
+        "upload_bytes": sum(new_files[path]["size"] for path in upload),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("old", help="previous manifest file or export directory")
+    parser.add_argument("new", help="new manifest file or export directory")
+    parser.add_argument("--json", action="store_true", help="print the diff as JSON")
+    args = parser.parse_args(argv)
+
+    new_files = load_files(args.new)
+    if not new_files:
+        print(f"❌ No {BUILD_MANIFEST_FILE} found in {args.new}")
+        return 1
+    diff = diff_manifests(load_files(args.old), new_files)
+
+    if args.json:
+        json.dump(diff, sys.stdout, indent=2)
+        print()
+        return 0
+
+    for path in diff["upload"]:
+        print(f"+ {path}")
+    for path in diff["delete"]:
+        print(f"- {path}")
+    print(
+        f"\n{len(diff['upload'])} to upload ({diff['upload_bytes']:,} bytes),"
+        f" {len(diff['delete'])} to delete, {diff['unchanged']} unchanged"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
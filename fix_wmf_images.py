@@ -4,51 +4,22 @@ Fix WMF images that were saved with PNG extensions.
 
 This script:
 1. Scans for PNG files that are actually WMF format
-2. Converts them to proper PNG using ImageMagick
+2. Converts them to proper PNG using LibreOffice/ImageMagick, in parallel
 3. Backs up the original WMF files
+4. Remembers verified PNGs in a state file so reruns skip them
 """
 
+import argparse
+import hashlib
+import json
 import os
 import shutil
-import subprocess
+import time
 from pathlib import Path
 
+from build_book import convert_wmf_batch, get_wmf_toolchain, postprocess_image
 
-def postprocess_image(image_path, max_size=1200, border=10, white_threshold=240):
-    """Auto-crop whitespace and limit resolution of an image."""
-    try:
-        from PIL import Image, ImageChops
-    except ImportError:
-        return
-
-    try:
-        img = Image.open(image_path)
-    except Exception:
-        return
-
-    if img.mode not in ("RGB", "L"):
-        img = img.convert("RGB")
-
-    bg = Image.new(img.mode, img.size, tuple([white_threshold] * len(img.getbands())))
-    diff = ImageChops.subtract(bg, img)
-    bbox = diff.getbbox()
-    if bbox:
-        left, top, right, bottom = bbox
-        left = max(0, left - border)
-        top = max(0, top - border)
-        right = min(img.width, right + border)
-        bottom = min(img.height, bottom + border)
-        img = img.crop((left, top, right, bottom))
-
-    if max_size > 0:
-        longest = max(img.width, img.height)
-        if longest > max_size:
-            scale = max_size / longest
-            new_w = int(img.width * scale)
-            new_h = int(img.height * scale)
-            img = img.resize((new_w, new_h), Image.LANCZOS)
-
-    img.save(image_path)
+STATE_FILE_NAME = ".fix_wmf_state.json"
 
 
 def is_wmf_image(image_path):
@@ -61,127 +32,70 @@ def is_wmf_image(image_path):
         return False
 
 
-def convert_wmf_to_png(wmf_path, output_path):
-    """Convert WMF to PNG using LibreOffice + ImageMagick chain."""
-    import tempfile
-
-    # Try LibreOffice first (best for WMF)
-    soffice = shutil.which("soffice") or shutil.which("libreoffice")
-    if soffice:
-        try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                # Convert WMF to PDF using LibreOffice
-                pdf_path = os.path.join(tmpdir, "output.pdf")
-                result = subprocess.run(
-                    [
-                        soffice,
-                        "--headless",
-                        "--convert-to",
-                        "pdf",
-                        "--outdir",
-                        tmpdir,
-                        wmf_path,
-                    ],
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                )
-
-                # Find the generated PDF (LibreOffice might name it differently)
-                pdf_files = list(Path(tmpdir).glob("*.pdf"))
-                if pdf_files:
-                    pdf_path = str(pdf_files[0])
-
-                    # Convert PDF to PNG using ImageMagick
-                    # Use -trim to extract just the vector content (not the full page)
-                    magick_cmd = None
-                    if shutil.which("magick"):
-                        magick_cmd = [
-                            "magick",
-                            "-density",
-                            "150",
-                            pdf_path,
-                            "-flatten",
-                            "-trim",
-                            "+repage",
-                            "png:" + output_path,
-                        ]
-                    elif shutil.which("convert"):
-                        magick_cmd = [
-                            "convert",
-                            "-density",
-                            "150",
-                            pdf_path,
-                            "-flatten",
-                            "-trim",
-                            "+repage",
-                            "png:" + output_path,
-                        ]
-
-                    if magick_cmd:
-                        result = subprocess.run(
-                            magick_cmd,
-                            capture_output=True,
-                            text=True,
-                            timeout=30,
-                        )
-
-                        if result.returncode == 0 and os.path.exists(output_path):
-                            # Verify it's actually a PNG
-                            with open(output_path, "rb") as f:
-                                header = f.read(8)
-                                if header[:4] == b"\x89PNG":
-                                    return True
-                                else:
-                                    print(f"    ⚠️  Output is not PNG format")
-                                    return False
-
-        except subprocess.TimeoutExpired:
-            print(f"    ⚠️  Conversion timeout")
-            return False
-        except Exception as e:
-            print(f"    ⚠️  LibreOffice conversion error: {e}")
-
-    # Fallback: Try ImageMagick directly (needs WMF delegates)
+def _iter_png_files(base_path):
+    """Yield PNG paths under *base_path* using os.scandir (no full listing)."""
+    stack = [str(base_path)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".png") and entry.is_file():
+                    yield Path(entry.path), entry.stat()
+
+
+def _sha256(path):
+    """Hash a file in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_state(state_path):
+    """Load the verified-file state ({relpath: {size, mtime_ns, sha256}})."""
     try:
-        magick_cmd = None
-        if shutil.which("magick"):
-            magick_cmd = ["magick", wmf_path, "png:" + output_path]
-        elif shutil.which("convert"):
-            magick_cmd = ["convert", wmf_path, "png:" + output_path]
-        else:
-            print("    ⚠️  No conversion tools found")
-            return False
-
-        result = subprocess.run(
-            magick_cmd,
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-        if result.returncode == 0 and os.path.exists(output_path):
-            # Verify it's actually a PNG
-            with open(output_path, "rb") as f:
-                header = f.read(8)
-                if header[:4] == b"\x89PNG":
-                    return True
-                else:
-                    print(f"    ⚠️  Output is not PNG format")
-                    return False
-        else:
-            print(f"    ⚠️  Conversion failed: {result.stderr.strip()}")
-            return False
-    except subprocess.TimeoutExpired:
-        print(f"    ⚠️  Conversion timeout")
-        return False
-    except Exception as e:
-        print(f"    ⚠️  Conversion error: {e}")
+
+def save_state(state_path, state):
+    """Write the state file atomically."""
+    tmp_path = str(state_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, state_path)
+
+
+def _state_entry(path, stat=None):
+    stat = stat or os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _sha256(path)}
+
+
+def _is_verified(entry, stat, path):
+    """True if *path* still matches its state entry.
+
+    Size and mtime matching is enough; if only the mtime moved, the hash
+    decides (and the entry is refreshed by the caller).
+    """
+    if not entry or entry.get("size") != stat.st_size:
         return False
+    if entry.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    return entry.get("sha256") == _sha256(path)
+
 
+def fix_wmf_images(base_dir="export/pictures", jobs=None, full=False):
+    """Find and convert all WMF files with PNG extensions.
 
-def fix_wmf_images(base_dir="export/pictures"):
-    """Find and convert all WMF files with PNG extensions."""
+    Args:
+        base_dir: Pictures directory to scan.
+        jobs: Parallel conversions (default: build_book.WMF_CONCURRENCY).
+        full: Ignore the state file and re-check every PNG.
+    """
     print("=" * 80)
     print("FIX WMF IMAGES")
     print("=" * 80)
@@ -207,72 +121,102 @@ def fix_wmf_images(base_dir="export/pictures"):
     if not has_magick:
         print("⚠️  ImageMagick not found - using LibreOffice only")
 
-    # Find all PNG files
-    png_files = list(base_path.rglob("*.png"))
-    print(f"Scanning {len(png_files)} PNG files...")
+    start = time.monotonic()
+    state_path = base_path / STATE_FILE_NAME
+    state = {} if full else load_state(state_path)
+
+    # Scan PNGs, skipping those already verified on a previous run
+    print(f"Scanning PNG files in {base_dir}...")
+    scanned = 0
+    skipped = 0
+    wmf_files = []
+    for png_path, stat in _iter_png_files(base_path):
+        scanned += 1
+        rel = png_path.relative_to(base_path).as_posix()
+        if _is_verified(state.get(rel), stat, png_path):
+            if state[rel]["mtime_ns"] != stat.st_mtime_ns:
+                state[rel]["mtime_ns"] = stat.st_mtime_ns
+            skipped += 1
+            continue
+        if is_wmf_image(png_path):
+            wmf_files.append(png_path)
+            print(f"Found WMF: {rel}")
+        else:
+            state[rel] = _state_entry(png_path, stat)
+    print(f"✓ Scanned {scanned} PNG files ({skipped} unchanged since last run)")
     print()
 
-    wmf_count = 0
     converted_count = 0
     failed_count = 0
 
-    for png_path in png_files:
-        if is_wmf_image(png_path):
-            wmf_count += 1
-            print(f"Found WMF: {png_path.relative_to(base_path)}")
-
-            # Create temporary WMF file
-            wmf_temp = str(png_path) + ".wmf.tmp"
-            png_temp = str(png_path) + ".png.tmp"
-
+    if wmf_files:
+        # The original WMF is hard-linked to its backup name, so the converter
+        # reads it without a copy and the result replaces the PNG in one rename.
+        conversions = []
+        for png_path in wmf_files:
+            backup_path = str(png_path) + ".wmf.backup"
+            if os.path.exists(backup_path):
+                os.remove(backup_path)
             try:
-                # Copy to temp WMF file
-                shutil.copy2(png_path, wmf_temp)
-
-                # Convert to PNG
-                if convert_wmf_to_png(wmf_temp, png_temp):
-                    # Backup original WMF
-                    backup_path = str(png_path) + ".wmf.backup"
-                    shutil.move(str(png_path), backup_path)
-
-                    # Move converted PNG to final location
-                    shutil.move(png_temp, str(png_path))
-
-                    # Post-process: auto-crop whitespace and limit resolution
-                    postprocess_image(str(png_path))
-
-                    # Clean up temp WMF
-                    os.remove(wmf_temp)
-
-                    print(f"  ✓ Converted and post-processed successfully")
-                    print(f"  ✓ Original backed up to: {Path(backup_path).name}")
-                    converted_count += 1
-                else:
-                    # Clean up temp files
-                    if os.path.exists(wmf_temp):
-                        os.remove(wmf_temp)
-                    if os.path.exists(png_temp):
-                        os.remove(png_temp)
-                    failed_count += 1
-
-            except Exception as e:
-                print(f"  ❌ Error: {e}")
-                # Clean up temp files
-                if os.path.exists(wmf_temp):
-                    os.remove(wmf_temp)
+                os.link(png_path, backup_path)
+            except OSError:
+                shutil.copy2(png_path, backup_path)
+            conversions.append((backup_path, str(png_path) + ".png.tmp"))
+
+        def _finish(job, ok):
+            backup_path, png_temp = job
+            png_path = backup_path[: -len(".wmf.backup")]
+            if ok:
+                os.replace(png_temp, png_path)
+                postprocess_image(png_path)
+            else:
                 if os.path.exists(png_temp):
                     os.remove(png_temp)
+                os.remove(backup_path)
+
+        results = convert_wmf_batch(
+            conversions, jobs, get_wmf_toolchain(), on_done=_finish
+        )
+
+        for png_path, ok in zip(wmf_files, results):
+            rel = png_path.relative_to(base_path).as_posix()
+            if ok:
+                state[rel] = _state_entry(png_path)
+                print(f"  ✓ {rel} (original backed up to {png_path.name}.wmf.backup)")
+                converted_count += 1
+            else:
+                print(f"  ❌ {rel}")
                 failed_count += 1
+        print()
 
-            print()
+    # Forget files that no longer exist
+    for rel in list(state):
+        if not (base_path / rel).exists():
+            del state[rel]
+    save_state(state_path, state)
 
+    elapsed = max(time.monotonic() - start, 1e-6)
     print("=" * 80)
-    print(f"Found {wmf_count} WMF files with PNG extensions")
+    print(f"Found {len(wmf_files)} WMF files with PNG extensions")
     print(f"  ✓ Converted: {converted_count}")
     if failed_count > 0:
         print(f"  ⚠️  Failed: {failed_count}")
+    print(
+        f"Processed {scanned} files in {elapsed:.2f}s ({scanned / elapsed:.1f} files/s)"
+    )
     print("=" * 80)
 
 
 if __name__ == "__main__":
-    fix_wmf_images()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "base_dir", nargs="?", default="export/pictures", help="pictures directory"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="parallel conversions"
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="ignore the state file and rescan all"
+    )
+    args = parser.parse_args()
+    fix_wmf_images(args.base_dir, jobs=args.jobs, full=args.full)
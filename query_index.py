@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Query the BM25 index written by build_book.py (bm25_index = true).
+
+The postings arrays are memory-mapped, so only the parts touched by the
+query terms are read from disk.
+
+Usage:
+    python query_index.py export/eng/my-book-title "query text" -k 5
+"""
+
+import argparse
+import os
+import time
+
+from build_book import BM25_INDEX_DIR, load_bm25_index, query_bm25
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "index_dir", help="book export directory or its _bm25/ index directory"
+    )
+    parser.add_argument("query", help="query text")
+    parser.add_argument("-k", "--top-k", type=int, default=10, help="number of results")
+    args = parser.parse_args(argv)
+
+    index_dir = args.index_dir
+    if os.path.isdir(os.path.join(index_dir, BM25_INDEX_DIR)):
+        index_dir = os.path.join(index_dir, BM25_INDEX_DIR)
+
+    start = time.perf_counter()
+    index = load_bm25_index(index_dir)
+    loaded = time.perf_counter()
+    results = query_bm25(index, args.query, args.top_k)
+    done = time.perf_counter()
+
+    for rank, (doc_id, score) in enumerate(results, 1):
+        print(f"{rank:3d}. {score:7.3f}  {doc_id}")
+    if not results:
+        print("No matches.")
+    print(
+        f"\n{index['meta']['documents']} {index['meta']['unit']},"
+        f" load {(loaded - start) * 1000:.1f} ms, query {(done - loaded) * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Local HTTP conversion service with warm worker processes.
+
+POST a DOCX to /convert and get the export (JSON, pictures and, with
+markdown=1, Markdown) back as a zip. Workers are started up front with
+python-docx, Pillow and build_book imported, share one WMF toolchain probe
+and each keep their own LibreOffice profile, so a request pays for the
+conversion only. The zip is spooled to a temporary file by the worker and
+streamed from there. GET /status reports queue depth and latency.
+
+Usage:
+    python serve.py --port 8765 -j 4
+    curl --data-binary @book.docx "http://127.0.0.1:8765/convert?language=fra" -o book.zip
+    curl http://127.0.0.1:8765/status
+
+Query parameters of /convert are book_config.toml keys (canonical_id,
+language, title, pictures_location, ...) plus markdown=1.
+"""
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import build_book
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+REQUEST_TIMEOUT = 600  # Seconds a conversion may take
+LATENCY_WINDOW = 100  # Recent requests used for the latency statistics
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+# Worker process state, set by _init_worker
+_exceptions = {}
+_probe_results = None
+
+
+def _init_worker(probe_results, slot_counter, exceptions_file, wmf_concurrency):
+    """Warm a worker: import the heavy modules and set up its profiles."""
+    global _exceptions, _probe_results
+    import docx  # noqa: F401
+
+    try:
+        import PIL.Image  # noqa: F401
+    except ImportError:
+        pass
+
+    with slot_counter.get_lock():
+        slot = slot_counter.value
+        slot_counter.value += 1
+    # Each worker keeps its own LibreOffice profiles for its whole life
+    build_book.LIBREOFFICE_PROFILE_ROOT = os.path.join(
+        build_book.LIBREOFFICE_PROFILE_ROOT, f"serve_{slot:02d}"
+    )
+    build_book.WMF_CONCURRENCY = wmf_concurrency
+    _probe_results = probe_results
+    _exceptions = build_book.load_exceptions(exceptions_file)
+
+
+def convert_to_zip(data, config, markdown, spool_dir):
+    """Convert DOCX bytes in a worker; return (zip path, info dict).
+
+    The archive is written to a temporary file in *spool_dir* rather than
+    returned as bytes, so the export is never held in memory and the
+    server can stream it to the client. The caller removes the file.
+    """
+    import tempfile
+
+    start = time.monotonic()
+    # A fresh toolchain per request, so a circuit breaker tripped by one
+    # document does not disable a converter for the worker's later requests
+    toolchain = None
+    if _probe_results:
+        toolchain = build_book.WmfToolchain.from_probe_results(_probe_results)
+    fd, zip_path = tempfile.mkstemp(suffix=".zip", dir=spool_dir)
+    try:
+        with os.fdopen(fd, "wb") as f, build_book.convert_book(
+            data, config, _exceptions, markdown=markdown, toolchain=toolchain
+        ) as build, build_book.ArchiveWriter(f, "zip") as archive:
+            files = build.write(archive)
+            info = {
+                "book_id": build.config["canonical_id"],
+                "language": build.config["language"],
+                "sections": len(build.sections),
+                "images": len(build.images),
+                "files": files,
+            }
+    except BaseException:
+        os.remove(zip_path)
+        raise
+    info["seconds"] = round(time.monotonic() - start, 3)
+    return zip_path, info
+
+
+def parse_config_value(key, value):
+    """Convert a query string value to the type of the book config default.
+
+    Booleans accept true/false/1/0, lists are comma-separated and keys whose
+    default is a string or None stay strings. Raises ValueError otherwise.
+    """
+    default = build_book.BOOK_CONFIG_DEFAULTS[key]
+    if isinstance(default, bool):
+        if value.lower() in ("true", "1"):
+            return True
+        if value.lower() in ("false", "0"):
+            return False
+        raise ValueError(f"{key} must be true or false, got {value!r}")
+    if isinstance(default, int):
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"{key} must be an integer, got {value!r}")
+    if isinstance(default, list):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return value
+
+
+class ConversionService:
+    """Pool of warm workers plus the request statistics for /status."""
+
+    def __init__(self, workers, exceptions_file):
+        import tempfile
+
+        # Finished archives wait here until they are sent; a conversion that
+        # outlives its request timeout leaves its file to close() to remove
+        self.spool_dir = tempfile.mkdtemp(prefix="docx2app-serve-")
+        probe_results = build_book.WmfToolchain().probe().probe_results()
+        self.workers = workers
+        self.pool = multiprocessing.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(
+                probe_results,
+                multiprocessing.Value("i", 0),
+                exceptions_file,
+                max(1, (os.cpu_count() or 1) // workers),
+            ),
+        )
+        self.started = time.time()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def convert(self, data, config, markdown):
+        """Run one conversion on the pool and record its latency.
+
+        Returns (zip path, info dict); the caller removes the file.
+        """
+        with self._lock:
+            self.in_flight += 1
+        start = time.monotonic()
+        ok = False
+        try:
+            result = self.pool.apply_async(
+                convert_to_zip, (data, config, markdown, self.spool_dir)
+            ).get(REQUEST_TIMEOUT)
+            ok = True
+            return result
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.in_flight -= 1
+                if ok:
+                    self.completed += 1
+                    self.latencies.append(elapsed)
+                else:
+                    self.failed += 1
+
+    def status(self):
+        """Queue depth, counters and latency statistics."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            status = {
+                "workers": self.workers,
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.workers),
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+        if latencies:
+            status["latency_seconds"] = {
+                "window": len(latencies),
+                "mean": round(sum(latencies) / len(latencies), 3),
+                "p50": round(latencies[len(latencies) // 2], 3),
+                "p95": round(latencies[int(len(latencies) * 0.95)], 3),
+                "max": round(latencies[-1], 3),
+            }
+        return status
+
+    def close(self):
+        import shutil
+
+        self.pool.terminate()
+        self.pool.join()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    """Routes: POST /convert, GET /status."""
+
+    server_version = "docx2app"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if urlsplit(self.path).path == "/status":
+            self.send_json(200, self.server.service.status())
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/convert":
+            self.send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            self.send_json(400, {"error": "empty request body, POST the DOCX"})
+            return
+        if length > MAX_UPLOAD_BYTES:
+            self.send_json(413, {"error": f"upload larger than {MAX_UPLOAD_BYTES}"})
+            return
+        data = self.rfile.read(length)
+
+        config = {}
+        markdown = False
+        for key, value in parse_qsl(url.query):
+            if key == "markdown":
+                markdown = value.lower() in ("true", "1")
+            elif key in build_book.BOOK_CONFIG_DEFAULTS:
+                try:
+                    config[key] = parse_config_value(key, value)
+                except ValueError as e:
+                    self.send_json(400, {"error": str(e)})
+                    return
+            else:
+                self.send_json(400, {"error": f"unknown parameter: {key}"})
+                return
+
+        try:
+            zip_path, info = self.server.service.convert(data, config, markdown)
+        except multiprocessing.TimeoutError:
+            self.send_json(504, {"error": "conversion timed out"})
+            return
+        except Exception as e:
+            self.send_json(422, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        try:
+            with open(zip_path, "rb") as f:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/zip")
+                self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+                self.send_header(
+                    "Content-Disposition",
+                    f'attachment; filename="{info["book_id"]}.zip"',
+                )
+                self.send_header("X-Build-Info", json.dumps(info))
+                self.end_headers()
+                for chunk in iter(lambda: f.read(RESPONSE_CHUNK_SIZE), b""):
+                    self.wfile.write(chunk)
+        finally:
+            os.remove(zip_path)
+
+    def send_json(self, code, payload):
+        body = json.dumps(payload, indent=2).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"  {self.address_string()} - {format % args}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve DOCX conversions over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="warm worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--exceptions",
+        default=build_book.EXCEPTIONS_FILE,
+        help="TOC exceptions file applied to every conversion",
+    )
+    args = parser.parse_args(argv)
+
+    service = ConversionService(max(1, args.workers), args.exceptions)
+    server = ThreadingHTTPServer((args.host, args.port), ConversionHandler)
+    server.service = service
+    host, port = server.server_address[:2]
+    print(f"✓ Serving on http://{host}:{port} with {service.workers} worker(s)")
+    print("  POST /convert (DOCX body) -> zip, GET /status")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""Make the top-level scripts importable; shared fixtures for the tests."""
+
+import os
+import shutil
+import sys
+import zipfile
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture
+def sample_docx():
+    """Path of the sample book that ships with the repository."""
+    return os.path.join(REPO_DIR, "sample-book.docx")
+
+
+@pytest.fixture
+def book_dir(tmp_path, monkeypatch, sample_docx):
+    """A working directory with the sample book as original-book.docx.
+
+    build_book's input and output paths are relative, so builds run here
+    write export/ and export_md/ under *tmp_path*.
+    """
+    shutil.copy(sample_docx, tmp_path / "original-book.docx")
+    shutil.copytree(os.path.join(REPO_DIR, "conf"), tmp_path / "conf")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def edit_docx(path, old, new):
+    """Replace text in the document body of the DOCX at *path*."""
+    with zipfile.ZipFile(path) as source:
+        parts = [(info, source.read(info)) for info in source.infolist()]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as target:
+        for info, data in parts:
+            if info.filename == "word/document.xml":
+                assert old.encode("utf-8") in data
+                data = data.replace(old.encode("utf-8"), new.encode("utf-8"))
+            target.writestr(info, data)
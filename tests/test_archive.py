@@ -0,0 +1,30 @@
+"""Tests for ArchiveWriter in build_book.py."""
+
+import tarfile
+import zipfile
+
+import pytest
+
+import build_book
+
+
+def test_archive_is_renamed_into_place(tmp_path):
+    dest = tmp_path / "book.zip"
+    with build_book.ArchiveWriter(str(dest)) as writer:
+        writer.write("export/a.json", b"{}")
+        assert not dest.exists()
+    with zipfile.ZipFile(dest) as archive:
+        assert archive.namelist() == ["export/a.json"]
+    assert [p.name for p in tmp_path.iterdir()] == ["book.zip"]
+
+
+def test_failed_build_keeps_the_previous_archive(tmp_path):
+    dest = tmp_path / "book.tar.gz"
+    with build_book.ArchiveWriter(str(dest)) as writer:
+        writer.write("export/old.json", b"{}")
+    with pytest.raises(RuntimeError), build_book.ArchiveWriter(str(dest)) as writer:
+        writer.write("export/new.json", b"{}")
+        raise RuntimeError("conversion failed")
+    with tarfile.open(dest) as archive:
+        assert archive.getnames() == ["export/old.json"]
+    assert [p.name for p in tmp_path.iterdir()] == ["book.tar.gz"]
@@ -0,0 +1,77 @@
+"""Tests for audit_export.py and the verify_images.py wrapper."""
+
+import os
+
+import pytest
+
+import audit_export
+import build_book
+import verify_images
+
+PICTURES = "pictures/eng/sample_book_for_testing"
+INSTALLATION_JSON = (
+    "eng/sample_book_for_testing/02_getting_started/01_installation.json"
+)
+
+
+@pytest.fixture
+def export(book_dir):
+    build_book.build_book_json()
+    return book_dir / "export"
+
+
+def test_clean_build_passes(export):
+    report = audit_export.audit_export(str(export))
+    assert report["ok"]
+    assert report["image_refs"] == report["images_on_disk"] > 0
+    assert report["orphaned_images"] == []
+
+
+def test_missing_image_fails(export):
+    picture = next((export / PICTURES).rglob("*.png"))
+    picture.unlink()
+    report = audit_export.audit_export(str(export))
+    assert not report["ok"]
+    assert [item["expected_path"] for item in report["missing_images"]] == [
+        os.path.relpath(picture, export)
+    ]
+    assert not verify_images.verify_images(str(export))
+
+
+def test_wmf_saved_as_png_fails_the_audit_only(export):
+    picture = next((export / PICTURES).rglob("*.png"))
+    picture.write_bytes(b"\xd7\xcd\xc6\x9a" + bytes(60))
+    report = audit_export.audit_export(str(export))
+    assert report["wmf_files"] == [os.path.relpath(picture, export)]
+    assert not report["ok"]
+    assert verify_images.verify_images(str(export))
+
+
+def test_orphans_are_reported_but_pass(export):
+    orphan = export / PICTURES / "orphan.png"
+    orphan.write_bytes(b"\x89PNG\r\n\x1a\n")
+    report = audit_export.audit_export(str(export))
+    assert report["orphaned_images"] == [os.path.relpath(orphan, export)]
+    assert report["ok"]
+
+
+def test_broken_json_fails(export):
+    (export / INSTALLATION_JSON).write_text("{", encoding="utf-8")
+    report = audit_export.audit_export(str(export))
+    assert [item["json"] for item in report["json_errors"]] == [INSTALLATION_JSON]
+    assert not verify_images.verify_images(str(export))
+
+
+def test_manifest_audit(export):
+    report = audit_export.audit_manifest(str(export), check_hashes=True)
+    assert report["ok"]
+    assert report["valid_files"] == report["files"] > 0
+
+    # Same size, different content: only the hash comparison notices
+    path = export / INSTALLATION_JSON
+    data = path.read_bytes()
+    path.write_bytes(data.replace(b"install", b"INSTALL"))
+    assert audit_export.audit_manifest(str(export))["ok"]
+    report = audit_export.audit_manifest(str(export), check_hashes=True)
+    assert report["hash_mismatches"] == [INSTALLATION_JSON]
+    assert not report["ok"]
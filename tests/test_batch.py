@@ -0,0 +1,36 @@
+"""Tests for book discovery in build_batch.py."""
+
+import shutil
+
+import pytest
+
+import build_batch
+
+
+def add_book(tmp_path, sample_docx, name, config):
+    shutil.copy(sample_docx, tmp_path / f"{name}.docx")
+    (tmp_path / f"{name}.toml").write_text(config, encoding="utf-8")
+
+
+def test_jobs_get_their_output_directory(tmp_path, sample_docx):
+    add_book(tmp_path, sample_docx, "a", 'canonical_id = "book"\n')
+    add_book(tmp_path, sample_docx, "b", 'canonical_id = "book"\nlanguage = "fra"\n')
+    jobs = build_batch.discover_books(str(tmp_path))
+    assert [job["json_dir"] for job in jobs] == [
+        "export/eng/book",
+        "export/fra/book",
+    ]
+
+
+def test_books_writing_the_same_directory_are_rejected(tmp_path, sample_docx):
+    add_book(tmp_path, sample_docx, "a", 'canonical_id = "book"\n')
+    add_book(tmp_path, sample_docx, "b", 'canonical_id = "book"\n')
+    with pytest.raises(ValueError, match="a, b -> export/eng/book"):
+        build_batch.discover_books(str(tmp_path))
+
+
+def test_output_directory_from_docx_metadata(tmp_path, sample_docx):
+    shutil.copy(sample_docx, tmp_path / "a.docx")
+    shutil.copy(sample_docx, tmp_path / "b.docx")
+    with pytest.raises(ValueError, match="sample_book_for_testing"):
+        build_batch.discover_books(str(tmp_path))
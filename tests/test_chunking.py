@@ -0,0 +1,38 @@
+"""Tests for the RAG chunker (build_book.chunk_section)."""
+
+import build_book
+
+
+def make_section(*token_counts):
+    """A section JSON with one paragraph of each given word count."""
+    content = []
+    for index, count in enumerate(token_counts):
+        content.append({"type": "paragraph", "text": " ".join([f"w{index}"] * count)})
+    return {"id": "book-eng-01-01", "section_id": "intro/overview", "content": content}
+
+
+def chunks(section, max_tokens, overlap_tokens):
+    return list(
+        build_book.chunk_section(section, ["Intro"], max_tokens, overlap_tokens)
+    )
+
+
+def test_overlap_is_trimmed_to_fit_the_next_unit():
+    result = chunks(make_section(50, 10, 55), max_tokens=60, overlap_tokens=20)
+    assert [chunk["tokens"] for chunk in result] == [60, 55]
+
+
+def test_chunks_stay_within_budget_for_mixed_unit_sizes():
+    sizes = [3, 50, 10, 55, 1, 7, 60, 2, 2, 30, 29, 45, 12, 5, 59, 8]
+    for max_tokens, overlap_tokens in [(60, 20), (60, 60), (64, 10), (100, 40)]:
+        result = chunks(make_section(*sizes), max_tokens, overlap_tokens)
+        assert result
+        for chunk in result:
+            assert chunk["tokens"] <= max_tokens
+            assert build_book.count_tokens(chunk["text"]) <= max_tokens
+
+
+def test_overlap_carries_trailing_units():
+    result = chunks(make_section(30, 10, 30), max_tokens=45, overlap_tokens=15)
+    assert [chunk["tokens"] for chunk in result] == [40, 40]
+    assert result[1]["text"].startswith("w1")
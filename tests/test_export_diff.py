@@ -0,0 +1,65 @@
+"""Tests for export_diff.py against real build manifests."""
+
+import json
+import shutil
+
+from conftest import edit_docx
+
+import build_book
+import export_diff
+
+BOOK = "eng/sample_book_for_testing"
+MANIFEST = f"{BOOK}/_build_manifest.json"
+
+
+def deploy(book_dir):
+    """Copy the current export, as a deploy would."""
+    shutil.copytree(book_dir / "export", book_dir / "deployed")
+    return str(book_dir / "deployed")
+
+
+def test_unchanged_rebuild_uploads_only_the_manifest(book_dir):
+    build_book.build_book_json()
+    deployed = deploy(book_dir)
+    build_book.build_book_json(incremental=True)
+
+    new_files = export_diff.load_files("export")
+    diff = export_diff.diff_manifests(export_diff.load_files(deployed), new_files)
+    assert diff["upload"] == [MANIFEST]
+    assert diff["delete"] == []
+    assert diff["unchanged"] == len(new_files) - 1
+
+
+def test_edit_uploads_changed_files_and_manifest(book_dir):
+    build_book.build_book_json()
+    deployed = deploy(book_dir)
+    edit_docx(
+        book_dir / "original-book.docx",
+        "This will install all required dependencies.",
+        "This installs every required dependency.",
+    )
+    build_book.build_book_json(incremental=True)
+
+    diff = export_diff.diff_manifests(
+        export_diff.load_files(deployed), export_diff.load_files("export")
+    )
+    assert diff["upload"] == [
+        f"{BOOK}/02_getting_started/01_installation.json",
+        MANIFEST,
+        f"{BOOK}/_navigation.json",
+    ]
+
+
+def test_files_missing_from_the_new_manifest_are_deleted(book_dir, capsys):
+    build_book.build_book_json()
+    deployed = deploy(book_dir)
+    manifest_path = book_dir / "export" / MANIFEST
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    removed = manifest["files"].pop()["path"]
+    manifest_path.write_text(json.dumps(manifest), encoding="utf-8")
+
+    capsys.readouterr()
+    assert export_diff.main([deployed, "export", "--json"]) == 0
+    diff = json.loads(capsys.readouterr().out)
+    assert diff["delete"] == [removed]
+    assert MANIFEST in diff["upload"]
@@ -0,0 +1,56 @@
+"""Tests for incremental builds (build_book_json(incremental=True))."""
+
+from conftest import edit_docx
+
+import build_book
+
+BOOK_DIR = "export/eng/sample_book_for_testing"
+# Rewritten by every build
+ALWAYS_WRITTEN = {"_build_manifest.json", ".build_state.json"}
+
+
+def snapshot(root):
+    """Map each output file to its modification time (ns)."""
+    files = {}
+    for directory in ("export", "export_md"):
+        for path in (root / directory).rglob("*"):
+            if (
+                path.is_file()
+                and path.name not in ALWAYS_WRITTEN
+                and path.suffix != ".log"
+            ):
+                files[str(path.relative_to(root))] = path.stat().st_mtime_ns
+    return files
+
+
+def changed_files(before, after):
+    return sorted(path for path in after if before.get(path) != after[path])
+
+
+def test_rebuild_without_changes_writes_nothing(book_dir):
+    first = build_book.build_book_json()
+    before = snapshot(book_dir)
+
+    summary = build_book.build_book_json(incremental=True)
+    assert summary["written"] == 0
+    assert summary["unchanged"] == first["written"]
+    assert snapshot(book_dir) == before
+
+
+def test_edited_paragraph_rewrites_only_its_section(book_dir):
+    build_book.build_book_json()
+    before = snapshot(book_dir)
+
+    edit_docx(
+        book_dir / "original-book.docx",
+        "This will install all required dependencies.",
+        "This installs every required dependency.",
+    )
+    summary = build_book.build_book_json(incremental=True)
+    # The navigation lists the size of every section file
+    assert changed_files(before, snapshot(book_dir)) == [
+        f"{BOOK_DIR}/02_getting_started/01_installation.json",
+        f"{BOOK_DIR}/_navigation.json",
+        "export_md/chapter_02/section_01.md",
+    ]
+    assert summary["written"] == 3
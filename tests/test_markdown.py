@@ -0,0 +1,63 @@
+"""Tests for paragraph Markdown rendering (build_book.extract_paragraph_markdown)."""
+
+import build_book
+
+
+def list_paragraph(text, kind, level=0, runs=None):
+    """Paragraph IR for a list item (see paragraph_ir)."""
+    return {
+        "text": text,
+        "runs": runs or [{"text": text, "bold": None, "italic": None}],
+        "style": "List Number" if kind == "number" else "List Bullet",
+        "list": {"kind": kind, "level": level},
+    }
+
+
+def test_numbered_item_without_typed_number():
+    para = list_paragraph("Input document path", "number")
+    assert build_book.extract_paragraph_markdown(para) == "1. Input document path"
+
+
+def test_numbered_item_keeps_its_typed_marker_verbatim():
+    for text in (
+        "1. Input document path",
+        "2. Output directory",
+        "3) Processing options",
+    ):
+        para = list_paragraph(text, "number")
+        assert build_book.extract_paragraph_markdown(para) == text
+
+
+def test_typed_number_inside_emphasis():
+    para = list_paragraph(
+        "1. Input",
+        "number",
+        runs=[
+            {"text": "1. ", "bold": True, "italic": None},
+            {"text": "Input", "bold": None, "italic": None},
+        ],
+    )
+    assert build_book.extract_paragraph_markdown(para) == "1. Input"
+
+    para = list_paragraph(
+        "4) Input", "number", runs=[{"text": "4) Input", "bold": True, "italic": None}]
+    )
+    assert build_book.extract_paragraph_markdown(para) == "4) **Input**"
+
+
+def test_nested_items_are_indented_per_level():
+    para = list_paragraph("2024 was a good year", "bullet", level=1)
+    assert build_book.extract_paragraph_markdown(para) == "   - 2024 was a good year"
+
+    para = list_paragraph("Second step", "number", level=2)
+    assert build_book.extract_paragraph_markdown(para) == "      1. Second step"
+
+
+def test_plain_paragraph():
+    para = {
+        "text": "Body text",
+        "runs": [{"text": "Body text", "bold": None, "italic": None}],
+        "style": "Normal",
+        "list": None,
+    }
+    assert build_book.extract_paragraph_markdown(para) == "Body text"
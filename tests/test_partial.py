@@ -0,0 +1,62 @@
+"""Tests for partial builds (build_book_json(chapters=...))."""
+
+import json
+
+import pytest
+from conftest import edit_docx
+
+import build_book
+
+BOOK_DIR = "export/eng/sample_book_for_testing"
+
+
+def mtimes(root, pattern):
+    return {
+        str(path.relative_to(root)): path.stat().st_mtime_ns
+        for path in root.glob(pattern)
+        if path.is_file()
+    }
+
+
+def test_other_chapters_are_left_untouched(book_dir):
+    build_book.build_book_json()
+    chapter_1 = mtimes(book_dir, f"{BOOK_DIR}/01_introduction/*")
+    chapter_1.update(mtimes(book_dir, "export_md/chapter_01/*"))
+    chapter_2 = mtimes(book_dir, f"{BOOK_DIR}/02_getting_started/*")
+
+    # Chapter 1 changes in the DOCX too, but only chapter 2 is built
+    edit_docx(
+        book_dir / "original-book.docx",
+        "demonstrate the conversion system",
+        "show off the conversion system",
+    )
+    edit_docx(
+        book_dir / "original-book.docx",
+        "This will install all required dependencies.",
+        "This installs every required dependency.",
+    )
+    build_book.build_book_json(chapters={2})
+
+    after_1 = mtimes(book_dir, f"{BOOK_DIR}/01_introduction/*")
+    after_1.update(mtimes(book_dir, "export_md/chapter_01/*"))
+    assert after_1 == chapter_1
+    purpose = json.loads(
+        (book_dir / BOOK_DIR / "01_introduction/01_purpose.json").read_text("utf-8")
+    )
+    assert "demonstrate the conversion system" in json.dumps(purpose)
+
+    after_2 = mtimes(book_dir, f"{BOOK_DIR}/02_getting_started/*")
+    assert after_2.keys() == chapter_2.keys()
+    assert all(after_2[path] != chapter_2[path] for path in chapter_2)
+
+    # The manifest still lists the files the partial build skipped
+    manifest = json.loads(
+        (book_dir / BOOK_DIR / "_build_manifest.json").read_text("utf-8")
+    )
+    listed = {entry["path"] for entry in manifest["files"]}
+    assert "eng/sample_book_for_testing/01_introduction/01_purpose.json" in listed
+
+
+def test_unknown_chapter_is_rejected(book_dir):
+    with pytest.raises(ValueError, match="Chapter\\(s\\) not in the book: 7"):
+        build_book.build_book_json(chapters={2, 7})
@@ -0,0 +1,63 @@
+"""Tests for --plan (build_book.plan_book)."""
+
+import json
+
+import pytest
+
+import build_book
+
+BOOK_DIR = "export/eng/sample_book_for_testing"
+
+
+def test_plan_writes_nothing(book_dir):
+    plan = build_book.plan_book()
+    assert plan["book_id"] == "sample_book_for_testing"
+    assert plan["json_dir"] == BOOK_DIR
+    assert plan["sequence_warnings"] == 0
+    assert not (book_dir / "export").exists()
+    assert not (book_dir / "export_md").exists()
+
+
+def test_plan_matches_the_build(book_dir):
+    plan = build_book.plan_book()
+    summary = build_book.build_book_json()
+
+    planned = {
+        section["file"]
+        for chapter in plan["chapters"]
+        for section in chapter["sections"]
+        if section["written"]
+    }
+    built = {
+        str(path.relative_to(book_dir / BOOK_DIR))
+        for path in (book_dir / BOOK_DIR).glob("*/*.json")
+    }
+    assert planned == built
+    assert plan["sections"] == summary["sections"] == len(built)
+    assert plan["images"] == summary["images"]
+
+
+def test_plan_json_on_stdout(book_dir, capsys):
+    build_book.plan_book(chapters={2}, json_path="-")
+    out, err = capsys.readouterr()
+    plan = json.loads(out)
+    assert [chapter["chapter"] for chapter in plan["chapters"]] == [2]
+    assert "Structure plan" in err
+
+
+def test_plan_rejects_unknown_chapters(book_dir):
+    with pytest.raises(ValueError, match="not in the book: 9"):
+        build_book.plan_book(chapters={9})
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--plan", "--incremental"],
+        ["--plan", "--archive", "book.zip"],
+        ["--plan-json", "plan.json"],
+    ],
+)
+def test_plan_option_conflicts(argv):
+    with pytest.raises(SystemExit):
+        build_book.parse_args(argv)
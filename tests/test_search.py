@@ -0,0 +1,15 @@
+"""Tests for search tokenization (build_book.tokenize_text)."""
+
+import build_book
+
+
+def test_accented_stopwords_are_dropped():
+    assert build_book.tokenize_text("más libros", "spa") == ["libros"]
+    assert build_book.tokenize_text("für der Bücher", "deu") == ["bucher"]
+
+
+def test_published_stopwords_match_indexed_terms():
+    for language in build_book.STOPWORDS:
+        stopwords = build_book.search_stopwords(language)
+        for word in stopwords:
+            assert build_book.tokenize_text(word, language, frozenset()) in ([word], [])
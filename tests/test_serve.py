@@ -0,0 +1,83 @@
+"""Round trip through the HTTP conversion service in serve.py."""
+
+import io
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+
+import pytest
+from conftest import REPO_DIR
+
+import serve
+
+
+@pytest.fixture
+def server():
+    """A one-worker service on 127.0.0.1 with an ephemeral port."""
+    service = serve.ConversionService(
+        1, os.path.join(REPO_DIR, "conf", "exceptions.conf")
+    )
+    httpd = serve.ThreadingHTTPServer(("127.0.0.1", 0), serve.ConversionHandler)
+    httpd.service = service
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        service.close()
+
+
+def post(url, data):
+    request = urllib.request.Request(url, data=data, method="POST")
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return response.headers, response.read()
+
+
+def test_convert_returns_the_export_as_zip(server, sample_docx):
+    with open(sample_docx, "rb") as f:
+        data = f.read()
+    headers, body = post(f"{server}/convert?language=fra&markdown=1", data)
+
+    assert headers["Content-Type"] == "application/zip"
+    info = json.loads(headers["X-Build-Info"])
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        names = archive.namelist()
+        book_dir = f"export/fra/{info['book_id']}"
+        assert f"{book_dir}/_navigation.json" in names
+        assert len(names) == info["files"]
+        assert any(name.startswith("export_md/") for name in names)
+        section_files = [
+            name
+            for name in names
+            if name.startswith(book_dir) and name.endswith(".json")
+        ]
+        assert len(section_files) > info["sections"] > 0
+        navigation = json.loads(archive.read(f"{book_dir}/_navigation.json"))
+        assert navigation
+
+    with urllib.request.urlopen(f"{server}/status", timeout=10) as response:
+        status = json.load(response)
+    assert status["completed"] == 1
+    assert status["failed"] == 0
+    assert status["in_flight"] == 0
+    assert status["latency_seconds"]["window"] == 1
+
+
+def test_bad_requests_are_rejected(server):
+    for url, data, code in [
+        (f"{server}/convert", b"", 400),
+        (f"{server}/convert?colour=red", b"x", 400),
+        (f"{server}/convert", b"not a docx", 422),
+    ]:
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            post(url, data)
+        assert excinfo.value.code == code
+
+    with urllib.request.urlopen(f"{server}/status", timeout=10) as response:
+        assert json.load(response)["failed"] == 1